@@ -0,0 +1,2 @@
+CREATE INDEX IF NOT EXISTS messages_inbox_idx ON messages (PHONENUMBER, ID);
+CREATE INDEX IF NOT EXISTS messages_unread_idx ON messages (PHONENUMBER, ID) WHERE NOT READ;
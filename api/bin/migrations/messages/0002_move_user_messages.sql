@@ -0,0 +1,14 @@
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'users' AND column_name = 'message'
+    ) THEN
+        INSERT INTO messages (PHONENUMBER, BODY)
+            SELECT users.PHONENUMBER, message.BODY
+            FROM users, UNNEST(users.MESSAGE) WITH ORDINALITY AS message(BODY, POSITION)
+            ORDER BY users.PHONENUMBER, message.POSITION;
+        ALTER TABLE users DROP COLUMN MESSAGE;
+    END IF;
+END;
+$$;
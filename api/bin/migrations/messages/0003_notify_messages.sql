@@ -0,0 +1,16 @@
+CREATE OR REPLACE FUNCTION notify_messages_added() RETURNS TRIGGER AS $$
+DECLARE
+    low BIGINT;
+    high BIGINT;
+BEGIN
+    SELECT MIN(ID), MAX(ID) INTO low, high FROM added;
+    IF low IS NOT NULL THEN
+        PERFORM pg_notify('messages_added', low || ':' || high);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS messages_added ON messages;
+CREATE TRIGGER messages_added AFTER INSERT ON messages
+    REFERENCING NEW TABLE AS added
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_messages_added();
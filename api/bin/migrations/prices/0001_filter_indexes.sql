@@ -0,0 +1,5 @@
+CREATE INDEX IF NOT EXISTS prices_state_idx ON prices (STATE);
+CREATE INDEX IF NOT EXISTS prices_district_idx ON prices (DISTRICT);
+CREATE INDEX IF NOT EXISTS prices_market_idx ON prices (MARKET);
+CREATE INDEX IF NOT EXISTS prices_commodity_idx ON prices (COMMODITY);
+CREATE INDEX IF NOT EXISTS prices_modal_price_idx ON prices (MODAL_PRICE);
@@ -0,0 +1 @@
+ALTER TABLE prices ALTER COLUMN ARRIVAL_DATE TYPE DATE USING TO_DATE(ARRIVAL_DATE, 'DD/MM/YYYY');
@@ -0,0 +1,9 @@
+CREATE OR REPLACE FUNCTION notify_prices_changed() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('prices_changed', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS prices_changed ON prices;
+CREATE TRIGGER prices_changed AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON prices
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_prices_changed();
@@ -0,0 +1,2 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS production_crop_trgm_idx ON production USING GIN (CROP gin_trgm_ops);
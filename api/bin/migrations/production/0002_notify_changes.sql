@@ -0,0 +1,9 @@
+CREATE OR REPLACE FUNCTION notify_production_changed() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('production_changed', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS production_changed ON production;
+CREATE TRIGGER production_changed AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON production
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_production_changed();
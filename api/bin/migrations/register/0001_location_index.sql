@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS users_location_idx ON users (STATE, DISTRICT);
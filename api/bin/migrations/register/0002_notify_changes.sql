@@ -0,0 +1,9 @@
+CREATE OR REPLACE FUNCTION notify_users_changed() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('users_changed', OLD.PHONENUMBER::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS users_changed ON users;
+CREATE TRIGGER users_changed AFTER UPDATE OR DELETE ON users
+    FOR EACH ROW EXECUTE PROCEDURE notify_users_changed();
@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS
+messages(
+    ID BIGSERIAL PRIMARY KEY,
+    PHONENUMBER BIGINT NOT NULL REFERENCES users(PHONENUMBER) ON DELETE CASCADE,
+    BODY TEXT NOT NULL,
+    CREATEDAT TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    READ BOOLEAN NOT NULL DEFAULT FALSE
+);
+INSERT INTO messages(PHONENUMBER, BODY) SELECT PHONENUMBER, $2::TEXT FROM users WHERE PHONENUMBER = $1 RETURNING ID;
@@ -5,8 +5,7 @@ users(
     PASSWORD VARCHAR(255) NOT NULL,
     STATE VARCHAR(255) NOT NULL,
     DISTRICT VARCHAR(255) NOT NULL,
-    MESSAGE TEXT[] NOT NULL,
     CREATEDAT FLOAT
 );
-INSERT INTO users(PHONENUMBER, NAME, PASSWORD, STATE, DISTRICT, MESSAGE, CREATEDAT) VALUES($1, $2, $3, $4, $5, $6, $7);
-UPDATE users SET NAME = $2, PASSWORD = $3, STATE = $4, DISTRICT = $5 WHERE PHONENUMBER = $1;
+INSERT INTO users(PHONENUMBER, NAME, PASSWORD, STATE, DISTRICT, CREATEDAT) VALUES($1, $2, $3, $4, $5, $6);
+UPDATE users SET NAME = COALESCE($2, NAME), PASSWORD = COALESCE($3, PASSWORD), STATE = COALESCE($4, STATE), DISTRICT = COALESCE($5, DISTRICT) WHERE PHONENUMBER = $1 RETURNING *;
@@ -0,0 +1,8 @@
+CREATE TABLE IF NOT EXISTS schema_migrations(
+    TABLE_NAME VARCHAR(255) NOT NULL,
+    VERSION INTEGER NOT NULL,
+    NAME VARCHAR(255) NOT NULL,
+    APPLIED_AT TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (TABLE_NAME, VERSION)
+);
+INSERT INTO schema_migrations(TABLE_NAME, VERSION, NAME) VALUES($1, $2, $3);
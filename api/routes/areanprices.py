@@ -1,8 +1,11 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Literal
 
+import orjson
 from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.responses import Response, StreamingResponse
 
-from api.utils import Price
+from api.utils import NearbyPrice, Price
+from api.utils.streaming import decode_cursor, encode_rows
 
 if TYPE_CHECKING:
     from api.setup import Database, Logs
@@ -15,14 +18,66 @@ class AreanPrices:
         "logger",
     )
     router: APIRouter = APIRouter()
+    DIMENSIONS: dict[str, tuple[str, str]] = {
+        "STATE": ("state", "states"),
+        "DISTRICT": ("district", "districts"),
+        "MARKET": ("market", "markets"),
+        "COMMODITY": ("name", "commodities"),
+    }
+
+    AUTOCOMPLETE: dict[str, str] = {
+        "state": "STATE",
+        "district": "DISTRICT",
+        "market": "MARKET",
+        "commodity": "COMMODITY",
+    }
+    SUGGESTIONS: int = 5
+
+    MEDIA_TYPES: dict[str, str] = {"ndjson": "application/x-ndjson", "json": "application/json"}
+    STATISTICS: dict[str, str] = {"state": "STATE", "district": "DISTRICT", "market": "MARKET", "date": "ARRIVAL_DATE"}
 
     def __init__(self, database: "Database", logger: "Logs") -> None:
         self.database = database
         self.logger = logger
 
-    @staticmethod
-    def intersection(items: list[list[Price]]) -> list[Price]:
-        return list(set.intersection(*map(lambda x: set(x), items)))
+    async def resolve(self, column: str, value: str) -> str:
+        dimensions = await self.database.prices.get_dimensions()
+        corrected = dimensions.correct(column, value)
+        name, _ = self.DIMENSIONS[column]
+        if corrected is None:
+            self.logger.log(f"No commodity found with that {name}: {value}", "error")
+            suggestions = dimensions.suggest(column, value, self.SUGGESTIONS)
+            hint = f"Did you mean {', '.join(suggestions)}?" if suggestions else "Please check the spelling."
+            raise HTTPException(status_code=404, detail=f"No commodity found with that {name}. {hint}")
+        if corrected != value:
+            self.logger.log(f"Corrected {name} {value!r} to {corrected!r}", "info")
+        return corrected
+
+    def stream(
+        self,
+        media: str,
+        limit: int | None,
+        cursor: str | None,
+        state: str | None = None,
+        commodity: str | None = None,
+        budget: tuple[int, int] | None = None,
+    ) -> StreamingResponse:
+        if limit is not None and limit < 1:
+            raise HTTPException(status_code=422, detail="Limit must be at least 1")
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            self.logger.log(f"Invalid cursor: {cursor}", "error")
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        rows = self.database.prices.stream_filtered(
+            state=state,
+            commodity=commodity,
+            budget=budget,
+            limit=limit + 1 if limit is not None else None,
+            after=after,
+        )
+        self.logger.log(f"Streaming commodities as {media} after id: {after}", "info")
+        return StreamingResponse(encode_rows(rows, limit, media), media_type=self.MEDIA_TYPES[media])
 
     async def get_by_id(self, _id: int) -> Price:
         result: Price = await self.database.prices.get_by_id(_id)
@@ -32,51 +87,71 @@ class AreanPrices:
         self.logger.log(f"Found commodity with id: {_id}", "info")
         return result
 
-    async def get_by_state(self, state: str) -> list[Price]:
+    async def get_by_state(
+        self,
+        state: str,
+        stream: bool = False,
+        media: Literal["ndjson", "json"] = "ndjson",
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> list[Price] | StreamingResponse:
+        state = await self.resolve("STATE", state)
+        if stream:
+            return self.stream(media, limit, cursor, state=state)
         result = await self.database.prices.get_by_state(state)
         if not result:
             self.logger.log(f"No commodity found with that state: {state}", "error")
-            raise HTTPException(
-                status_code=404,
-                detail=f"No commodity found with that state. Please check the spelling. Valid states are {', '.join(await self.database.prices.get_all_states)}",
-            )
+            raise HTTPException(status_code=404, detail="No commodity found with that state.")
         self.logger.log(f"Found {len(result)} commodities with state: {state}", "info")
         return result
 
     async def get_by_district(self, district: str) -> list[Price]:
+        district = await self.resolve("DISTRICT", district)
         result = await self.database.prices.get_by_district(district)
         if not result:
             self.logger.log(f"No commodity found with that district: {district}", "error")
-            raise HTTPException(
-                status_code=404,
-                detail=f"No commodity found with that district. Please check the spelling. Valid districts are {', '.join(await self.database.prices.get_all_districts)}",
-            )
+            raise HTTPException(status_code=404, detail="No commodity found with that district.")
         self.logger.log(f"Found {len(result)} commodities with district: {district}", "info")
         return result
 
     async def get_by_market(self, market: str) -> list[Price]:
+        market = await self.resolve("MARKET", market)
         result = await self.database.prices.get_by_market(market)
         if not result:
             self.logger.log(f"No commodity found with that market: {market}", "error")
-            raise HTTPException(
-                status_code=404,
-                detail=f"No commodity found with that market. Please check the spelling. Valid markets are {', '.join(await self.database.prices.get_all_markets)}",
-            )
+            raise HTTPException(status_code=404, detail="No commodity found with that market.")
         self.logger.log(f"Found {len(result)} commodities with market: {market}", "info")
         return result
 
-    async def get_by_commodity(self, commodity: str) -> list[Price]:
+    async def get_by_commodity(
+        self,
+        commodity: str,
+        stream: bool = False,
+        media: Literal["ndjson", "json"] = "ndjson",
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> list[Price] | StreamingResponse:
+        commodity = await self.resolve("COMMODITY", commodity)
+        if stream:
+            return self.stream(media, limit, cursor, commodity=commodity)
         result = await self.database.prices.get_by_commodity(commodity)
         if not result:
             self.logger.log(f"No commodity found with that name: {commodity}", "error")
-            raise HTTPException(
-                status_code=404,
-                detail=f"No commodity found with that name. Please check the spelling. Valid commodities are {', '.join(await self.database.prices.get_all_commodities)}",
-            )
+            raise HTTPException(status_code=404, detail="No commodity found with that name.")
         self.logger.log(f"Found {len(result)} commodities with name: {commodity}", "info")
         return result
 
-    async def get_by_budget(self, initial: int, final: int) -> list[Price]:
+    async def get_by_budget(
+        self,
+        initial: int,
+        final: int,
+        stream: bool = False,
+        media: Literal["ndjson", "json"] = "ndjson",
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> list[Price] | StreamingResponse:
+        if stream:
+            return self.stream(media, limit, cursor, budget=(initial, final))
         result = await self.database.prices.get_between_budget(initial, final)
         if not result:
             self.logger.log(f"No commodity found with that budget: {initial} - {final}", "error")
@@ -96,21 +171,111 @@ class AreanPrices:
         commodity: str | None = None,
         initial: int | None = None,
         final: int | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        after: int | None = None,
+    ) -> list[Price]:
+        budget = (initial, final) if initial and final else None
+        state = await self.resolve("STATE", state) if state else None
+        district = await self.resolve("DISTRICT", district) if district else None
+        market = await self.resolve("MARKET", market) if market else None
+        commodity = await self.resolve("COMMODITY", commodity) if commodity else None
+        if self.database.prices.index.loaded:
+            return self.filter_index(_id, state, district, market, commodity, budget, limit, offset, after)
+        result = await self.database.prices.get_filtered(
+            _id, state, district, market, commodity, budget, limit, offset, after
+        )
+        self.logger.log(f"Found {len(result)} commodities matching the filters", "info")
+        return result
+
+    def filter_index(
+        self,
+        _id: int | None,
+        state: str | None,
+        district: str | None,
+        market: str | None,
+        commodity: str | None,
+        budget: tuple[int, int] | None,
+        limit: int | None,
+        offset: int | None,
+        after: int | None,
     ) -> list[Price]:
-        holder = []
-        if _id:
-            holder.append([await self.get_by_id(_id)])
-        if state:
-            holder.append(await self.get_by_state(state))
-        if district:
-            holder.append(await self.get_by_district(district))
-        if market:
-            holder.append(await self.get_by_market(market))
-        if commodity:
-            holder.append(await self.get_by_commodity(commodity))
-        if initial and final:
-            holder.append(await self.get_by_budget(initial, final))
-        return self.intersection(holder)
+        index = self.database.prices.index
+        if _id and not index.get(_id):
+            self.logger.log(f"No commodity found with that id: {_id}", "error")
+            raise HTTPException(status_code=404, detail="No commodity found with that ID")
+        filters = {"STATE": state, "DISTRICT": district, "MARKET": market, "COMMODITY": commodity}
+        filters = {column: value for column, value in filters.items() if value}
+        for column, value in filters.items():
+            if not index.has(column, value):
+                name, _ = self.DIMENSIONS[column]
+                self.logger.log(f"No commodity found with that {name}: {value}", "error")
+                raise HTTPException(status_code=404, detail=f"No commodity found with that {name}.")
+        result = index.filter(filters, budget, _id or None, after, limit, offset)
+        self.logger.log(f"Found {len(result)} commodities in the price index", "info")
+        return result
+
+    async def get_stats(
+        self, dimension: Literal["state", "district", "market", "date"], commodity: str, value: str | None = None
+    ) -> Response:
+        column = self.STATISTICS[dimension]
+        rollup = self.database.prices.rollup
+        if rollup.loaded:
+            content = rollup.get(column, commodity, value)
+        else:
+            try:
+                rows = await self.database.prices.get_stats(column, commodity, value)
+            except ValueError:
+                rows = []
+            content = (orjson.dumps(rows[0]) if value is not None else orjson.dumps(rows)) if rows else None
+        if content is None:
+            self.logger.log(f"No price statistics found for {commodity} by {dimension}: {value}", "error")
+            raise HTTPException(
+                status_code=404,
+                detail=f"No price statistics found for that commodity and {dimension}. Please check the spelling.",
+            )
+        self.logger.log(f"Found price statistics for {commodity} by {dimension}", "info")
+        return Response(content=content, media_type="application/json")
+
+    async def get_nearby(
+        self,
+        commodity: str,
+        phonenumber: int | None = None,
+        state: str | None = None,
+        district: str | None = None,
+        radius: float = 100.0,
+        limit: int = 10,
+    ) -> list[NearbyPrice]:
+        if phonenumber is not None:
+            user = await self.database.users.get_user(phonenumber)
+            if not user:
+                self.logger.log(f"No user found with that number: {phonenumber}", "error")
+                raise HTTPException(status_code=404, detail="No user found with that phone number")
+            state, district = user.state, user.district
+        location = self.database.prices.locator.locate(state or "", district or "")
+        if location is None:
+            self.logger.log(f"No location known for district: {state}, {district}", "error")
+            raise HTTPException(status_code=404, detail="No location known for that state and district")
+        if not 0 < radius <= 1000:
+            raise HTTPException(status_code=422, detail="Radius must be between 0 and 1000 km")
+        result = await self.database.prices.get_nearby(commodity, *location, radius, limit)
+        if not result:
+            self.logger.log(f"No {commodity} prices found within {radius} km of {district}", "error")
+            raise HTTPException(
+                status_code=404, detail=f"No prices found for that commodity within {radius:g} km of {district}"
+            )
+        self.logger.log(f"Found {len(result)} nearby markets for {commodity} around {district}", "info")
+        return result
+
+    async def autocomplete(
+        self, dimension: Literal["state", "district", "market", "commodity"], query: str, limit: int = 10
+    ) -> list[str]:
+        if not 0 < limit <= 50:
+            raise HTTPException(status_code=422, detail="Limit must be between 1 and 50")
+        dimensions = await self.database.prices.get_dimensions()
+        result = dimensions.search[self.AUTOCOMPLETE[dimension]].complete(query, limit)
+        self.logger.log(f"Found {len(result)} {dimension} completions for: {query}", "info")
+        return result
 
     def setup(self) -> None:
         self.router.add_api_route("/prices/id", self.get_by_id, methods=["GET"], response_model=Price)
@@ -124,6 +289,13 @@ class AreanPrices:
         )
         self.router.add_api_route("/prices/budget", self.get_by_budget, methods=["GET"], response_model=list[Price])
         self.router.add_api_route("/prices/filter", self.get_items, methods=["GET"], response_model=list[Price])
+        self.router.add_api_route("/prices/nearby", self.get_nearby, methods=["GET"], response_model=list[NearbyPrice])
+        self.router.add_api_route(
+            "/prices/stats/{dimension}", self.get_stats, methods=["GET"], response_class=Response
+        )
+        self.router.add_api_route(
+            "/prices/autocomplete/{dimension}", self.autocomplete, methods=["GET"], response_model=list[str]
+        )
 
 
 async def setup(app: FastAPI, database: "Database", logger: "Logs") -> None:
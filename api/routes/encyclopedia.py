@@ -1,73 +1,120 @@
 import asyncio
-import json
 import math
 import os
+import time
 import typing
-from concurrent.futures import ThreadPoolExecutor
-from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from typing import TYPE_CHECKING
 
-import aiofiles
-import requests
+import aiohttp
+import orjson
 from bs4 import BeautifulSoup
-from fastapi import APIRouter, FastAPI
+from fastapi import APIRouter, FastAPI, Header, HTTPException
+from fastapi.responses import Response
 
-from api.utils import Classes, Divisions, Kingdom, Plant
+from api.utils import Classes, Divisions, Family, Genus, Kingdom, Plant, Taxon
+from api.utils.cache import MemoryBackend, ResponseCache, SqliteBackend
+from api.utils.fetch import fetch_json, fetch_pages
+from api.utils.taxonomy import Bundle, Taxonomy
 
 if TYPE_CHECKING:
     from api.setup import Database, Logs
 
 
+def describe(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    return "".join([i.text for i in soup.find_all("p") if i.text][:7])
+
+
 class Encyclopedia:
 
-    __slots__: tuple[str, ...] = ("database", "logger")
+    __slots__: tuple[str, ...] = (
+        "database",
+        "logger",
+        "workers",
+        "semaphore",
+        "descriptions",
+        "store",
+        "taxonomy",
+        "catalog",
+    )
     router: APIRouter = APIRouter()
     ENCYCLOPEDIA_ID: str = os.getenv("ENCYCLOPEDIA_ID")
     ENDPOINT: str = "https://api.floracodex.com/v1/"
+    WIKIPEDIA: str = "https://en.wikipedia.org/wiki/"
+    WIKIPEDIA_CONCURRENCY: int = int(os.getenv("WIKIPEDIA_CONCURRENCY", "10"))
+    WIKIPEDIA_TIMEOUT: float = float(os.getenv("WIKIPEDIA_TIMEOUT", "10"))
+    WIKIPEDIA_CACHE_SIZE: int = int(os.getenv("WIKIPEDIA_CACHE_SIZE", "2048"))
+    WIKIPEDIA_CACHE_PATH: str = os.getenv("WIKIPEDIA_CACHE_PATH", "wikipedia_cache.sqlite3")
+    WIKIPEDIA_STORE_SIZE: int = int(os.getenv("WIKIPEDIA_STORE_SIZE", "20000"))
+    PARSER_WORKERS: int = int(os.getenv("PARSER_WORKERS", "2"))
+    PAGE_CONCURRENCY: int = int(os.getenv("ENCYCLOPEDIA_PAGE_CONCURRENCY", "8"))
+    PAGE_RETRIES: int = int(os.getenv("ENCYCLOPEDIA_PAGE_RETRIES", "3"))
+    TAXONOMY_TTL: float = float(os.getenv("TAXONOMY_CACHE_TTL", "604800"))
+    FAMILIES: str = "api/bin/bio/families.json"
+    GENUS: str = "api/bin/bio/genus.json"
+    BUNDLE_MAX_AGE: int = int(os.getenv("TAXONOMY_BUNDLE_MAX_AGE", "86400"))
 
     def __init__(self, database: "Database", logger: "Logs") -> None:
         self.database = database
         self.logger = logger
-
-    @staticmethod
-    def parser(holder: list, data: dict[str, typing.Any]) -> None:
-        desc = requests.get(
-            f"https://en.wikipedia.org/wiki/{data.get('scientific_name').replace(' ', '_').capitalize()}"
+        self.workers = ProcessPoolExecutor(max_workers=self.PARSER_WORKERS)
+        self.semaphore = asyncio.Semaphore(self.WIKIPEDIA_CONCURRENCY)
+        self.descriptions = MemoryBackend(self.WIKIPEDIA_CACHE_SIZE)
+        self.store = SqliteBackend(self.WIKIPEDIA_CACHE_PATH, self.WIKIPEDIA_STORE_SIZE)
+        self.taxonomy = ResponseCache(
+            MemoryBackend(16),
+            dict.fromkeys(("kingdoms", "divisions", "classes", "orders"), self.TAXONOMY_TTL),
+            self.TAXONOMY_TTL,
         )
-        if desc.status_code != 200:
-            desc = requests.get(
-                f"https://en.wikipedia.org/wiki/{data.get('common_name').replace(' ', '_').capitalize()}"
-            )
-        soup = BeautifulSoup(desc.text, "html.parser")
-        try:
-            description = (
-                "".join([i.text for i in soup.find_all("p") if i.text][:7])
-                if desc.status_code == 200
-                else "No description found."
-            )
-        except AttributeError:
-            description = "No description found."
-        holder.append(
-            Plant(
-                **{
-                    "common_name": data.get("common_name"),
-                    "scientific_name": data.get("scientific_name"),
-                    "author": data.get("author"),
-                    "description": f"{description}... [{desc.url}]",
-                    "rank": data.get("rank"),
-                    "family": data.get("family"),
-                    "genus": data.get("genus"),
-                    "image": data.get("image_url"),
-                }
-            )
+
+    async def wikipedia(self, names: list[str]) -> tuple[str, str, int]:
+        url, status = "", 404
+        timeout = aiohttp.ClientTimeout(total=self.WIKIPEDIA_TIMEOUT)
+        for name in names:
+            async with self.semaphore:
+                try:
+                    response = await self.database.client.get(
+                        f"{self.WIKIPEDIA}{name.replace(' ', '_').capitalize()}", timeout=timeout
+                    )
+                    html = await response.text()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                    self.logger.log(f"Wikipedia lookup for {name} failed: {error!r}", "error")
+                    return "No description found.", url, 503
+            url, status = str(response.url), response.status
+            if status == 200:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.workers, describe, html), url, status
+        return "No description found.", url, status
+
+    async def parser(self, data: dict[str, typing.Any]) -> Plant:
+        names = [name for name in (data.get("scientific_name"), data.get("common_name")) if name]
+        key = "|".join(names).casefold()
+        entry = (await self.descriptions.get(key) or await self.store.get(key)) if key else None
+        if entry is not None:
+            description, url = orjson.loads(entry[1])
+            await self.descriptions.set(key, entry[0], entry[1])
+        else:
+            description, url, status = await self.wikipedia(names)
+            if key and status in (200, 404):
+                value, stored_at = orjson.dumps([description, url]), time.time()
+                await self.descriptions.set(key, stored_at, value)
+                await self.store.set(key, stored_at, value)
+        return Plant(
+            **{
+                "common_name": data.get("common_name"),
+                "scientific_name": data.get("scientific_name"),
+                "author": data.get("author"),
+                "description": f"{description}... [{url}]",
+                "rank": data.get("rank"),
+                "family": data.get("family"),
+                "genus": data.get("genus"),
+                "image": data.get("image_url"),
+            }
         )
 
-    @staticmethod
-    def processor(data: list[dict[str, typing.Any]]) -> list[Plant]:
-        holder: list[Plant] = []
-        with ThreadPoolExecutor(max_workers=10) as pool:
-            pool.map(partial(Encyclopedia.parser, holder), data)
-        return holder
+    async def processor(self, data: list[dict[str, typing.Any]]) -> list[Plant]:
+        return list(await asyncio.gather(*[self.parser(item) for item in data]))
 
     @staticmethod
     def parse_kingdoms(data: dict[str, typing.Any]) -> Kingdom:
@@ -101,63 +148,97 @@ class Encyclopedia:
             holder.setdefault(iname, []).append(order["name"])
         return holder
 
-    async def get_len(self, word: str, queries: str = "") -> tuple[dict, int]:
-        response = await self.database.client.get(f"{self.ENDPOINT}{word}?key={self.ENCYCLOPEDIA_ID}{queries}")
-        data = await response.json()
-        total = math.ceil(data["meta"]["total"] / len(data["data"]))
+    async def get_len(self, word: str, queries: typing.Optional[dict[str, str]] = None) -> tuple[dict, int]:
+        params = {"key": self.ENCYCLOPEDIA_ID, **(queries or {})}
+        data = await fetch_json(self.database.client, f"{self.ENDPOINT}{word}", params, self.PAGE_RETRIES)
+        total = math.ceil(data["meta"]["total"] / (len(data["data"]) or 1))
         return data, total
 
-    async def kingdoms(self) -> Kingdom:
-        response = await self.database.client.get(f"{self.ENDPOINT}subkingdoms?key={self.ENCYCLOPEDIA_ID}")
-        return self.parse_kingdoms(await response.json())
-
-    async def divisions(self) -> Divisions:
-        response = await self.database.client.get(f"{self.ENDPOINT}divisions?key={self.ENCYCLOPEDIA_ID}")
-        return self.parse_divisions(await response.json())
-
-    async def classes(self) -> Classes:
-        data, total = await self.get_len("division_classes")
-        for i in range(1, total):
-            response = await self.database.client.get(
-                f"{self.ENDPOINT}division_classes?key={self.ENCYCLOPEDIA_ID}&page={i}"
-            )
-            data["data"].extend((await response.json())["data"])
-        return self.parse_classes(data)
-
-    async def orders(self) -> dict[str, list[str]]:
-        data, total = await self.get_len("division_orders")
-        for i in range(1, total):
-            response = await self.database.client.get(
-                f"{self.ENDPOINT}division_orders?key={self.ENCYCLOPEDIA_ID}&page={i}"
-            )
-            data["data"].extend((await response.json())["data"])
-        return self.parse_orders(data)
-
-    @staticmethod
-    async def families() -> dict[str, list[str]] | None:
-        file = "api/bin/bio/families.json"
-        async with aiofiles.open(file, "r") as f:
-            data: dict[str, list[str]] = json.loads(await f.read())
+    async def paginate(self, word: str, queries: typing.Optional[dict[str, str]] = None) -> dict:
+        data, total = await self.get_len(word, queries)
+        pages = await fetch_pages(
+            self.database.client,
+            f"{self.ENDPOINT}{word}",
+            {"key": self.ENCYCLOPEDIA_ID, **(queries or {})},
+            range(2, total + 1),
+            self.PAGE_CONCURRENCY,
+            self.PAGE_RETRIES,
+        )
+        for page in pages:
+            data["data"].extend(page["data"])
         return data
 
-    @staticmethod
-    async def genus() -> dict[str, list[str]]:
-        file = "api/bin/bio/genus.json"
-        async with aiofiles.open(file, "r") as f:
-            data: dict[str, list[str]] = json.loads(await f.read())
-        return data
+    async def cached(self, endpoint: str, loader: typing.Callable[[], typing.Awaitable[typing.Any]]) -> Response:
+        async def encode() -> tuple[bytes, bool]:
+            return orjson.dumps(await loader()), True
+
+        return Response(content=await self.taxonomy.fetch(endpoint, endpoint, encode), media_type="application/json")
+
+    async def kingdoms(self) -> Response:
+        async def loader() -> Kingdom:
+            params = {"key": self.ENCYCLOPEDIA_ID}
+            return self.parse_kingdoms(await fetch_json(self.database.client, f"{self.ENDPOINT}subkingdoms", params))
+
+        return await self.cached("kingdoms", loader)
+
+    async def divisions(self) -> Response:
+        async def loader() -> Divisions:
+            params = {"key": self.ENCYCLOPEDIA_ID}
+            return self.parse_divisions(await fetch_json(self.database.client, f"{self.ENDPOINT}divisions", params))
+
+        return await self.cached("divisions", loader)
+
+    async def classes(self) -> Response:
+        async def loader() -> Classes:
+            return self.parse_classes(await self.paginate("division_classes"))
+
+        return await self.cached("classes", loader)
+
+    async def orders(self) -> Response:
+        async def loader() -> dict[str, list[str]]:
+            return self.parse_orders(await self.paginate("division_orders"))
+
+        return await self.cached("orders", loader)
+
+    async def load_catalog(self) -> None:
+        self.catalog = await Taxonomy.load(self.FAMILIES, self.GENUS)
+        self.logger.log(f"Loaded {len(self.catalog.names)} taxonomy names", "info")
+
+    def bundle(self, bundle: Bundle, if_none_match: str | None) -> Response:
+        headers = {"ETag": bundle.etag, "Cache-Control": f"public, max-age={self.BUNDLE_MAX_AGE}"}
+        if bundle.matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+        return Response(content=bundle.content, media_type="application/json", headers=headers)
+
+    async def families(self, if_none_match: str | None = Header(None)) -> Response:
+        return self.bundle(self.catalog.families, if_none_match)
+
+    async def genus(self, if_none_match: str | None = Header(None)) -> Response:
+        return self.bundle(self.catalog.genus, if_none_match)
+
+    async def lookup_genus(self, name: str) -> Genus:
+        result = self.catalog.lookup_genus(name)
+        if result is None:
+            self.logger.log(f"No genus found with name: {name}", "error")
+            raise HTTPException(status_code=404, detail="No genus found with that name")
+        return result
+
+    async def lookup_family(self, name: str) -> Family:
+        result = self.catalog.lookup_family(name)
+        if result is None:
+            self.logger.log(f"No family found with name: {name}", "error")
+            raise HTTPException(status_code=404, detail="No family found with that name")
+        return result
+
+    async def lookup_search(self, prefix: str, limit: int = 20) -> list[Taxon]:
+        return self.catalog.search(prefix, max(1, min(limit, 100)))
 
     async def search_plant(self, query: str) -> list[Plant]:
-        data, total = await self.get_len("plants/search", f"&q={query}")
-        for i in range(1, total):
-            response = await self.database.client.get(
-                f"{self.ENDPOINT}plants/search?key={self.ENCYCLOPEDIA_ID}&page={i}&q={query}"
-            )
-            data["data"].extend((await response.json())["data"])
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            None, partial(self.processor, [i for i in data["data"] if i["rank"] == "SPECIES"])
-        )
+        data = await self.paginate("plants/search", {"q": query})
+        return await self.processor([i for i in data["data"] if i["rank"] == "SPECIES"])
+
+    async def close(self) -> None:
+        self.workers.shutdown(wait=False, cancel_futures=True)
 
     def setup(self) -> None:
         self.router.add_api_route("/encyclopedia/kingdoms", self.kingdoms, methods=["GET"], response_model=Kingdom)
@@ -172,6 +253,15 @@ class Encyclopedia:
         self.router.add_api_route(
             "/encyclopedia/genus", self.genus, methods=["GET"], response_model=dict[str, list[str]]
         )
+        self.router.add_api_route(
+            "/encyclopedia/lookup/genus/{name}", self.lookup_genus, methods=["GET"], response_model=Genus
+        )
+        self.router.add_api_route(
+            "/encyclopedia/lookup/family/{name}", self.lookup_family, methods=["GET"], response_model=Family
+        )
+        self.router.add_api_route(
+            "/encyclopedia/lookup/search", self.lookup_search, methods=["GET"], response_model=list[Taxon]
+        )
         self.router.add_api_route(
             "/encyclopedia/search", self.search_plant, methods=["GET"], response_model=list[Plant]
         )
@@ -179,6 +269,8 @@ class Encyclopedia:
 
 async def setup(app: FastAPI, database: "Database", logger: "Logs") -> None:
     encyclopedia = Encyclopedia(database, logger)
+    await encyclopedia.load_catalog()
     encyclopedia.setup()
+    app.add_event_handler("shutdown", encyclopedia.close)
     app.include_router(encyclopedia.router, prefix="/api/v1", tags=["Encyclopedia"])
     logger.log("Encyclopedia routes loaded", "info")
@@ -1,21 +1,41 @@
-import base64
+import asyncio
+import hashlib
 import os
-from typing import TYPE_CHECKING
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Literal
 
-from fastapi import APIRouter, FastAPI, UploadFile
-from fastapi.responses import ORJSONResponse
+import orjson
+from fastapi import APIRouter, FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+
+from api.utils.cache import MemoryBackend, ResponseCache, SqliteBackend
+from api.utils.images import PreparedImage, prepare_image, read_upload, unpack_archive
 
 if TYPE_CHECKING:
     from api.setup import Database, Logs
 
 
 class Identifier:
-    __slots__: tuple[str, ...] = ("database", "logger")
+    __slots__: tuple[str, ...] = ("database", "logger", "workers", "digests", "cache")
     router: APIRouter = APIRouter()
-    ENDPOINT_INFO: str = "https://api.plant.id/v2/identify"
-    ENPOINT_DIAGNOSE: str = "https://api.plant.id/v2/health_assessment"
+    PLANT_ID_URL: str = os.getenv("PLANT_ID_URL", "https://api.plant.id/v2/")
+    ENDPOINT_INFO: str = f"{PLANT_ID_URL}identify"
+    ENPOINT_DIAGNOSE: str = f"{PLANT_ID_URL}health_assessment"
     API_TOKEN: str = os.getenv("PLANT_ID")
     HEADERS: dict[str, str] = {"Content-Type": "application/json", "Api-Key": API_TOKEN}
+    IMAGE_MAX_DIMENSION: int = int(os.getenv("IMAGE_MAX_DIMENSION", "1024"))
+    IMAGE_QUALITY: int = int(os.getenv("IMAGE_QUALITY", "85"))
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", "2"))
+    UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", str(15 * 1024 * 1024)))
+    CACHE_BACKEND: str = os.getenv("IDENTIFIER_CACHE_BACKEND", "memory")
+    CACHE_PATH: str = os.getenv("IDENTIFIER_CACHE_PATH", "identifier_cache.sqlite3")
+    CACHE_SIZE: int = int(os.getenv("IDENTIFIER_CACHE_SIZE", "512"))
+    CACHE_TTL: float = float(os.getenv("IDENTIFIER_CACHE_TTL", "2592000"))
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "8"))
+    BATCH_ITEM_TIMEOUT: float = float(os.getenv("BATCH_ITEM_TIMEOUT", "60"))
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "50"))
     INFO_DETAILS: list[str] = [
         "common_names",
         "edible_parts",
@@ -37,37 +57,144 @@ class Identifier:
         "url",
     ]
 
+    TARGETS: dict[str, tuple[str, list[str]]] = {
+        "identify": (ENDPOINT_INFO, INFO_DETAILS),
+        "diagnose": (ENPOINT_DIAGNOSE, DIAGNOSE_DETAILS),
+    }
+
     def __init__(self, database: "Database", logger: "Logs") -> None:
         self.database = database
         self.logger = logger
+        self.workers = ProcessPoolExecutor(max_workers=self.IMAGE_WORKERS)
+        self.digests = MemoryBackend(self.CACHE_SIZE * 4)
+        backend = (
+            SqliteBackend(self.CACHE_PATH, self.CACHE_SIZE, self.CACHE_TTL)
+            if self.CACHE_BACKEND == "sqlite"
+            else MemoryBackend(self.CACHE_SIZE)
+        )
+        self.cache = ResponseCache(backend, {"identify": self.CACHE_TTL, "diagnose": self.CACHE_TTL}, 0.0)
 
-    @staticmethod
-    async def encode_image(file: UploadFile) -> str:
-        return base64.b64encode(await file.read()).decode("ascii")
+    async def read(self, file: UploadFile) -> tuple[bytes, str]:
+        try:
+            return await read_upload(file, self.UPLOAD_MAX_BYTES)
+        except ValueError as error:
+            self.logger.log(f"Rejected upload {file.filename}: {error}", "error")
+            raise HTTPException(status_code=400, detail="Invalid or oversized image")
 
-    async def identify(self, file: UploadFile) -> ORJSONResponse:
-        response = await self.database.client.post(
-            self.ENDPOINT_INFO,
-            headers=self.HEADERS,
-            json={"images": [await self.encode_image(file)], "plant_details": self.INFO_DETAILS},
-        )
-        return ORJSONResponse(await response.json())
+    async def prepare(self, data: bytes, digest: str) -> PreparedImage:
+        loop = asyncio.get_running_loop()
+        try:
+            image: PreparedImage = await loop.run_in_executor(
+                self.workers, prepare_image, data, self.IMAGE_MAX_DIMENSION, self.IMAGE_QUALITY
+            )
+        except ValueError as error:
+            self.logger.log(f"Rejected image {digest[:12]}: {error}", "error")
+            raise HTTPException(status_code=400, detail="Invalid or oversized image")
+        await self.digests.set(digest, time.time(), image.digest.encode("ascii"))
+        self.logger.log(f"Prepared image {digest[:12]} ({len(data)} -> {len(image.content)} bytes)", "info")
+        return image
 
-    async def diagnose(self, file: UploadFile) -> ORJSONResponse:
-        response = await self.database.client.post(
-            self.ENPOINT_DIAGNOSE,
-            headers=self.HEADERS,
-            json={"images": [await self.encode_image(file)], "plant_details": self.DIAGNOSE_DETAILS},
-        )
-        return ORJSONResponse(await response.json())
+    async def analyse(self, endpoint: str, data: bytes, digest: str) -> bytes:
+        url, details = self.TARGETS[endpoint]
+        entry = await self.digests.get(digest)
+        image = None if entry else await self.prepare(data, digest)
+        key = entry[1].decode("ascii") if entry else image.digest
+
+        async def loader() -> tuple[bytes, bool]:
+            prepared = image or await self.prepare(data, digest)
+            response = await self.database.client.post(
+                url, headers=self.HEADERS, json={"images": [prepared.encoded], "plant_details": details}
+            )
+            self.logger.log(f"Requested {endpoint} for image {key[:12]} ({response.status})", "info")
+            return orjson.dumps(await response.json()), response.status in (200, 201)
+
+        return await self.cache.fetch(endpoint, f"{endpoint}|{key}", loader)
+
+    async def request(self, endpoint: str, file: UploadFile) -> Response:
+        data, digest = await self.read(file)
+        return Response(content=await self.analyse(endpoint, data, digest), media_type="application/json")
+
+    async def identify(self, file: UploadFile) -> Response:
+        return await self.request("identify", file)
+
+    async def diagnose(self, file: UploadFile) -> Response:
+        return await self.request("diagnose", file)
+
+    def reject(self, count: int) -> typing.NoReturn:
+        self.logger.log(f"Rejected batch of {count} images", "error")
+        raise HTTPException(status_code=422, detail=f"A batch must hold between 1 and {self.BATCH_MAX_ITEMS} images")
+
+    async def collect(self, files: list[UploadFile], archive: UploadFile | None) -> list[tuple[str, bytes]]:
+        remaining = self.BATCH_MAX_ITEMS - len(files)
+        if remaining < 0:
+            self.reject(len(files))
+        unpacked: list[tuple[str, bytes]] = []
+        if archive is not None:
+            data, _ = await self.read(archive)
+            try:
+                unpacked = await asyncio.to_thread(unpack_archive, data, self.UPLOAD_MAX_BYTES, remaining)
+            except ValueError as error:
+                self.logger.log(f"Rejected archive {archive.filename}: {error}", "error")
+                raise HTTPException(status_code=400, detail=f"Invalid archive: {error}")
+        items = [(file.filename, (await self.read(file))[0]) for file in files] + unpacked
+        if not items:
+            self.reject(0)
+        return items
+
+    async def run(self, semaphore: asyncio.Semaphore, name: str, endpoint: str, data: bytes) -> bytes:
+        head = b'{"file":' + orjson.dumps(name) + b',"endpoint":' + orjson.dumps(endpoint)
+        async with semaphore:
+            try:
+                digest = hashlib.sha256(data).hexdigest()
+                result = await asyncio.wait_for(self.analyse(endpoint, data, digest), self.BATCH_ITEM_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.logger.log(f"Timed out running {endpoint} for {name}", "error")
+                return head + b',"error":"Timed out"}\n'
+            except HTTPException as error:
+                return head + b',"error":' + orjson.dumps(error.detail) + b"}\n"
+            except Exception as error:
+                self.logger.log(f"Failed running {endpoint} for {name}: {error!r}", "error")
+                return head + b',"error":"Upstream request failed"}\n'
+        return head + b',"result":' + result + b"}\n"
+
+    async def results(self, jobs: list[tuple[str, str, bytes]]) -> typing.AsyncIterator[bytes]:
+        semaphore = asyncio.Semaphore(self.BATCH_CONCURRENCY)
+        tasks = [asyncio.create_task(self.run(semaphore, name, endpoint, data)) for name, endpoint, data in jobs]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def batch(
+        self,
+        files: list[UploadFile] = File([]),
+        archive: UploadFile | None = File(None),
+        mode: Literal["identify", "diagnose", "both"] = "both",
+    ) -> StreamingResponse:
+        items = await self.collect(files, archive)
+        endpoints = list(self.TARGETS) if mode == "both" else [mode]
+        jobs = [(name, endpoint, data) for name, data in items for endpoint in endpoints]
+        self.logger.log(f"Running {len(jobs)} batch jobs for {len(items)} images", "info")
+        return StreamingResponse(self.results(jobs), media_type="application/x-ndjson")
+
+    async def stats(self) -> dict[str, float]:
+        return self.cache.stats
+
+    async def close(self) -> None:
+        self.workers.shutdown(wait=False, cancel_futures=True)
 
     def setup(self) -> None:
         self.router.add_api_route("/upload/identify", self.identify, methods=["POST"], response_class=ORJSONResponse)
         self.router.add_api_route("/upload/diagnose", self.diagnose, methods=["POST"], response_class=ORJSONResponse)
+        self.router.add_api_route("/upload/batch", self.batch, methods=["POST"], response_class=StreamingResponse)
+        self.router.add_api_route("/upload/cache", self.stats, methods=["GET"], response_model=dict[str, float])
 
 
 async def setup(app: FastAPI, database: "Database", logger: "Logs") -> None:
     identifier = Identifier(database, logger)
     identifier.setup()
+    app.add_event_handler("shutdown", identifier.close)
     app.include_router(identifier.router, prefix="/api/v1", tags=["Lens"])
     logger.log("Identifier routes loaded", "info")
@@ -1,9 +1,10 @@
 from typing import TYPE_CHECKING
 
 import phonenumbers
-from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi import APIRouter, FastAPI, Header, HTTPException
+from fastapi.responses import Response
 
-from api.utils import User
+from api.utils import Profile, Token, User
 
 if TYPE_CHECKING:
     from api.setup import Database, Logs
@@ -22,47 +23,59 @@ class Login:
         if not phonenumbers.is_valid_number(number):
             self.logger.log(f"Invalid phone number: {phone_number}", "error")
             raise HTTPException(status_code=404, detail="Invalid phone number")
-        if state not in await self.database.prices.get_all_states:
-            self.logger.log(f"Invalid state: {state}", "error")
-            raise HTTPException(
-                status_code=404,
-                detail=f"Invalid state. Valid states are {', '.join(await self.database.prices.get_all_states)}",
-            )
-        if district not in await self.database.prices.get_all_districts:
-            self.logger.log(f"Invalid district: {district}", "error")
-            raise HTTPException(
-                status_code=404,
-                detail=f"Invalid district. Valid districts are {', '.join(await self.database.prices.get_districts_by_state(state))}",
-            )
+        dimensions = await self.database.prices.get_dimensions()
+        try:
+            self.database.users.check_location(dimensions, state, district)
+        except ValueError as error:
+            self.logger.log(f"Invalid location: {state}, {district}", "error")
+            raise HTTPException(status_code=404, detail=str(error))
         return True
 
-    async def get_messages(self, phone_number: int) -> dict[str, list[str]]:
-        messages = await self.database.users.get_user(phone_number)
+    async def get_messages(
+        self, phone_number: int, password: str | None = None, authorization: str | None = Header(None)
+    ) -> dict[str, list[str]]:
+        await self.authorize(phone_number, password, authorization)
+        messages = await self.database.messages.get_unread(phone_number)
         self.logger.log(f"Messages sent to user with phone number: {phone_number}", "info")
-        return {"messages": messages.message}
+        return {"messages": messages}
 
-    async def seen_message(self, phone_number: int) -> dict[str, str]:
-        await self.database.users.seen_message(phone_number)
+    async def seen_message(
+        self, phone_number: int, password: str | None = None, authorization: str | None = Header(None)
+    ) -> dict[str, str]:
+        await self.authorize(phone_number, password, authorization)
+        await self.database.messages.seen_message(phone_number)
         self.logger.log(f"User with phone number: {phone_number} marked message as seen", "info")
         return {"response": "Message marked as seen"}
 
-    async def get_user(self, phone_number: int) -> User:
+    async def get_user(self, phone_number: int) -> Profile:
         result: User = await self.database.users.get_user(phone_number)
         if not result:
             self.logger.log(f"No user found with that phone number: {phone_number}", "error")
             raise HTTPException(status_code=404, detail="No user found with that phone number")
         self.logger.log(f"Found user with phone number: {phone_number}", "info")
-        return result
+        return result.profile
 
-    async def login(self, phone_number: int, password: str) -> dict[str, bool]:
+    async def login(self, phone_number: int, password: str) -> Token:
         result = await self.database.users.login_user(phone_number, password)
         if not result:
             self.logger.log(f"Invalid password for user with phone number: {phone_number}", "error")
             raise HTTPException(status_code=404, detail="Invalid password for user with that phone number")
         self.logger.log(f"User with phone number: {phone_number} logged in", "info")
-        return {"found": True}
+        return result
 
-    async def register(self, phone_number: int, name: str, password: str, state: str, district: str) -> User:
+    async def authorize(self, phone_number: int, password: str | None, authorization: str | None) -> None:
+        principal = await self.database.users.auth.authenticate(authorization)
+        if principal is not None and principal.phone == phone_number:
+            return
+        if password is None or not await self.database.users.login_user(phone_number, password):
+            self.logger.log(f"Rejected credentials for user with phone number: {phone_number}", "error")
+            raise HTTPException(
+                status_code=401,
+                detail="Invalid token or password for user with that phone number",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+    async def register(self, phone_number: int, name: str, password: str, state: str, district: str) -> Profile:
         result = await self.validity_check(phone_number, state, district)
         if not result:
             raise HTTPException(status_code=404, detail="Invalid phone number, state or district")
@@ -72,57 +85,89 @@ class Login:
             raise HTTPException(status_code=404, detail="User with that phone number already exists")
         await self.database.users.register_user(User(phone_number, name, password, state, district))
         self.logger.log(f"User with phone number: {phone_number} registered", "info")
-        return await self.database.users.get_user(phone_number)
+        return await self.get_user(phone_number)
+
+    async def update_password(
+        self,
+        phone_number: int,
+        new_password: str,
+        old_password: str | None = None,
+        authorization: str | None = Header(None),
+    ) -> Profile:
+        return await self.update_profile(
+            phone_number, old_password, new_password=new_password, authorization=authorization
+        )
 
-    async def update_password(self, phone_number: int, old_password: str, new_password: str) -> User:
-        result = await self.database.users.login_user(phone_number, old_password)
-        if not result:
-            self.logger.log(f"Invalid password for user with phone number: {phone_number}", "error")
-            raise HTTPException(status_code=404, detail="Invalid password for user with that phone number")
-        await self.database.users.update_password(phone_number, new_password)
-        self.logger.log(f"User with phone number: {phone_number} updated password", "info")
-        return await self.database.users.get_user(phone_number)
+    async def update_location(
+        self,
+        phone_number: int,
+        state: str,
+        district: str,
+        password: str | None = None,
+        authorization: str | None = Header(None),
+    ) -> Profile:
+        return await self.update_profile(
+            phone_number, password, state=state, district=district, authorization=authorization
+        )
 
-    async def update_location(self, phone_number: int, password: str, state: str, district: str) -> User:
-        result = await self.database.users.login_user(phone_number, password)
-        if not result:
-            self.logger.log(f"Invalid password for user with phone number: {phone_number}", "error")
-            raise HTTPException(status_code=404, detail="Invalid password for user with that phone number")
-        await self.validity_check(phone_number, state, district)
-        await self.database.users.update_state(phone_number, state)
-        await self.database.users.update_district(phone_number, district)
-        self.logger.log(f"User with phone number: {phone_number} updated location", "info")
-        return await self.database.users.get_user(phone_number)
+    async def update_profile(
+        self,
+        phone_number: int,
+        password: str | None = None,
+        name: str | None = None,
+        new_password: str | None = None,
+        state: str | None = None,
+        district: str | None = None,
+        authorization: str | None = Header(None),
+    ) -> Profile:
+        await self.authorize(phone_number, password, authorization)
+        dimensions = await self.database.prices.get_dimensions()
+        try:
+            user = await self.database.users.update_profile(
+                phone_number, dimensions, name, new_password, state, district
+            )
+        except ValueError as error:
+            self.logger.log(f"Invalid location for user with phone number {phone_number}: {error}", "error")
+            raise HTTPException(status_code=404, detail=str(error))
+        if user is None:
+            self.logger.log(f"No user found with that phone number: {phone_number}", "error")
+            raise HTTPException(status_code=404, detail="No user found with that phone number")
+        self.logger.log(f"User with phone number: {phone_number} updated profile", "info")
+        return user.profile
 
-    async def delete_user(self, phone_number: int) -> None:
+    async def delete_user(
+        self, phone_number: int, password: str | None = None, authorization: str | None = Header(None)
+    ) -> None:
+        await self.authorize(phone_number, password, authorization)
         await self.database.users.delete_user(phone_number)
         self.logger.log(f"User with phone number: {phone_number} deleted", "info")
 
-    async def all_states(self) -> dict[str, list[str]]:
-        states = await self.database.prices.get_all_states
-        res = {i: await self.database.prices.get_districts_by_state(i) for i in states}
-        return res
+    async def all_states(self) -> Response:
+        dimensions = await self.database.prices.get_dimensions()
+        return Response(content=dimensions.regions, media_type="application/json")
 
-    async def all_markets(self) -> dict[str, list[str]]:
-        districts = await self.database.prices.get_all_districts
-        res = {i: await self.database.prices.get_markets_by_district(i) for i in districts}
-        return res
+    async def all_markets(self) -> Response:
+        dimensions = await self.database.prices.get_dimensions()
+        return Response(content=dimensions.markets, media_type="application/json")
 
     async def all_crops(self) -> dict[str, list[str]]:
         crops = await self.database.prices.get_all_commodities
         return {"crops": crops}
 
     def setup(self) -> None:
-        self.router.add_api_route("/register/login", self.login, methods=["GET"], response_model=dict[str, bool])
-        self.router.add_api_route("/register/register", self.register, methods=["GET"], response_model=User)
+        self.router.add_api_route("/register/login", self.login, methods=["GET"], response_model=Token)
+        self.router.add_api_route("/register/register", self.register, methods=["GET"], response_model=Profile)
+        self.router.add_api_route(
+            "/register/update_password", self.update_password, methods=["GET"], response_model=Profile
+        )
         self.router.add_api_route(
-            "/register/update_password", self.update_password, methods=["GET"], response_model=User
+            "/register/update_location", self.update_location, methods=["GET"], response_model=Profile
         )
         self.router.add_api_route(
-            "/register/update_location", self.update_location, methods=["GET"], response_model=User
+            "/register/update_profile", self.update_profile, methods=["GET"], response_model=Profile
         )
-        self.router.add_api_route("/register/delete_user", self.delete_user, methods=["GET"])
-        self.router.add_api_route("/register/info", self.get_user, methods=["GET"], response_model=User)
+        self.router.add_api_route("/register/delete_user", self.delete_user, methods=["DELETE"])
+        self.router.add_api_route("/register/info", self.get_user, methods=["GET"], response_model=Profile)
         self.router.add_api_route(
             "/register/reigons", self.all_states, methods=["GET"], response_model=dict[str, list[str]]
         )
@@ -136,7 +181,7 @@ class Login:
             "/register/get_messages", self.get_messages, methods=["GET"], response_model=dict[str, list[str]]
         )
         self.router.add_api_route(
-            "/register/seen_messages", self.seen_message, methods=["GET"], response_model=dict[str, str]
+            "/register/seen_messages", self.seen_message, methods=["POST"], response_model=dict[str, str]
         )
 
 
@@ -0,0 +1,186 @@
+import asyncio
+import hmac
+import os
+import typing
+from typing import TYPE_CHECKING
+
+import orjson
+from fastapi import APIRouter, FastAPI, Header, HTTPException
+from fastapi.responses import StreamingResponse
+
+from api.utils import BroadcastStatus, InboxPage, Message, Principal
+from api.utils.streaming import decode_cursor, encode_cursor
+
+if TYPE_CHECKING:
+    from api.setup import Database, Logs
+
+
+class Messages:
+
+    __slots__: tuple[str, ...] = ("database", "logger")
+    router: APIRouter = APIRouter()
+    SEGMENTS: dict[str, str] = {"STATE": "state", "DISTRICT": "district", "COMMODITY": "commodity"}
+    INBOX_MAX_LIMIT: int = 100
+    STREAM_KEEPALIVE: float = float(os.getenv("MESSAGE_STREAM_KEEPALIVE", "15"))
+    STREAM_REPLAY: int = int(os.getenv("MESSAGE_STREAM_REPLAY", "100"))
+    ADMIN_TOKEN: str | None = os.getenv("ADMIN_TOKEN")
+
+    def __init__(self, database: "Database", logger: "Logs") -> None:
+        self.database = database
+        self.logger = logger
+
+    def admin(self, authorization: str | None) -> None:
+        scheme, _, token = (authorization or "").partition(" ")
+        if (
+            not self.ADMIN_TOKEN
+            or scheme.lower() != "bearer"
+            or not hmac.compare_digest(token.strip().encode(), self.ADMIN_TOKEN.encode())
+        ):
+            self.logger.log("Rejected broadcast request without a valid admin token", "error")
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+
+    async def resolve(self, column: str, value: str | None) -> str | None:
+        if not value:
+            return None
+        dimensions = await self.database.prices.get_dimensions()
+        corrected = dimensions.correct(column, value)
+        if corrected is None:
+            name = self.SEGMENTS[column]
+            self.logger.log(f"Invalid broadcast {name}: {value}", "error")
+            suggestions = dimensions.suggest(column, value)
+            hint = f" Did you mean {', '.join(suggestions)}?" if suggestions else ""
+            raise HTTPException(status_code=404, detail=f"Invalid {name}.{hint}")
+        return corrected
+
+    async def broadcast(
+        self,
+        message: str,
+        state: str | None = None,
+        district: str | None = None,
+        commodity: str | None = None,
+        authorization: str | None = Header(None),
+    ) -> BroadcastStatus:
+        self.admin(authorization)
+        if not message.strip():
+            raise HTTPException(status_code=422, detail="Message must not be empty")
+        if not (state or district or commodity):
+            raise HTTPException(status_code=422, detail="At least one of state, district or commodity is required")
+        state = await self.resolve("STATE", state)
+        district = await self.resolve("DISTRICT", district)
+        commodity = await self.resolve("COMMODITY", commodity)
+        job = await self.database.messages.broadcast(message, state, district, commodity)
+        self.logger.log(
+            f"Broadcast {job.id} to {job.total} users in segment {state}/{district}/{commodity}: {job.status}", "info"
+        )
+        return job.snapshot
+
+    async def broadcast_status(self, job_id: str, authorization: str | None = Header(None)) -> BroadcastStatus:
+        self.admin(authorization)
+        job = self.database.messages.jobs.get(job_id)
+        if job is None:
+            self.logger.log(f"No broadcast found with id: {job_id}", "error")
+            raise HTTPException(status_code=404, detail="No broadcast found with that ID")
+        return job.snapshot
+
+    async def broadcasts(self, authorization: str | None = Header(None)) -> list[BroadcastStatus]:
+        self.admin(authorization)
+        return [job.snapshot for job in reversed(self.database.messages.jobs.values())]
+
+    async def principal(self, authorization: str | None) -> Principal:
+        principal = await self.database.users.auth.authenticate(authorization)
+        if principal is None:
+            self.logger.log("Rejected message request without a valid token", "error")
+            raise HTTPException(
+                status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"}
+            )
+        return principal
+
+    async def inbox(
+        self,
+        limit: int = 20,
+        cursor: str | None = None,
+        unread: bool = False,
+        authorization: str | None = Header(None),
+    ) -> InboxPage:
+        if not 0 < limit <= self.INBOX_MAX_LIMIT:
+            raise HTTPException(status_code=422, detail=f"Limit must be between 1 and {self.INBOX_MAX_LIMIT}")
+        try:
+            before = decode_cursor(cursor, "before") if cursor else None
+        except ValueError:
+            self.logger.log(f"Invalid cursor: {cursor}", "error")
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        phone_number = (await self.principal(authorization)).phone
+        messages = await self.database.messages.get_inbox(phone_number, limit + 1, before, unread)
+        following = encode_cursor(messages[limit - 1].ID, "before") if len(messages) > limit else None
+        count = await self.database.messages.count_unread(phone_number)
+        self.logger.log(f"Found {len(messages[:limit])} messages for user with phone number: {phone_number}", "info")
+        return InboxPage(messages[:limit], following, count)
+
+    async def unread(self, authorization: str | None = Header(None)) -> dict[str, int]:
+        phone_number = (await self.principal(authorization)).phone
+        return {"unread": await self.database.messages.count_unread(phone_number)}
+
+    async def mark_read(self, up_to: int, authorization: str | None = Header(None)) -> dict[str, int]:
+        phone_number = (await self.principal(authorization)).phone
+        marked = await self.database.messages.mark_read(phone_number, up_to)
+        self.logger.log(f"User with phone number: {phone_number} read {marked} messages up to {up_to}", "info")
+        return {"marked": marked, "unread": await self.database.messages.count_unread(phone_number)}
+
+    @staticmethod
+    def event(message: Message) -> bytes:
+        return b"id: %d\nevent: message\ndata: %s\n\n" % (message.ID, orjson.dumps(message))
+
+    async def events(self, phone_number: int, after: int | None) -> typing.AsyncIterator[bytes]:
+        hub = self.database.messages.hub
+        queue = hub.subscribe(phone_number)
+        try:
+            yield b"retry: 5000\n\n"
+            last = after or 0
+            if after is not None:
+                for message in await self.database.messages.get_after(phone_number, after, self.STREAM_REPLAY):
+                    last = message.ID
+                    yield self.event(message)
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), self.STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if message.ID > last:
+                    yield self.event(message)
+        finally:
+            hub.unsubscribe(phone_number, queue)
+            self.logger.log(f"Message stream closed for user with phone number: {phone_number}", "info")
+
+    async def stream(
+        self, last_event_id: int | None = Header(None), authorization: str | None = Header(None)
+    ) -> StreamingResponse:
+        phone_number = (await self.principal(authorization)).phone
+        self.logger.log(f"Message stream opened for user with phone number: {phone_number}", "info")
+        return StreamingResponse(
+            self.events(phone_number, last_event_id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    def setup(self) -> None:
+        self.router.add_api_route("/messages/stream", self.stream, methods=["GET"], response_class=StreamingResponse)
+        self.router.add_api_route("/messages/inbox", self.inbox, methods=["GET"], response_model=InboxPage)
+        self.router.add_api_route("/messages/unread", self.unread, methods=["GET"], response_model=dict[str, int])
+        self.router.add_api_route("/messages/read", self.mark_read, methods=["POST"], response_model=dict[str, int])
+        self.router.add_api_route(
+            "/messages/broadcast", self.broadcast, methods=["POST"], response_model=BroadcastStatus
+        )
+        self.router.add_api_route(
+            "/messages/broadcast", self.broadcasts, methods=["GET"], response_model=list[BroadcastStatus]
+        )
+        self.router.add_api_route(
+            "/messages/broadcast/{job_id}", self.broadcast_status, methods=["GET"], response_model=BroadcastStatus
+        )
+
+
+async def setup(app: FastAPI, database: "Database", logger: "Logs") -> None:
+    messages = Messages(database, logger)
+    messages.setup()
+    app.include_router(messages.router, prefix="/api/v1", tags=["Messages"])
+    logger.log("Messages routes loaded", "info")
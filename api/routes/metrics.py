@@ -0,0 +1,57 @@
+from typing import TYPE_CHECKING
+
+from fastapi import APIRouter, FastAPI
+
+if TYPE_CHECKING:
+    from api.setup import Database, Logs
+
+
+class Metrics:
+
+    __slots__: tuple[str, ...] = ("database", "logger")
+    router: APIRouter = APIRouter()
+
+    def __init__(self, database: "Database", logger: "Logs") -> None:
+        self.database = database
+        self.logger = logger
+
+    async def dimensions(self) -> dict[str, float]:
+        return self.database.prices.cache.stats
+
+    async def users(self) -> dict[str, float]:
+        return self.database.users.profiles.stats
+
+    async def queries(self) -> dict[str, dict[str, float]]:
+        return self.database.statements.stats
+
+    async def pool(self) -> dict[str, float]:
+        return self.database.pool_stats
+
+    async def replicas(self) -> dict[str, int]:
+        return self.database.replicas.stats
+
+    async def streams(self) -> dict[str, int]:
+        return self.database.messages.hub.stats
+
+    async def auth(self) -> dict[str, float]:
+        return self.database.users.auth.stats
+
+    def setup(self) -> None:
+        self.router.add_api_route(
+            "/metrics/dimensions", self.dimensions, methods=["GET"], response_model=dict[str, float]
+        )
+        self.router.add_api_route("/metrics/users", self.users, methods=["GET"], response_model=dict[str, float])
+        self.router.add_api_route("/metrics/auth", self.auth, methods=["GET"], response_model=dict[str, float])
+        self.router.add_api_route(
+            "/metrics/queries", self.queries, methods=["GET"], response_model=dict[str, dict[str, float]]
+        )
+        self.router.add_api_route("/metrics/pool", self.pool, methods=["GET"], response_model=dict[str, float])
+        self.router.add_api_route("/metrics/replicas", self.replicas, methods=["GET"], response_model=dict[str, int])
+        self.router.add_api_route("/metrics/streams", self.streams, methods=["GET"], response_model=dict[str, int])
+
+
+async def setup(app: FastAPI, database: "Database", logger: "Logs") -> None:
+    metrics = Metrics(database, logger)
+    metrics.setup()
+    app.include_router(metrics.router, prefix="/api/v1", tags=["Metrics"])
+    logger.log("Metrics routes loaded", "info")
@@ -1,6 +1,8 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Literal
 
+import numpy as np
 from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.responses import Response
 
 from api.utils import Production
 
@@ -15,15 +17,23 @@ class Produce:
         "logger",
     )
     router: APIRouter = APIRouter()
+    TOP_MAX_LIMIT: int = 100
 
     def __init__(self, database: "Database", logger: "Logs") -> None:
         self.database = database
         self.logger = logger
 
-    @staticmethod
-    def intersection(items: list[list[Production]]) -> list[Production]:
-        res = set.intersection(*map(lambda x: set([i.ID for i in x]), items))
-        return [i for i in sum(items, []) if i.ID in res]
+    def columns(self, start: int | None, end: int | None) -> slice:
+        try:
+            return self.database.production.matrix.columns(start, end)
+        except ValueError as error:
+            self.logger.log(f"Invalid year range {start}-{end}: {error}", "error")
+            raise HTTPException(status_code=422, detail=str(error))
+
+    def respond(self, positions: np.ndarray, years: np.ndarray, **series: np.ndarray) -> Response:
+        self.logger.log(f"Computed production analytics for {len(positions)} crops", "info")
+        content = self.database.production.matrix.encode(positions, years, **series)
+        return Response(content=content, media_type="application/json")
 
     async def get_by_crop(self, crop: str) -> list[Production]:
         result = await self.database.production.get_by_name(crop)
@@ -59,16 +69,88 @@ class Produce:
         return result
 
     async def get_produce(
-        self, crop: str | None = None, frequency: str | None = None, average: float | None = None
+        self,
+        crop: str | None = None,
+        frequency: str | None = None,
+        average: float | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        after: int | None = None,
     ) -> list[Production]:
-        holder = []
-        if crop:
-            holder.append(await self.get_by_crop(crop))
-        if frequency:
-            holder.append(await self.get_by_frequency(frequency))
-        if average:
-            holder.append(await self.get_avg_production(average))
-        return self.intersection(holder)
+        result = await self.database.production.get_filtered(crop, frequency, average, limit, offset, after)
+        self.logger.log(f"Found {len(result)} production data matching the filters", "info")
+        return result
+
+    async def get_stats(
+        self,
+        crop: str | None = None,
+        frequency: str | None = None,
+        start: int | None = None,
+        end: int | None = None,
+    ) -> Response:
+        matrix = self.database.production.matrix
+        columns = self.columns(start, end)
+        metrics = {name: matrix.metric(name, columns) for name in matrix.METRICS}
+        return self.respond(matrix.select(crop, frequency), matrix.years[columns], **metrics)
+
+    async def get_growth(
+        self,
+        crop: str | None = None,
+        frequency: str | None = None,
+        start: int | None = None,
+        end: int | None = None,
+    ) -> Response:
+        matrix = self.database.production.matrix
+        columns = self.columns(start, end)
+        return self.respond(matrix.select(crop, frequency), matrix.years[columns][1:], yoy=matrix.yoy(columns))
+
+    async def get_rolling(
+        self,
+        window: int = 3,
+        crop: str | None = None,
+        frequency: str | None = None,
+        start: int | None = None,
+        end: int | None = None,
+    ) -> Response:
+        matrix = self.database.production.matrix
+        columns = self.columns(start, end)
+        try:
+            rolling = matrix.rolling(window, columns)
+        except ValueError as error:
+            self.logger.log(f"Invalid rolling window {window}: {error}", "error")
+            raise HTTPException(status_code=422, detail=str(error))
+        return self.respond(matrix.select(crop, frequency), matrix.years[columns][window - 1 :], rolling=rolling)
+
+    async def get_top(
+        self,
+        metric: Literal["mean", "total", "latest", "cagr"] = "mean",
+        limit: int = 10,
+        ascending: bool = False,
+        frequency: str | None = None,
+        start: int | None = None,
+        end: int | None = None,
+    ) -> Response:
+        if not 0 < limit <= self.TOP_MAX_LIMIT:
+            raise HTTPException(status_code=422, detail=f"Limit must be between 1 and {self.TOP_MAX_LIMIT}")
+        matrix = self.database.production.matrix
+        columns = self.columns(start, end)
+        positions = matrix.rank(metric, columns, matrix.select(None, frequency), limit, ascending)
+        return self.respond(positions, matrix.years[columns], **{metric: matrix.metric(metric, columns)})
+
+    async def get_threshold(
+        self,
+        metric: Literal["mean", "total", "latest", "cagr"] = "mean",
+        minimum: float | None = None,
+        maximum: float | None = None,
+        crop: str | None = None,
+        frequency: str | None = None,
+        start: int | None = None,
+        end: int | None = None,
+    ) -> Response:
+        matrix = self.database.production.matrix
+        columns = self.columns(start, end)
+        positions = matrix.between(metric, columns, matrix.select(crop, frequency), minimum, maximum)
+        return self.respond(positions, matrix.years[columns], **{metric: matrix.metric(metric, columns)})
 
     def setup(self) -> None:
         self.router.add_api_route("/produce/crop", self.get_by_crop, methods=["GET"], response_model=list[Production])
@@ -81,6 +163,11 @@ class Produce:
         self.router.add_api_route(
             "/produce/filter", self.get_produce, methods=["GET"], response_model=list[Production]
         )
+        self.router.add_api_route("/produce/stats", self.get_stats, methods=["GET"], response_class=Response)
+        self.router.add_api_route("/produce/growth", self.get_growth, methods=["GET"], response_class=Response)
+        self.router.add_api_route("/produce/rolling", self.get_rolling, methods=["GET"], response_class=Response)
+        self.router.add_api_route("/produce/top", self.get_top, methods=["GET"], response_class=Response)
+        self.router.add_api_route("/produce/threshold", self.get_threshold, methods=["GET"], response_class=Response)
 
 
 async def setup(app: FastAPI, database: "Database", logger: "Logs") -> None:
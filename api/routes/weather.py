@@ -1,9 +1,12 @@
 import datetime
 import os
+import typing
 from typing import TYPE_CHECKING
 
-from fastapi import APIRouter, FastAPI, HTTPException
-from fastapi.responses import ORJSONResponse
+from fastapi import APIRouter, FastAPI, Header, HTTPException
+from fastapi.responses import ORJSONResponse, Response
+
+from api.utils.cache import MemoryBackend, ResponseCache, SqliteBackend
 
 if TYPE_CHECKING:
     from api.setup import Database, Logs
@@ -11,26 +14,68 @@ if TYPE_CHECKING:
 
 class Climate:
 
-    __slots__: tuple[str, ...] = ("database", "logger")
+    __slots__: tuple[str, ...] = ("database", "logger", "cache")
     router: APIRouter = APIRouter()
     WEATHER_API: str = os.getenv("WEATHER_ID")
     ENDPOINT: str = "https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/"
     POINTS: list[str] = ["timeline", "history", "historysummary"]
+    CACHE_BACKEND: str = os.getenv("WEATHER_CACHE_BACKEND", "memory")
+    CACHE_PATH: str = os.getenv("WEATHER_CACHE_PATH", "weather_cache.sqlite3")
+    CACHE_SIZE: int = int(os.getenv("WEATHER_CACHE_SIZE", "1024"))
+    CACHE_STALE: float = float(os.getenv("WEATHER_CACHE_STALE", "600"))
+    CACHE_TTLS: dict[str, float] = {
+        "forecast": float(os.getenv("WEATHER_CACHE_TTL_FORECAST", "1800")),
+        "history": float(os.getenv("WEATHER_CACHE_TTL_HISTORY", "86400")),
+        "timeline": float(os.getenv("WEATHER_CACHE_TTL_TIMELINE", "900")),
+        "daily": float(os.getenv("WEATHER_CACHE_TTL_DAILY", "900")),
+    }
 
     def __init__(self, database: "Database", logger: "Logs") -> None:
         self.database = database
         self.logger = logger
+        backend = (
+            SqliteBackend(self.CACHE_PATH, self.CACHE_SIZE, max(self.CACHE_TTLS.values()) + self.CACHE_STALE)
+            if self.CACHE_BACKEND == "sqlite"
+            else MemoryBackend(self.CACHE_SIZE)
+        )
+        self.cache = ResponseCache(backend, self.CACHE_TTLS, self.CACHE_STALE)
+
+    async def locate(self, phonenumber: int | None, location: str | None, authorization: str | None) -> str:
+        if location is not None:
+            return location
+        principal = await self.database.users.auth.authenticate(authorization)
+        if principal is not None:
+            return f"{principal.state}, {principal.district}"
+        if phonenumber is None:
+            self.logger.log("Weather requested without a location, phone number or session token", "error")
+            raise HTTPException(status_code=404, detail="A location, phone number or session token is required")
+        user = await self.database.users.get_user(phonenumber)
+        if not user:
+            self.logger.log(f"No user found with that number: {phonenumber}", "error")
+            raise HTTPException(status_code=404, detail="No user found with that username")
+        return f"{user.state}, {user.district}"
+
+    async def request(
+        self, endpoint: str, path: str, location: str, date: str, params: dict[str, typing.Any]
+    ) -> Response:
+        async def loader() -> tuple[bytes, bool]:
+            response = await self.database.client.get(self.ENDPOINT + path, params=params)
+            self.logger.log(f"Fetched {endpoint} weather for {location} ({response.status})", "info")
+            return await response.read(), response.status == 200
+
+        key = self.cache.key(endpoint, location, date, params)
+        return Response(content=await self.cache.fetch(endpoint, key, loader), media_type="application/json")
 
-    async def forecast(self, phonenumber: int, location: str | None = None) -> ORJSONResponse:
-        if location is None:
-            user = await self.database.users.get_user(phonenumber)
-            if not user:
-                self.logger.log(f"No user found with that number: {phonenumber}", "error")
-                raise HTTPException(status_code=404, detail="No user found with that username")
-            location = f"{user.state}, {user.district}"
-        response = await self.database.client.get(
-            self.ENDPOINT + "weatherdata/forecast",
-            params={
+    async def forecast(
+        self, phonenumber: int | None = None, location: str | None = None, authorization: str | None = Header(None)
+    ) -> Response:
+        location = await self.locate(phonenumber, location, authorization)
+        return await self.request(
+            "forecast",
+            "weatherdata/forecast",
+            location,
+            f"{datetime.datetime.now():%Y-%m-%d}",
+            {
                 "locations": location,
                 "aggregateHours": "24",
                 "forecastDays": "15",
@@ -41,18 +86,17 @@ class Climate:
                 "key": self.WEATHER_API,
             },
         )
-        return ORJSONResponse(await response.json())
-
-    async def history(self, phonenumber: int, location: str | None = None) -> ORJSONResponse:
-        if location is None:
-            user = await self.database.users.get_user(phonenumber)
-            if not user:
-                self.logger.log(f"No user found with that number: {phonenumber}", "error")
-                raise HTTPException(status_code=404, detail="No user found with that username")
-            location = f"{user.state}, {user.district}"
-        response = await self.database.client.get(
-            self.ENDPOINT + "weatherdata/history",
-            params={
+
+    async def history(
+        self, phonenumber: int | None = None, location: str | None = None, authorization: str | None = Header(None)
+    ) -> Response:
+        location = await self.locate(phonenumber, location, authorization)
+        return await self.request(
+            "history",
+            "weatherdata/history",
+            location,
+            f"{datetime.datetime.now():%Y-%m-%d}",
+            {
                 "key": self.WEATHER_API,
                 "location": location,
                 "aggregateHours": 24,
@@ -62,41 +106,51 @@ class Climate:
                 "contentType": "json",
             },
         )
-        return ORJSONResponse(await response.json())
-
-    async def timeline(self, phonenumber: int, location: str | None = None) -> ORJSONResponse:
 
+    async def timeline(
+        self, phonenumber: int | None = None, location: str | None = None, authorization: str | None = Header(None)
+    ) -> Response:
+        location = await self.locate(phonenumber, location, authorization)
         date = datetime.datetime.now().strftime("%Y-%m-%d")
-        response = await self.database.client.get(
-            self.ENDPOINT + f"timeline/{location}/{date}",
-            params={
+        return await self.request(
+            "timeline",
+            f"timeline/{location}/{date}",
+            location,
+            date,
+            {
                 "key": self.WEATHER_API,
                 "include": "fcst,obs,stats,hours,alerts",
                 "unitGroup": "metric",
                 "iconSet": "icons2",
             },
         )
-        return ORJSONResponse(await response.json())
-
-    async def daily(self, phonenumber: int, location: str | None = None, date: str | None = None) -> ORJSONResponse:
-        if location is None:
-            user = await self.database.users.get_user(phonenumber)
-            if not user:
-                self.logger.log(f"No user found with that number: {phonenumber}", "error")
-                raise HTTPException(status_code=404, detail="No user found with that username")
-            location = f"{user.state}, {user.district}"
+
+    async def daily(
+        self,
+        phonenumber: int | None = None,
+        location: str | None = None,
+        date: str | None = None,
+        authorization: str | None = Header(None),
+    ) -> Response:
+        location = await self.locate(phonenumber, location, authorization)
         date = date or f"{datetime.datetime.now():%Y-%m-%d}"
-        response = await self.database.client.get(
-            self.ENDPOINT + f"timeline/{location}/{date}",
-            params={"key": self.WEATHER_API, "unitGroup": "metric", "iconSet": "icons2"},
+        return await self.request(
+            "daily",
+            f"timeline/{location}/{date}",
+            location,
+            date,
+            {"key": self.WEATHER_API, "unitGroup": "metric", "iconSet": "icons2"},
         )
-        return ORJSONResponse(await response.json())
+
+    async def cache_stats(self) -> dict[str, float]:
+        return self.cache.stats
 
     def setup(self) -> None:
         self.router.add_api_route("/weather/forecast", self.forecast, methods=["GET"], response_class=ORJSONResponse)
         self.router.add_api_route("/weather/history", self.history, methods=["GET"], response_class=ORJSONResponse)
         self.router.add_api_route("/weather/timeline", self.timeline, methods=["GET"], response_class=ORJSONResponse)
         self.router.add_api_route("/weather/daily", self.daily, methods=["GET"], response_class=ORJSONResponse)
+        self.router.add_api_route("/weather/cache", self.cache_stats, methods=["GET"], response_model=dict[str, float])
 
 
 async def setup(app: FastAPI, database: "Database", logger: "Logs") -> None:
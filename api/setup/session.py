@@ -35,8 +35,8 @@ class API:
 
     def __init__(self) -> None:
         self.app = FastAPI(routes=self.routes)
-        self.database = Database()
         self.logger = Logs()
+        self.database = Database(self.logger)
         self.prepare()
 
     async def index(self, request: Request) -> typing.Any:
@@ -56,7 +56,7 @@ class API:
         form = dict(form.__dict__["_dict"])  # type: ignore
         message = f"{form['firstname']} {form['lastname']} {form['subject']}"
         num = int(form["phone"])
-        res = await self.database.users.add_message(num, message)
+        res = await self.database.messages.add_message(num, message)
         if not res:
             self.logger.log(f"User with phone number: {num} not found", "error")
             return HTMLResponse(content="<script>alert('User not found'); window.location.href = '/';</script>")
@@ -1,2 +1,21 @@
 from .database import AreaToPrices, Database
-from .models import Classes, Divisions, Kingdom, Plant, Price, Production, Sql, User
+from .models import (
+    BroadcastStatus,
+    Classes,
+    Divisions,
+    Family,
+    Genus,
+    InboxPage,
+    Kingdom,
+    Message,
+    NearbyPrice,
+    Plant,
+    Price,
+    Principal,
+    Production,
+    Profile,
+    Sql,
+    Taxon,
+    Token,
+    User,
+)
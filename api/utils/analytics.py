@@ -0,0 +1,145 @@
+import typing
+
+import asyncpg
+import numpy as np
+import orjson
+
+__all__: tuple[str, ...] = ("ProductionMatrix",)
+
+
+class ProductionMatrix:
+
+    __slots__: tuple[str, ...] = ("ids", "crops", "frequencies", "units", "values", "years", "loaded")
+    FIRST_YEAR: int = 1993
+    METRICS: tuple[str, ...] = ("mean", "total", "latest", "cagr")
+    ids: np.ndarray
+    crops: np.ndarray
+    frequencies: np.ndarray
+    units: np.ndarray
+    values: np.ndarray
+    years: np.ndarray
+    loaded: bool
+
+    def __init__(self) -> None:
+        self.ids = np.empty(0, dtype=np.int64)
+        self.crops = np.empty(0, dtype=str)
+        self.frequencies = np.empty(0, dtype=str)
+        self.units = np.empty(0, dtype=str)
+        self.values = np.empty((0, 0), dtype=np.float64)
+        self.years = np.empty(0, dtype=np.int64)
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def load(self, records: list[asyncpg.Record]) -> None:
+        records = sorted(records, key=lambda record: record[0])
+        width = max((len(record[4]) for record in records), default=0)
+        values = np.full((len(records), width), np.nan, dtype=np.float64)
+        for row, record in enumerate(records):
+            values[row, : len(record[4])] = record[4]
+        values[values == 0] = np.nan
+        self.ids = np.fromiter((record[0] for record in records), dtype=np.int64, count=len(records))
+        self.crops = np.array([record[1] for record in records], dtype=str)
+        self.frequencies = np.array([record[2] for record in records], dtype=str)
+        self.units = np.array([record[3] for record in records], dtype=str)
+        self.values = values
+        self.years = np.arange(self.FIRST_YEAR, self.FIRST_YEAR + width, dtype=np.int64)
+        self.loaded = True
+
+    def columns(self, start: int | None = None, end: int | None = None) -> slice:
+        if not len(self.years):
+            if start is None and end is None:
+                return slice(0, 0)
+            raise ValueError("No production years are loaded")
+        first, last = int(self.years[0]), int(self.years[-1])
+        start, end = start or first, end or last
+        if not first <= start <= end <= last:
+            raise ValueError(f"Years must be between {first} and {last}")
+        return slice(start - first, end - first + 1)
+
+    def select(self, crop: str | None = None, frequency: str | None = None) -> np.ndarray:
+        mask = np.ones(len(self.ids), dtype=bool)
+        if crop:
+            mask &= np.char.find(self.crops, crop) >= 0
+        if frequency:
+            mask &= np.char.endswith(self.crops, frequency)
+        return np.flatnonzero(mask)
+
+    def metric(self, name: str, columns: slice) -> np.ndarray:
+        block = self.values[:, columns]
+        present = ~np.isnan(block)
+        counts = present.sum(axis=1)
+        result = np.full(len(block), np.nan)
+        valid = counts > 0
+        if name == "mean":
+            np.divide(np.nansum(block, axis=1), counts, out=result, where=valid)
+        elif name == "total":
+            result[valid] = np.nansum(block, axis=1)[valid]
+        elif name == "latest":
+            last = block.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+            result[valid] = block[valid, last[valid]]
+        elif name == "cagr":
+            first = np.argmax(present, axis=1)
+            last = block.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+            rows = np.arange(len(block))
+            span = last - first
+            start, end = block[rows, first], block[rows, last]
+            growing = valid & (span > 0) & (start > 0) & (end > 0)
+            result[growing] = (end[growing] / start[growing]) ** (1 / span[growing]) - 1
+        else:
+            raise ValueError(f"Unknown metric {name}")
+        return result
+
+    def yoy(self, columns: slice) -> np.ndarray:
+        block = self.values[:, columns]
+        growth: np.ndarray = block[:, 1:] / block[:, :-1] - 1
+        return growth
+
+    def rolling(self, window: int, columns: slice) -> np.ndarray:
+        block = self.values[:, columns]
+        if not 1 <= window <= block.shape[1]:
+            raise ValueError(f"Window must be between 1 and {block.shape[1]}")
+        padding = np.zeros((len(block), 1))
+        sums = np.concatenate((padding, np.cumsum(np.nan_to_num(block), axis=1)), axis=1)
+        counts = np.concatenate((padding, np.cumsum(~np.isnan(block), axis=1)), axis=1)
+        sums, counts = sums[:, window:] - sums[:, :-window], counts[:, window:] - counts[:, :-window]
+        result = np.full(sums.shape, np.nan)
+        np.divide(sums, counts, out=result, where=counts > 0)
+        return result
+
+    def rank(self, name: str, columns: slice, positions: np.ndarray, limit: int, ascending: bool) -> np.ndarray:
+        scores = self.metric(name, columns)[positions]
+        positions = positions[~np.isnan(scores)]
+        scores = scores[~np.isnan(scores)]
+        order = np.argsort(scores if ascending else -scores, kind="stable")
+        ranked: np.ndarray = positions[order[:limit]]
+        return ranked
+
+    def between(
+        self,
+        name: str,
+        columns: slice,
+        positions: np.ndarray,
+        minimum: float | None = None,
+        maximum: float | None = None,
+    ) -> np.ndarray:
+        scores = self.metric(name, columns)[positions]
+        mask = ~np.isnan(scores)
+        if minimum is not None:
+            mask &= scores >= minimum
+        if maximum is not None:
+            mask &= scores <= maximum
+        selected: np.ndarray = positions[mask]
+        return selected
+
+    def encode(self, positions: np.ndarray, years: np.ndarray, **series: np.ndarray) -> bytes:
+        body: dict[str, typing.Any] = {
+            "years": years,
+            "ID": self.ids[positions],
+            "CROP": self.crops[positions].tolist(),
+            "FREQUENCY": self.frequencies[positions].tolist(),
+            "UNIT": self.units[positions].tolist(),
+        }
+        body.update({name: values[positions] for name, values in series.items()})
+        return orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY)
@@ -0,0 +1,170 @@
+import asyncio
+import base64
+import binascii
+import collections
+import hashlib
+import hmac
+import secrets
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+
+from .models import Principal, Token
+
+__all__: tuple[str, ...] = ("Authenticator", "hash_password", "verify_password")
+
+SCHEME: str = "scrypt"
+
+Load = typing.Callable[[int], typing.Awaitable[Principal | None]]
+
+
+def _encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def hash_password(password: str, n: int = 2**14, r: int = 8, p: int = 1) -> str:
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=32)
+    return f"{SCHEME}${n}${r}${p}${_encode(salt)}${_encode(digest)}"
+
+
+def verify_password(password: str, stored: str) -> tuple[bool, bool]:
+    scheme, _, parameters = stored.partition("$")
+    if scheme != SCHEME:
+        return hmac.compare_digest(password.encode(), stored.encode()), True
+    try:
+        n, r, p, salt, expected = parameters.split("$")
+        digest = hashlib.scrypt(
+            password.encode(), salt=_decode(salt), n=int(n), r=int(r), p=int(p), maxmem=256 * int(n) * int(r), dklen=32
+        )
+    except (ValueError, binascii.Error):
+        return False, False
+    return hmac.compare_digest(digest, _decode(expected)), False
+
+
+class Authenticator:
+
+    __slots__: tuple[str, ...] = (
+        "secret",
+        "load",
+        "lifetime",
+        "cost",
+        "size",
+        "ttl",
+        "executor",
+        "principals",
+        "generation",
+        "hits",
+        "misses",
+    )
+    secret: bytes
+    load: Load
+    lifetime: float
+    cost: int
+    size: int
+    ttl: float
+    executor: ThreadPoolExecutor
+    principals: collections.OrderedDict[int, tuple[float, Principal]]
+    generation: int
+    hits: int
+    misses: int
+
+    def __init__(
+        self, secret: str, load: Load, lifetime: float, cost: int, workers: int, size: int, ttl: float
+    ) -> None:
+        self.secret = secret.encode()
+        self.load = load
+        self.lifetime = lifetime
+        self.cost = cost
+        self.size = size
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auth")
+        self.principals = collections.OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, hash_password, password, self.cost)
+
+    async def verify(self, password: str, stored: str) -> tuple[bool, bool]:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, verify_password, password, stored)
+
+    def fingerprint(self, stored: str) -> str:
+        return hashlib.blake2b(stored.encode(), key=self.secret, digest_size=6).hexdigest()
+
+    def sign(self, payload: bytes) -> str:
+        return _encode(hmac.new(self.secret, payload, hashlib.sha256).digest())
+
+    def issue(self, phone: int, stored: str) -> Token:
+        expires = int(time.time() + self.lifetime)
+        payload = orjson.dumps({"sub": phone, "exp": expires, "key": self.fingerprint(stored)})
+        return Token(f"{_encode(payload)}.{self.sign(payload)}", float(expires))
+
+    def decode(self, token: str) -> tuple[int, str] | None:
+        body, _, signature = token.partition(".")
+        try:
+            payload = _decode(body)
+            if not hmac.compare_digest(signature, self.sign(payload)):
+                return None
+            claims = orjson.loads(payload)
+            if claims["exp"] < time.time():
+                return None
+            return int(claims["sub"]), str(claims["key"])
+        except (binascii.Error, orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+            return None
+
+    async def principal(self, phone: int) -> Principal | None:
+        entry = self.principals.get(phone)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            self.principals.move_to_end(phone)
+            return entry[1]
+        self.misses += 1
+        generation = self.generation
+        principal = await self.load(phone)
+        if principal is None:
+            self.principals.pop(phone, None)
+            return None
+        if generation != self.generation:
+            return principal
+        self.principals[phone] = (time.monotonic() + self.ttl, principal)
+        self.principals.move_to_end(phone)
+        while len(self.principals) > self.size:
+            self.principals.popitem(last=False)
+        return principal
+
+    async def authenticate(self, authorization: str | None) -> Principal | None:
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        claims = self.decode(token.strip())
+        if claims is None:
+            return None
+        principal = await self.principal(claims[0])
+        if principal is None or not hmac.compare_digest(principal.key, claims[1]):
+            return None
+        return principal
+
+    def invalidate(self, phone: int) -> None:
+        self.generation += 1
+        self.principals.pop(phone, None)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+
+    @property
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "size": len(self.principals),
+        }
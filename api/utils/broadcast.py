@@ -0,0 +1,83 @@
+import asyncio
+import time
+import typing
+import uuid
+
+from .models import BroadcastStatus
+
+__all__: tuple[str, ...] = ("BroadcastJob",)
+
+
+class BroadcastJob:
+
+    __slots__: tuple[str, ...] = (
+        "id",
+        "message",
+        "state",
+        "district",
+        "commodity",
+        "status",
+        "total",
+        "delivered",
+        "cursor",
+        "created",
+        "finished",
+        "error",
+        "task",
+    )
+    id: str
+    message: str
+    state: str | None
+    district: str | None
+    commodity: str | None
+    status: str
+    total: int
+    delivered: int
+    cursor: int | None
+    created: float
+    finished: float | None
+    error: str | None
+    task: typing.Optional[asyncio.Task]
+
+    def __init__(
+        self, message: str, state: str | None, district: str | None, commodity: str | None, total: int
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        self.message = message
+        self.state = state
+        self.district = district
+        self.commodity = commodity
+        self.status = "queued"
+        self.total = total
+        self.delivered = 0
+        self.cursor = None
+        self.created = time.time()
+        self.finished = None
+        self.error = None
+        self.task = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def finish(self, status: str, error: str | None = None) -> None:
+        self.status = status
+        self.error = error
+        self.finished = time.time()
+
+    @property
+    def snapshot(self) -> BroadcastStatus:
+        progress = min(self.delivered / self.total, 1.0) if self.total else 1.0
+        return BroadcastStatus(
+            self.id,
+            self.state,
+            self.district,
+            self.commodity,
+            self.status,
+            self.total,
+            self.delivered,
+            round(progress, 4),
+            self.created,
+            self.finished,
+            self.error,
+        )
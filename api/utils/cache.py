@@ -0,0 +1,342 @@
+import asyncio
+import collections
+import sqlite3
+import time
+import typing
+from dataclasses import dataclass
+
+import asyncpg
+import orjson
+
+from .models import User
+from .search import TrigramIndex
+
+__all__: tuple[str, ...] = (
+    "DimensionCache",
+    "Dimensions",
+    "MemoryBackend",
+    "ProfileCache",
+    "ResponseCache",
+    "SqliteBackend",
+)
+
+
+@dataclass(frozen=True)
+class Dimensions:
+    values: dict[str, list[str]]
+    members: dict[str, frozenset[str]]
+    state_districts: dict[str, frozenset[str]]
+    district_markets: dict[str, frozenset[str]]
+    regions: bytes
+    markets: bytes
+    search: dict[str, TrigramIndex]
+
+    @classmethod
+    def from_records(cls, locations: list[asyncpg.Record], commodities: list[asyncpg.Record]) -> "Dimensions":
+        state_districts: dict[str, set[str]] = {}
+        district_markets: dict[str, set[str]] = {}
+        for state, district, markets in locations:
+            state_districts.setdefault(state, set()).add(district)
+            district_markets.setdefault(district, set()).update(markets)
+        members = {
+            "STATE": frozenset(state_districts),
+            "DISTRICT": frozenset(district_markets),
+            "MARKET": frozenset(market for markets in district_markets.values() for market in markets),
+            "COMMODITY": frozenset(row[0] for row in commodities),
+        }
+        return cls(
+            values={column: sorted(values) for column, values in members.items()},
+            members=members,
+            state_districts={state: frozenset(districts) for state, districts in state_districts.items()},
+            district_markets={district: frozenset(markets) for district, markets in district_markets.items()},
+            regions=orjson.dumps({state: sorted(districts) for state, districts in sorted(state_districts.items())}),
+            markets=orjson.dumps(
+                {district: sorted(markets) for district, markets in sorted(district_markets.items())}
+            ),
+            search={column: TrigramIndex(values) for column, values in members.items()},
+        )
+
+    def has(self, column: str, value: str) -> bool:
+        return value in self.members[column]
+
+    def correct(self, column: str, value: str) -> str | None:
+        return value if value in self.members[column] else self.search[column].correct(value)
+
+    def suggest(self, column: str, value: str, limit: int = 5) -> list[str]:
+        return self.search[column].suggest(value, limit)
+
+
+class DimensionCache:
+
+    __slots__: tuple[str, ...] = ("ttl", "dimensions", "expires", "hits", "misses", "lock")
+    ttl: float
+    dimensions: typing.Optional[Dimensions]
+    expires: float
+    hits: int
+    misses: int
+    lock: asyncio.Lock
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self.dimensions = None
+        self.expires = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.lock = asyncio.Lock()
+
+    @property
+    def fresh(self) -> bool:
+        return self.dimensions is not None and time.monotonic() < self.expires
+
+    async def get(self, loader: typing.Callable[[], typing.Awaitable[Dimensions]]) -> Dimensions:
+        if not self.fresh:
+            async with self.lock:
+                if not self.fresh:
+                    self.misses += 1
+                    self.dimensions = await loader()
+                    self.expires = time.monotonic() + self.ttl
+                    return self.dimensions
+        self.hits += 1
+        return self.dimensions
+
+    def invalidate(self) -> None:
+        self.expires = 0.0
+
+    @property
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "ttl": self.ttl,
+        }
+
+
+class MemoryBackend:
+
+    __slots__: tuple[str, ...] = ("entries", "capacity")
+    entries: collections.OrderedDict[str, tuple[float, bytes]]
+    capacity: int
+
+    def __init__(self, capacity: int) -> None:
+        self.entries = collections.OrderedDict()
+        self.capacity = capacity
+
+    async def get(self, key: str) -> typing.Optional[tuple[float, bytes]]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, stored_at: float, value: bytes) -> None:
+        self.entries[key] = (stored_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+
+class SqliteBackend:
+
+    __slots__: tuple[str, ...] = ("connection", "lock", "capacity", "max_age")
+    connection: sqlite3.Connection
+    lock: asyncio.Lock
+    capacity: int
+    max_age: float | None
+
+    def __init__(self, path: str, capacity: int, max_age: float | None = None) -> None:
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (KEY TEXT PRIMARY KEY, STORED_AT REAL NOT NULL, VALUE BLOB NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_stored_at ON responses (STORED_AT)")
+        self.lock = asyncio.Lock()
+        self.capacity = capacity
+        self.max_age = max_age
+
+    def _get(self, key: str) -> typing.Optional[tuple[float, bytes]]:
+        row = self.connection.execute("SELECT STORED_AT, VALUE FROM responses WHERE KEY = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _set(self, key: str, stored_at: float, value: bytes) -> None:
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, stored_at, value))
+            if self.max_age is not None:
+                self.connection.execute("DELETE FROM responses WHERE STORED_AT < ?", (stored_at - self.max_age,))
+            self.connection.execute(
+                "DELETE FROM responses WHERE KEY IN "
+                "(SELECT KEY FROM responses ORDER BY STORED_AT DESC LIMIT -1 OFFSET ?)",
+                (self.capacity,),
+            )
+
+    async def get(self, key: str) -> typing.Optional[tuple[float, bytes]]:
+        async with self.lock:
+            return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, stored_at: float, value: bytes) -> None:
+        async with self.lock:
+            await asyncio.to_thread(self._set, key, stored_at, value)
+
+
+class ResponseCache:
+
+    __slots__: tuple[str, ...] = ("backend", "ttls", "stale", "inflight", "hits", "stale_hits", "misses", "coalesced")
+    backend: MemoryBackend | SqliteBackend
+    ttls: dict[str, float]
+    stale: float
+    inflight: dict[str, asyncio.Task]
+    hits: int
+    stale_hits: int
+    misses: int
+    coalesced: int
+
+    def __init__(self, backend: MemoryBackend | SqliteBackend, ttls: dict[str, float], stale: float) -> None:
+        self.backend = backend
+        self.ttls = ttls
+        self.stale = stale
+        self.inflight = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(endpoint: str, location: str, date: str, params: dict[str, typing.Any]) -> str:
+        place = ",".join(" ".join(part.split()) for part in location.casefold().split(","))
+        query = "&".join(
+            f"{name}={value}" for name, value in sorted(params.items()) if name not in ("key", "location", "locations")
+        )
+        return f"{endpoint}|{place}|{date}|{query}"
+
+    async def fetch(
+        self,
+        endpoint: str,
+        key: str,
+        loader: typing.Callable[[], typing.Awaitable[tuple[bytes, bool]]],
+    ) -> bytes:
+        entry = await self.backend.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            age = time.time() - stored_at
+            if age < self.ttls[endpoint]:
+                self.hits += 1
+                return value
+            if age < self.ttls[endpoint] + self.stale:
+                self.stale_hits += 1
+                self.single_flight(key, loader)
+                return value
+        self.misses += 1
+        return await asyncio.shield(self.single_flight(key, loader))
+
+    def single_flight(
+        self, key: str, loader: typing.Callable[[], typing.Awaitable[tuple[bytes, bool]]]
+    ) -> asyncio.Task:
+        task = self.inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        task = asyncio.create_task(self.load(key, loader))
+        self.inflight[key] = task
+        task.add_done_callback(lambda _: self.finish(key, task))
+        return task
+
+    def finish(self, key: str, task: asyncio.Task) -> None:
+        self.inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    async def load(self, key: str, loader: typing.Callable[[], typing.Awaitable[tuple[bytes, bool]]]) -> bytes:
+        value, cacheable = await loader()
+        if cacheable:
+            await self.backend.set(key, time.time(), value)
+        return value
+
+    @property
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self.inflight),
+            "hit_ratio": (self.hits + self.stale_hits) / total if total else 0.0,
+        }
+
+
+class ProfileCache:
+
+    __slots__: tuple[str, ...] = (
+        "entries",
+        "capacity",
+        "ttl",
+        "generation",
+        "hits",
+        "misses",
+        "evictions",
+        "expirations",
+        "invalidations",
+    )
+    entries: collections.OrderedDict[int, tuple[float, User]]
+    capacity: int
+    ttl: float
+    generation: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+
+    def __init__(self, capacity: int, ttl: float) -> None:
+        self.entries = collections.OrderedDict()
+        self.capacity = capacity
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    async def get(self, key: int, loader: typing.Callable[[], typing.Awaitable[User | None]]) -> User | None:
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry[1]
+            self.expirations += 1
+            del self.entries[key]
+        self.misses += 1
+        generation = self.generation
+        user = await loader()
+        if user is not None and generation == self.generation:
+            self.put(user)
+        return user
+
+    def put(self, user: User) -> None:
+        self.entries[user.phone] = (time.monotonic() + self.ttl, user)
+        self.entries.move_to_end(user.phone)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: int) -> None:
+        self.generation += 1
+        if self.entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    @property
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "ttl": self.ttl,
+        }
@@ -1,12 +1,32 @@
 import asyncio
+import collections
+import contextlib
+import dataclasses
+import datetime
 import os
+import secrets
+import time
+import typing
 
 import aiohttp
 import asyncpg
-import pandas as pd
 
-from .models import Price, Production, Sql, User
-from .postgres import DatabaseModel
+from .analytics import ProductionMatrix
+from .auth import Authenticator
+from .broadcast import BroadcastJob
+from .cache import DimensionCache, Dimensions, ProfileCache
+from .geo import MarketLocator
+from .index import PriceIndex
+from .loader import CsvLoader, parse_price, parse_production
+from .models import Message, NearbyPrice, Price, Principal, Production, Sql, Token, User
+from .notifications import MessageHub
+from .postgres import DatabaseModel, Listener, PreparedConnection, Query, StatementRegistry
+from .replicas import ReplicaSet
+from .rollup import PriceRollup
+from .search import TrigramIndex
+
+if typing.TYPE_CHECKING:
+    from api.setup import Logs
 
 __all__: tuple[str, ...] = (
     "AreaToPrices",
@@ -16,56 +36,156 @@ __all__: tuple[str, ...] = (
 
 class Database:
 
-    __slots__: tuple[str, ...] = ("prices", "pool", "LINK", "users", "production", "client")
+    __slots__: tuple[str, ...] = (
+        "prices",
+        "pool",
+        "LINK",
+        "users",
+        "messages",
+        "production",
+        "client",
+        "listener",
+        "statements",
+        "replicas",
+        "logger",
+    )
     pool: asyncpg.pool.Pool
     LINK: str
     client: aiohttp.ClientSession
-
-    def __init__(self) -> None:
+    listener: Listener
+    statements: StatementRegistry
+    replicas: ReplicaSet
+    logger: "Logs"
+    POOL_MIN_SIZE: int = int(os.getenv("DATABASE_POOL_MIN_SIZE", "2"))
+    POOL_MAX_SIZE: int = int(os.getenv("DATABASE_POOL_MAX_SIZE", "10"))
+    POOL_MAX_QUERIES: int = int(os.getenv("DATABASE_POOL_MAX_QUERIES", "50000"))
+    POOL_MAX_INACTIVE_LIFETIME: float = float(os.getenv("DATABASE_POOL_MAX_INACTIVE_LIFETIME", "300"))
+    STATEMENT_CACHE_SIZE: int = int(os.getenv("DATABASE_STATEMENT_CACHE_SIZE", "100"))
+    PREPARED_STATEMENTS: int = int(os.getenv("DATABASE_PREPARED_STATEMENTS", "64"))
+    COMMAND_TIMEOUT: float | None = float(os.getenv("DATABASE_COMMAND_TIMEOUT", "0")) or None
+    REPLICA_URLS: list[str] = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    REPLICA_CHECK_INTERVAL: float = float(os.getenv("DATABASE_REPLICA_CHECK_INTERVAL", "5"))
+    REPLICA_CHECK_TIMEOUT: float = float(os.getenv("DATABASE_REPLICA_CHECK_TIMEOUT", "2"))
+
+    def __init__(self, logger: "Logs") -> None:
+        self.logger = logger
         self.prices = AreaToPrices()
         self.users = Register()
+        self.messages = Mailbox()
         self.production = Produce()
+        self.listener = Listener(logger)
+        self.statements = StatementRegistry(min(self.PREPARED_STATEMENTS, self.STATEMENT_CACHE_SIZE))
         self.LINK = os.environ.get("DATABASE_URL")
 
+    async def create_pool(self, dsn: str | None = None) -> asyncpg.pool.Pool:
+        connection: dict[str, typing.Any]
+        if dsn is None:
+            connection = {
+                "host": os.environ.get("DATABASE_HOST"),
+                "port": os.environ.get("DATABASE_PORT"),
+                "user": os.environ.get("DATABASE_USER"),
+                "password": os.environ.get("DATABASE_PASSWORD"),
+                "database": os.environ.get("DATABASE_NAME"),
+            }
+        else:
+            connection = {"dsn": dsn, "timeout": self.REPLICA_CHECK_TIMEOUT}
+        return await asyncpg.create_pool(
+            **connection,
+            min_size=self.POOL_MIN_SIZE if dsn is None else 0,
+            max_size=self.POOL_MAX_SIZE,
+            max_queries=self.POOL_MAX_QUERIES,
+            max_inactive_connection_lifetime=self.POOL_MAX_INACTIVE_LIFETIME,
+            statement_cache_size=self.STATEMENT_CACHE_SIZE,
+            command_timeout=self.COMMAND_TIMEOUT,
+            connection_class=PreparedConnection,
+            init=self.statements.init,
+        )
+
+    @property
+    def pool_stats(self) -> dict[str, float]:
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size(),
+            "prepared": self.statements.prepares,
+            "statements": len(self.statements.preparable),
+        }
+
     async def setup(self) -> None:
-        self.pool = await asyncpg.create_pool(
-            host=os.environ.get("DATABASE_HOST"),
-            port=os.environ.get("DATABASE_PORT"),
-            user=os.environ.get("DATABASE_USER"),
-            password=os.environ.get("DATABASE_PASSWORD"),
-            database=os.environ.get("DATABASE_NAME"),
-            loop=asyncio.get_event_loop(),
+        for model in (self.prices, self.users, self.messages, self.production):
+            self.statements.seed(await model.known_statements())
+        self.pool = await self.create_pool()
+        self.replicas = ReplicaSet(
+            [await self.create_pool(url) for url in self.REPLICA_URLS],
+            self.REPLICA_CHECK_INTERVAL,
+            self.REPLICA_CHECK_TIMEOUT,
         )
+        await self.listener.start(self.pool)
         await self.prices.setup(self)
         await self.users.setup(self)
+        await self.messages.setup(self)
         await self.production.setup(self)
+        await self.replicas.start()
         self.client = aiohttp.ClientSession()
 
     async def close(self) -> None:
+        await self.messages.close()
+        await self.users.close()
+        await self.listener.close(self.pool)
+        await self.replicas.close()
         await self.pool.close()
 
 
 class Produce(DatabaseModel):
-    __slots__: tuple[str, ...] = ("database_pool", "LINES")
+    __slots__: tuple[str, ...] = ("database_pool", "LINES", "matrix", "refreshing", "stale")
     path: str = "api/assets/yearly_production.csv"
     LINES: Sql
     TABLE: str = "production"
+    CHANNEL: str = "production_changed"
+    REFRESH_DELAY: float = float(os.getenv("PRODUCTION_REFRESH_DELAY", "1.0"))
     BASE: str = "Agricultural Production Foodgrains "
+    LOADER: CsvLoader = CsvLoader(TABLE, ("crop", "frequency", "unit", "values"), ("crop",), parse_production)
+    AVERAGE: str = "(SELECT AVG(NULLIF(value, 0)) FROM UNNEST(production.VALUES) AS value) > {}"
+    SELECT_ID: str = "SELECT * FROM production WHERE ID = $1"
+    PREPARED: tuple[str, ...] = (SELECT_ID,)
+    matrix: ProductionMatrix
+    refreshing: typing.Optional[asyncio.Task]
+    stale: bool
 
-    def read_data(self) -> pd.DataFrame:
-        df = pd.read_csv(self.path)
-        return df.fillna(0).values.tolist()
+    def __init__(self) -> None:
+        self.matrix = ProductionMatrix()
+        self.refreshing = None
+        self.stale = False
 
     async def setup(self, database: "Database") -> None:
         self.database_pool = database.pool
+        self.replicas = database.replicas
+        self.statements = database.statements
+        self.logger = database.logger
         await self.execute_statements()
-        await self.exec_write_query(self.LINES.create)
         check = await self.exec_fetchone("SELECT * FROM production")
         if not check:
-            data = self.read_data()
-            agg = [data[i][:3] + [data[i][3:]] for i in range(len(data))]
-            await self.exec_write_many(self.LINES.insert, (agg,))
-            print("Production data loaded")
+            report = await self.LOADER.copy(self.database_pool, self.path, self.logger)
+            self.logger.log(f"Production data loaded ({report.inserted} rows, {report.skipped} skipped)", "info")
+        await database.listener.subscribe(self.CHANNEL, self.on_change, self.on_change)
+        await self.load_matrix()
+
+    async def load_matrix(self) -> None:
+        with self.primary():
+            data = await self.exec_fetchall("SELECT * FROM production ORDER BY ID")
+        self.matrix.load(data)
+
+    def on_change(self, *_args: typing.Any) -> None:
+        self.stale = True
+        if self.refreshing is None or self.refreshing.done():
+            self.refreshing = asyncio.create_task(self.refresh_matrix())
+
+    async def refresh_matrix(self) -> None:
+        while self.stale:
+            await asyncio.sleep(self.REFRESH_DELAY)
+            self.stale = False
+            await self.load_matrix()
 
     @property
     async def get_all(self) -> list[Production]:
@@ -82,7 +202,7 @@ class Produce(DatabaseModel):
         return ["Kharif", "Rabi"]
 
     async def get_by_id(self, _id: int) -> Production:
-        data = await self.exec_fetchone("SELECT * FROM production WHERE ID = $1", (_id,))
+        data = await self.exec_fetchone(self.SELECT_ID, (_id,))
         return Production(*data)
 
     async def get_by_name(self, name: str) -> list[Production]:
@@ -93,85 +213,251 @@ class Produce(DatabaseModel):
         data = await self.exec_fetchall("SELECT * FROM production WHERE CROP LIKE $1", (f"%{frequency}",))
         return [Production(*row) for row in data]
 
+    async def get_by_ids(self, ids: list[int]) -> list[Production]:
+        data = await self.exec_fetchall("SELECT * FROM production WHERE ID = ANY($1::INT[]) ORDER BY ID", (ids,))
+        return [Production(*row) for row in data]
+
     async def get_by_avg_production(self, avg_production: float) -> list[Production]:
-        data = await self.exec_fetchall("SELECT * FROM prices WHERE SUM(VALUES) > $1", (avg_production,))
+        if not self.matrix.loaded:
+            data = await self.exec_query(Query(self.TABLE).where(self.AVERAGE, avg_production).order_by("ID"))
+            return [Production(*row) for row in data]
+        averages = self.matrix.metric("mean", self.matrix.columns())
+        return await self.get_by_ids(self.matrix.ids[averages > avg_production].tolist())
+
+    async def get_filtered(
+        self,
+        crop: str | None = None,
+        frequency: str | None = None,
+        average: float | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        after: int | None = None,
+    ) -> list[Production]:
+        query = Query(self.TABLE)
+        if crop:
+            query.where("CROP LIKE {}", f"%{crop}%")
+        if frequency:
+            query.where("CROP LIKE {}", f"%{frequency}")
+        if average:
+            query.where(self.AVERAGE, average)
+        if after:
+            query.after("ID", after)
+        data = await self.exec_query(query.order_by("ID").paginate(limit, offset))
         return [Production(*row) for row in data]
 
 
 class AreaToPrices(DatabaseModel):
 
-    __slots__: tuple[str, ...] = ("database_pool", "LINES")
+    __slots__: tuple[str, ...] = (
+        "database_pool",
+        "LINES",
+        "index",
+        "rollup",
+        "locator",
+        "cache",
+        "refreshing",
+        "stale",
+    )
     PATH: str = "api/assets/area_and_prices.csv"
+    DISTRICT_LOCATIONS: str = "api/assets/district_locations.csv"
+    MARKET_LOCATIONS: str = "api/assets/market_locations.csv"
     TABLE: str = "prices"
+    CHANNEL: str = "prices_changed"
+    INDEXED: bool = os.getenv("PRICE_INDEX", "true").lower() == "true"
+    REFRESH_DELAY: float = float(os.getenv("PRICE_INDEX_REFRESH_DELAY", "1.0"))
+    DIMENSION_TTL: float = float(os.getenv("DIMENSION_CACHE_TTL", "3600"))
+    SELECT_BY: str = "SELECT * FROM prices WHERE {} = $1"
+    PREPARED: tuple[str, ...] = tuple(map(SELECT_BY.format, ("ID", "STATE", "DISTRICT", "MARKET", "COMMODITY")))
+    LOADER: CsvLoader = CsvLoader(
+        TABLE,
+        (
+            "state",
+            "district",
+            "market",
+            "commodity",
+            "variety",
+            "arrival_date",
+            "min_price",
+            "max_price",
+            "modal_price",
+        ),
+        ("state", "district", "market", "commodity", "variety", "arrival_date"),
+        parse_price,
+    )
     LINES: Sql
+    index: PriceIndex
+    rollup: PriceRollup
+    locator: MarketLocator
+    cache: DimensionCache
+    refreshing: typing.Optional[asyncio.Task]
+    stale: bool
 
-    def read_data(self, index: int) -> pd.DataFrame:
-        df = pd.read_csv(self.PATH, index_col=index)
-        return df
+    def __init__(self) -> None:
+        self.index = PriceIndex()
+        self.rollup = PriceRollup()
+        self.locator = MarketLocator()
+        self.cache = DimensionCache(self.DIMENSION_TTL)
+        self.refreshing = None
+        self.stale = False
 
     async def setup(self, database: "Database") -> None:
         self.database_pool = database.pool
+        self.replicas = database.replicas
+        self.statements = database.statements
+        self.logger = database.logger
         await self.execute_statements()
-        await self.exec_write_query(self.LINES.create)
         check = await self.exec_fetchone("SELECT * FROM prices")
         if not check:
-            data = self.read_data(-1)
-            await self.exec_write_many(self.LINES.insert, (data.values.tolist(),))
-            print("Database has been setup successfully!")
+            report = await self.LOADER.copy(self.database_pool, self.PATH, self.logger)
+            self.logger.log(
+                f"Database has been setup successfully! ({report.inserted} rows, {report.skipped} skipped)", "info"
+            )
+        await database.listener.subscribe(self.CHANNEL, self.on_change, self.on_change)
+        await self.get_dimensions()
+        await self.locator.load(self.DISTRICT_LOCATIONS, self.MARKET_LOCATIONS)
+        if self.INDEXED:
+            await self.load_index()
+
+    async def load_index(self) -> None:
+        with self.primary():
+            data = await self.exec_fetchall("SELECT * FROM prices ORDER BY ID")
+        self.index.load(data)
+        self.rollup.load(self.index)
+
+    def on_change(self, *_args: typing.Any) -> None:
+        self.cache.invalidate()
+        if not self.INDEXED:
+            return
+        self.stale = True
+        if self.refreshing is None or self.refreshing.done():
+            self.refreshing = asyncio.create_task(self.refresh_index())
+
+    async def refresh_index(self) -> None:
+        while self.stale:
+            await asyncio.sleep(self.REFRESH_DELAY)
+            self.stale = False
+            await self.load_index()
 
     @property
     async def last_index(self) -> int:
         data = await self.exec_fetchone("SELECT MAX(ID) FROM prices")
         return int(data[0]) if data else 0
 
+    async def load_dimensions(self) -> Dimensions:
+        with self.primary():
+            locations = await self.exec_fetchall(
+                "SELECT STATE, DISTRICT, ARRAY_AGG(DISTINCT MARKET) FROM prices GROUP BY STATE, DISTRICT"
+            )
+            commodities = await self.exec_fetchall("SELECT DISTINCT COMMODITY FROM prices")
+        return Dimensions.from_records(locations, commodities)
+
+    async def get_dimensions(self) -> Dimensions:
+        return await self.cache.get(self.load_dimensions)
+
     @property
     async def get_all_states(self) -> list[str]:
-        data = await self.exec_fetchall("SELECT DISTINCT STATE FROM prices")
-        return [row[0] for row in data]
+        return (await self.get_dimensions()).values["STATE"]
 
     @property
     async def get_all_commodities(self) -> list[str]:
-        data = await self.exec_fetchall("SELECT DISTINCT COMMODITY FROM prices")
-        return [row[0] for row in data]
+        return (await self.get_dimensions()).values["COMMODITY"]
 
     @property
     async def get_all_districts(self) -> list[str]:
-        data = await self.exec_fetchall("SELECT DISTINCT DISTRICT FROM prices")
-        return [row[0] for row in data]
+        return (await self.get_dimensions()).values["DISTRICT"]
 
     async def get_districts_by_state(self, state: str) -> list[str]:
-        data = await self.exec_fetchall("SELECT DISTINCT DISTRICT FROM prices WHERE STATE = $1", (state,))
-        return [row[0] for row in data]
+        return sorted((await self.get_dimensions()).state_districts.get(state, ()))
 
     async def get_markets_by_district(self, district: str) -> list[str]:
-        data = await self.exec_fetchall("SELECT DISTINCT MARKET FROM prices WHERE DISTRICT = $1", (district,))
-        return [row[0] for row in data]
+        return sorted((await self.get_dimensions()).district_markets.get(district, ()))
 
     @property
     async def get_all_markets(self) -> list[str]:
-        data = await self.exec_fetchall("SELECT DISTINCT MARKET FROM prices")
-        return [row[0] for row in data]
+        return (await self.get_dimensions()).values["MARKET"]
 
     async def get_by_id(self, _id: int) -> Price:
-        data = await self.exec_fetchone("SELECT * FROM prices WHERE ID = $1", (_id,))
+        data = await self.exec_fetchone(self.SELECT_BY.format("ID"), (_id,))
         return Price(*data) if data else None
 
     async def get_by_state(self, state: str) -> list[Price]:
-        data = await self.exec_fetchall("SELECT * FROM prices WHERE STATE = $1", (state,))
+        data = await self.exec_fetchall(self.SELECT_BY.format("STATE"), (state,))
         return [Price(*row) for row in data]
 
     async def get_by_district(self, district: str) -> list[Price]:
-        data = await self.exec_fetchall("SELECT * FROM prices WHERE DISTRICT = $1", (district,))
+        data = await self.exec_fetchall(self.SELECT_BY.format("DISTRICT"), (district,))
         return [Price(*row) for row in data]
 
     async def get_by_market(self, market: str) -> list[Price]:
-        data = await self.exec_fetchall("SELECT * FROM prices WHERE MARKET = $1", (market,))
+        data = await self.exec_fetchall(self.SELECT_BY.format("MARKET"), (market,))
         return [Price(*row) for row in data]
 
     async def get_by_commodity(self, commodity: str) -> list[Price]:
-        data = await self.exec_fetchall("SELECT * FROM prices WHERE COMMODITY = $1", (commodity,))
+        data = await self.exec_fetchall(self.SELECT_BY.format("COMMODITY"), (commodity,))
         return [Price(*row) for row in data]
 
+    async def get_stats(self, dimension: str, commodity: str, value: str | None = None) -> list[dict[str, typing.Any]]:
+        query = Query(self.TABLE).where("COMMODITY = {}", commodity)
+        if value is not None:
+            query.where(
+                f"{dimension} = {{}}", datetime.date.fromisoformat(value) if dimension == "ARRIVAL_DATE" else value
+            )
+        sql, args = query.build(
+            f"COMMODITY, {dimension}, COUNT(*), MIN(MODAL_PRICE), AVG(MODAL_PRICE), MAX(MODAL_PRICE), "
+            f"PERCENTILE_CONT(ARRAY{list(PriceRollup.QUANTILES.values())}) WITHIN GROUP (ORDER BY MODAL_PRICE)"
+        )
+        data = await self.exec_fetchall(f"{sql} GROUP BY COMMODITY, {dimension} ORDER BY {dimension}", args)
+        return [
+            {
+                "COMMODITY": row[0],
+                dimension: row[1].isoformat() if dimension == "ARRIVAL_DATE" else row[1],
+                "COUNT": row[2],
+                "MIN": float(row[3]),
+                "AVG": float(row[4]),
+                "MAX": float(row[5]),
+                **dict(zip(PriceRollup.QUANTILES, row[6])),
+            }
+            for row in data
+        ]
+
+    async def get_nearby(
+        self, commodity: str, latitude: float, longitude: float, radius: float, limit: int
+    ) -> list[NearbyPrice]:
+        positions, distances = self.locator.within(latitude, longitude, radius)
+        nearby = {
+            self.locator.markets[position]: (distance, self.locator.precisions[position])
+            for position, distance in zip(positions.tolist(), distances.tolist())
+        }
+        if self.index.loaded:
+            rows = self.index.filter({"COMMODITY": commodity}) if self.index.has("COMMODITY", commodity) else []
+        else:
+            data = await self.exec_fetchall(
+                "SELECT * FROM prices WHERE COMMODITY = $1 AND MARKET = ANY($2::TEXT[])",
+                (commodity, list({market for _, _, market in nearby})),
+            )
+            rows = [Price(*row) for row in data]
+        best: dict[tuple[str, str, str], Price] = {}
+        for row in rows:
+            key = (row.STATE, row.DISTRICT, row.MARKET)
+            if key in nearby and (key not in best or best[key].MODAL_PRICE < row.MODAL_PRICE):
+                best[key] = row
+        ranked = sorted(best.items(), key=lambda item: (-item[1].MODAL_PRICE, nearby[item[0]][0]))[:limit]
+        return [
+            NearbyPrice(
+                ID=row.ID,
+                STATE=row.STATE,
+                DISTRICT=row.DISTRICT,
+                MARKET=row.MARKET,
+                COMMODITY=row.COMMODITY,
+                VARIETY=row.VARIETY,
+                ARRIVAL_DATE=row.ARRIVAL_DATE,
+                MODAL_PRICE=row.MODAL_PRICE,
+                DISTANCE=round(nearby[key][0], 1),
+                PRECISION=nearby[key][1],
+            )
+            for key, row in ranked
+        ]
+
     async def get_between_budget(self, min_price: int, max_price: int) -> list[Price]:
         if max_price < min_price:
             min_price, max_price = max_price, min_price
@@ -180,61 +466,232 @@ class AreaToPrices(DatabaseModel):
         )
         return [Price(*row) for row in data]
 
+    def filter_query(
+        self,
+        _id: int | None = None,
+        state: str | None = None,
+        district: str | None = None,
+        market: str | None = None,
+        commodity: str | None = None,
+        budget: typing.Optional[tuple[int, int]] = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        after: int | None = None,
+    ) -> Query:
+        query = Query(self.TABLE)
+        if _id:
+            query.where("ID = {}", _id)
+        if state:
+            query.where("STATE = {}", state)
+        if district:
+            query.where("DISTRICT = {}", district)
+        if market:
+            query.where("MARKET = {}", market)
+        if commodity:
+            query.where("COMMODITY = {}", commodity)
+        if budget:
+            query.where("MODAL_PRICE BETWEEN {} AND {}", *sorted(budget))
+        if after:
+            query.after("ID", after)
+        return query.order_by("ID").paginate(limit, offset)
+
+    async def get_filtered(
+        self,
+        _id: int | None = None,
+        state: str | None = None,
+        district: str | None = None,
+        market: str | None = None,
+        commodity: str | None = None,
+        budget: typing.Optional[tuple[int, int]] = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        after: int | None = None,
+    ) -> list[Price]:
+        query = self.filter_query(_id, state, district, market, commodity, budget, limit, offset, after)
+        data = await self.exec_query(query)
+        return [Price(*row) for row in data]
+
+    async def stream_filtered(
+        self,
+        state: str | None = None,
+        commodity: str | None = None,
+        budget: typing.Optional[tuple[int, int]] = None,
+        limit: int | None = None,
+        after: int | None = None,
+    ) -> typing.AsyncGenerator[Price, None]:
+        query = self.filter_query(state=state, commodity=commodity, budget=budget, limit=limit, after=after)
+        async with contextlib.aclosing(self.exec_stream(*query.build())) as records:
+            async for record in records:
+                yield Price(*record)
+
 
 class Register(DatabaseModel):
 
-    __slots__: tuple[str, ...] = ("database_pool", "LINES")
+    __slots__: tuple[str, ...] = ("database_pool", "LINES", "auth", "profiles", "written")
     TABLE: str = "register"
+    CHANNEL: str = "users_changed"
     LINES: Sql
+    SECRET_KEY: str | None = os.getenv("SECRET_KEY")
+    TOKEN_LIFETIME: float = float(os.getenv("AUTH_TOKEN_LIFETIME", "604800"))
+    SCRYPT_COST: int = int(os.getenv("AUTH_SCRYPT_COST", str(2**14)))
+    AUTH_WORKERS: int = int(os.getenv("AUTH_WORKERS", "4"))
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", "4096"))
+    PRINCIPAL_CACHE_TTL: float = float(os.getenv("AUTH_CACHE_TTL", "300"))
+    PROFILE_CACHE_SIZE: int = int(os.getenv("PROFILE_CACHE_SIZE", "4096"))
+    PROFILE_CACHE_TTL: float = float(os.getenv("PROFILE_CACHE_TTL", "300"))
+    READ_YOUR_WRITES: float = float(os.getenv("DATABASE_READ_YOUR_WRITES", "5"))
+    SELECT_USER: str = "SELECT * FROM users WHERE PHONENUMBER = $1"
+    SELECT_PRINCIPAL: str = "SELECT PHONENUMBER, NAME, STATE, DISTRICT, PASSWORD FROM users WHERE PHONENUMBER = $1"
+    SELECT_PASSWORD: str = "SELECT PASSWORD FROM users WHERE PHONENUMBER = $1"
+    PREPARED: tuple[str, ...] = (SELECT_USER, SELECT_PRINCIPAL, SELECT_PASSWORD)
+    auth: Authenticator
+    profiles: ProfileCache
+    written: collections.OrderedDict[int, float]
+
+    def __init__(self) -> None:
+        self.auth = Authenticator(
+            self.SECRET_KEY or secrets.token_urlsafe(32),
+            self.load_principal,
+            self.TOKEN_LIFETIME,
+            self.SCRYPT_COST,
+            self.AUTH_WORKERS,
+            self.PRINCIPAL_CACHE_SIZE,
+            self.PRINCIPAL_CACHE_TTL,
+        )
+        self.profiles = ProfileCache(self.PROFILE_CACHE_SIZE, self.PROFILE_CACHE_TTL)
+        self.written = collections.OrderedDict()
 
     async def setup(self, database: "Database") -> None:
         self.database_pool = database.pool
+        self.replicas = database.replicas
+        self.statements = database.statements
+        self.logger = database.logger
         await self.execute_statements()
-        await self.exec_write_query(self.LINES.create)
-
-    async def add_message(self, number: int, message: str) -> bool:
-        user = await self.get_user(number)
-        if not user:
-            return False
-        user.message.append(message)
-        await self.exec_write_query("UPDATE users SET MESSAGE = $1 WHERE PHONENUMBER = $2", (user.message, number))
-        return True
+        await database.listener.subscribe(self.CHANNEL, self.on_change)
+        if not self.SECRET_KEY:
+            self.logger.log(
+                "SECRET_KEY is not set, session tokens will not survive restarts or work across workers", "warning"
+            )
 
-    async def seen_message(self, number: int) -> bool:
-        await self.exec_write_query("UPDATE users SET MESSAGE = $1 WHERE PHONENUMBER = $2", ([], number))
-        return True
+    async def close(self) -> None:
+        self.auth.close()
+
+    def on_change(self, *args: typing.Any) -> None:
+        self.forget(int(args[-1]))
+
+    def forget(self, number: int) -> None:
+        self.profiles.invalidate(number)
+        self.auth.invalidate(number)
+        now = time.monotonic()
+        self.written[number] = now + self.READ_YOUR_WRITES
+        self.written.move_to_end(number)
+        while self.written and next(iter(self.written.values())) <= now:
+            self.written.popitem(last=False)
+
+    def fresh(self, number: int) -> bool:
+        return self.written.get(number, 0.0) > time.monotonic()
+
+    async def write_through(self, query: str, data: tuple[typing.Any, ...]) -> User | None:
+        number = data[-1]
+        self.forget(number)
+        row = await self.exec_fetchone(query, data)
+        self.forget(number)
+        if not row:
+            return None
+        user = User(*row)
+        self.profiles.put(user)
+        return user
+
+    async def load_principal(self, number: int) -> Principal | None:
+        with self.primary(self.fresh(number)):
+            data = await self.exec_fetchone(self.SELECT_PRINCIPAL, (number,))
+        return Principal(data[0], data[1], data[2], data[3], self.auth.fingerprint(data[4])) if data else None
 
     async def check_number(self, number: int) -> bool:
-        data = await self.exec_fetchone("SELECT * FROM users WHERE PHONENUMBER = $1", (number,))
-        return True if data else False
-
-    async def login_user(self, number: int, password: str) -> bool:
-        data = await self.exec_fetchone(
-            "SELECT * FROM users WHERE PHONENUMBER = $1 AND PASSWORD = $2", (number, password)
-        )
-        return True if data else False
+        return await self.get_user(number) is not None
+
+    async def login_user(self, number: int, password: str) -> Token | None:
+        with self.primary(self.fresh(number)):
+            data = await self.exec_fetchone(self.SELECT_PASSWORD, (number,))
+        if not data:
+            return None
+        stored = data[0]
+        valid, upgrade = await self.auth.verify(password, stored)
+        if not valid:
+            return None
+        if upgrade:
+            stored = await self.auth.hash(password)
+            await self.exec_write_query(
+                "UPDATE users SET PASSWORD = $1 WHERE PHONENUMBER = $2 AND PASSWORD = $3", (stored, number, data[0])
+            )
+            self.forget(number)
+        return self.auth.issue(number, stored)
 
     async def register_user(self, user: User) -> bool:
         if await self.check_number(user.phone):
             return False
+        user = dataclasses.replace(user, password=await self.auth.hash(user.password))
         await self.exec_write_query(self.LINES.insert, (*list(user.__dict__.values()),))
+        self.forget(user.phone)
+        self.profiles.put(user)
         return True
 
-    async def update_password(self, number: int, password: str) -> None:
-        await self.exec_write_query("UPDATE users SET PASSWORD = $1 WHERE PHONENUMBER = $2", (password, number))
+    @staticmethod
+    def check_location(dimensions: Dimensions, state: str, district: str) -> None:
+        if not dimensions.has("STATE", state):
+            suggestions = dimensions.suggest("STATE", state)
+            raise ValueError("Invalid state." + (f" Did you mean {', '.join(suggestions)}?" if suggestions else ""))
+        districts = dimensions.state_districts[state]
+        if district not in districts:
+            suggestions = TrigramIndex(districts).suggest(district)
+            raise ValueError("Invalid district." + (f" Did you mean {', '.join(suggestions)}?" if suggestions else ""))
+
+    async def update_profile(
+        self,
+        number: int,
+        dimensions: Dimensions,
+        name: str | None = None,
+        password: str | None = None,
+        state: str | None = None,
+        district: str | None = None,
+    ) -> User | None:
+        stored = await self.auth.hash(password) if password is not None else None
+        self.forget(number)
+        async with self.database_pool.acquire() as connection:
+            async with connection.transaction():
+                if (state is None) != (district is None):
+                    current = await connection.fetchrow(
+                        "SELECT STATE, DISTRICT FROM users WHERE PHONENUMBER = $1 FOR UPDATE", number
+                    )
+                    if current is None:
+                        return None
+                    state, district = state or current[0], district or current[1]
+                if state is not None and district is not None:
+                    self.check_location(dimensions, state, district)
+                row = await connection.fetchrow(self.LINES.update, number, name, stored, state, district)
+        self.forget(number)
+        if row is None:
+            return None
+        user = User(*row)
+        self.profiles.put(user)
+        return user
 
-    async def update_state(self, number: int, state: str) -> None:
-        await self.exec_write_query("UPDATE users SET STATE = $1 WHERE PHONENUMBER = $2", (state, number))
+    async def update_password(self, number: int, password: str) -> None:
+        stored = await self.auth.hash(password)
+        await self.write_through("UPDATE users SET PASSWORD = $1 WHERE PHONENUMBER = $2 RETURNING *", (stored, number))
 
-    async def update_district(self, number: int, district: str) -> None:
-        await self.exec_write_query("UPDATE users SET DISTRICT = $1 WHERE PHONENUMBER = $2", (district, number))
+    async def fetch_user(self, number: int) -> User | None:
+        with self.primary(self.fresh(number)):
+            data = await self.exec_fetchone(self.SELECT_USER, (number,))
+        return User(*data) if data else None
 
     async def get_user(self, number: int) -> User:
-        data = await self.exec_fetchone("SELECT * FROM users WHERE PHONENUMBER = $1", (number,))
-        return User(*data) if data else None
+        return await self.profiles.get(number, lambda: self.fetch_user(number))
 
     async def delete_user(self, number: int) -> None:
+        self.forget(number)
         await self.exec_write_query("DELETE FROM users WHERE PHONENUMBER = $1", (number,))
+        self.forget(number)
 
     @property
     async def get_all_users(self) -> list[User]:
@@ -245,3 +702,143 @@ class Register(DatabaseModel):
     async def total_users(self) -> int:
         data = await self.exec_fetchone("SELECT COUNT(*) FROM users")
         return int(data[0]) if data else 0
+
+
+class Mailbox(DatabaseModel):
+
+    __slots__: tuple[str, ...] = ("database_pool", "LINES", "jobs", "hub")
+    TABLE: str = "messages"
+    CHANNEL: str = "messages_added"
+    LINES: Sql
+    STREAM_QUEUE_SIZE: int = int(os.getenv("MESSAGE_STREAM_QUEUE_SIZE", "100"))
+    BROADCAST_BATCH: int = int(os.getenv("BROADCAST_BATCH", "1000"))
+    BROADCAST_INLINE: int = int(os.getenv("BROADCAST_INLINE", "5000"))
+    BROADCAST_HISTORY: int = int(os.getenv("BROADCAST_HISTORY", "100"))
+    COUNT_UNREAD: str = "SELECT COUNT(*) FROM messages WHERE PHONENUMBER = $1 AND NOT READ"
+    PREPARED: tuple[str, ...] = (COUNT_UNREAD,)
+    jobs: dict[str, BroadcastJob]
+    hub: MessageHub
+
+    def __init__(self) -> None:
+        self.jobs = {}
+        self.hub = MessageHub(self.get_range, self.STREAM_QUEUE_SIZE)
+
+    async def setup(self, database: "Database") -> None:
+        self.database_pool = database.pool
+        self.replicas = database.replicas
+        self.statements = database.statements
+        self.logger = database.logger
+        await self.execute_statements()
+        await database.listener.subscribe(self.CHANNEL, self.hub.notify)
+
+    async def close(self) -> None:
+        await self.hub.close()
+        for job in self.jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+
+    async def add_message(self, number: int, message: str) -> bool:
+        data = await self.exec_fetchone(self.LINES.insert, (number, message))
+        return data is not None
+
+    async def get_inbox(
+        self, number: int, limit: int, before: int | None = None, unread: bool = False
+    ) -> list[Message]:
+        query = Query(self.TABLE).where("PHONENUMBER = {}", number)
+        if unread:
+            query.where("NOT READ")
+        if before is not None:
+            query.where("ID < {}", before)
+        data = await self.exec_query(query.order_by("ID DESC").paginate(limit))
+        return [Message(*row) for row in data]
+
+    async def get_after(self, number: int, after: int, limit: int) -> list[Message]:
+        query = Query(self.TABLE).where("PHONENUMBER = {}", number).after("ID", after)
+        data = await self.exec_query(query.order_by("ID").paginate(limit))
+        return [Message(*row) for row in data]
+
+    async def get_range(self, low: int, high: int, numbers: list[int]) -> list[Message]:
+        with self.primary():
+            data = await self.exec_fetchall(
+                "SELECT * FROM messages WHERE ID BETWEEN $1 AND $2 AND PHONENUMBER = ANY($3::BIGINT[]) ORDER BY ID",
+                (low, high, numbers),
+            )
+        return [Message(*row) for row in data]
+
+    async def get_unread(self, number: int) -> list[str]:
+        data = await self.exec_fetchall(
+            "SELECT BODY FROM messages WHERE PHONENUMBER = $1 AND NOT READ ORDER BY ID", (number,)
+        )
+        return [row[0] for row in data]
+
+    async def count_unread(self, number: int) -> int:
+        data = await self.exec_fetchone(self.COUNT_UNREAD, (number,))
+        return int(data[0]) if data else 0
+
+    async def mark_read(self, number: int, up_to: int | None = None) -> int:
+        data = await self.exec_fetchone(
+            "WITH marked AS (UPDATE messages SET READ = TRUE WHERE PHONENUMBER = $1 AND NOT READ "
+            "AND ($2::BIGINT IS NULL OR ID <= $2) RETURNING ID) SELECT COUNT(*) FROM marked",
+            (number, up_to),
+        )
+        return int(data[0]) if data else 0
+
+    async def seen_message(self, number: int) -> bool:
+        await self.mark_read(number)
+        return True
+
+    @staticmethod
+    def segment(state: str | None, district: str | None, commodity: str | None) -> Query:
+        query = Query("users")
+        if state:
+            query.where("STATE = {}", state)
+        if district:
+            query.where("DISTRICT = {}", district)
+        if commodity:
+            query.where("(STATE, DISTRICT) IN (SELECT STATE, DISTRICT FROM prices WHERE COMMODITY = {})", commodity)
+        return query
+
+    async def count_segment(self, state: str | None, district: str | None, commodity: str | None) -> int:
+        data = await self.exec_fetchone(*self.segment(state, district, commodity).build("COUNT(*)"))
+        return int(data[0]) if data else 0
+
+    async def append_segment(self, query: Query, message: str) -> list[int]:
+        marker = query.placeholder(message)
+        segment, arguments = query.build(f"PHONENUMBER, {marker}::TEXT")
+        data = await self.exec_fetchall(
+            f"INSERT INTO messages (PHONENUMBER, BODY) {segment} RETURNING PHONENUMBER", arguments
+        )
+        return [row[0] for row in data]
+
+    async def broadcast(
+        self, message: str, state: str | None, district: str | None, commodity: str | None
+    ) -> BroadcastJob:
+        job = BroadcastJob(message, state, district, commodity, await self.count_segment(state, district, commodity))
+        self.jobs[job.id] = job
+        for old in [old for old in self.jobs.values() if old.done][: max(len(self.jobs) - self.BROADCAST_HISTORY, 0)]:
+            del self.jobs[old.id]
+        if job.total <= self.BROADCAST_INLINE:
+            await self.run_broadcast(job, None)
+        else:
+            job.task = asyncio.create_task(self.run_broadcast(job, self.BROADCAST_BATCH))
+        return job
+
+    async def run_broadcast(self, job: BroadcastJob, batch: int | None) -> None:
+        job.status = "running"
+        try:
+            while True:
+                query = self.segment(job.state, job.district, job.commodity)
+                if job.cursor is not None:
+                    query.after("PHONENUMBER", job.cursor)
+                delivered = await self.append_segment(query.order_by("PHONENUMBER").paginate(batch), job.message)
+                job.delivered += len(delivered)
+                if batch is None or len(delivered) < batch:
+                    break
+                job.cursor = max(delivered)
+        except asyncio.CancelledError:
+            job.finish("cancelled")
+            raise
+        except (asyncpg.PostgresError, OSError) as error:
+            job.finish("failed", str(error))
+            return
+        job.finish("completed")
@@ -0,0 +1,44 @@
+import asyncio
+import typing
+
+import aiohttp
+
+__all__: tuple[str, ...] = ("fetch_json", "fetch_pages")
+
+RETRY_STATUSES: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+
+
+async def fetch_json(
+    client: aiohttp.ClientSession,
+    url: str,
+    params: typing.Optional[dict[str, typing.Any]] = None,
+    retries: int = 3,
+    backoff: float = 0.5,
+) -> typing.Any:
+    for attempt in range(retries + 1):
+        try:
+            async with client.get(url, params=params) as response:
+                if response.status not in RETRY_STATUSES or attempt == retries:
+                    return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == retries:
+                raise
+        await asyncio.sleep(backoff * 2**attempt)
+
+
+async def fetch_pages(
+    client: aiohttp.ClientSession,
+    url: str,
+    params: dict[str, typing.Any],
+    pages: typing.Iterable[int],
+    concurrency: int,
+    retries: int = 3,
+    backoff: float = 0.5,
+) -> list[typing.Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_page(page: int) -> typing.Any:
+        async with semaphore:
+            return await fetch_json(client, url, {**params, "page": page}, retries, backoff)
+
+    return list(await asyncio.gather(*[fetch_page(page) for page in pages]))
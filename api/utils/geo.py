@@ -0,0 +1,79 @@
+import csv
+import io
+import math
+
+import aiofiles
+import numpy as np
+
+__all__: tuple[str, ...] = ("MarketLocator", "haversine")
+
+EARTH_RADIUS: float = 6371.0088
+
+
+def haversine(latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    phi, lam = math.radians(latitude), math.radians(longitude)
+    phis, lams = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((phis - phi) / 2) ** 2 + math.cos(phi) * np.cos(phis) * np.sin((lams - lam) / 2) ** 2
+    distances: np.ndarray = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+    return distances
+
+
+class MarketLocator:
+
+    __slots__: tuple[str, ...] = ("districts", "markets", "precisions", "latitudes", "longitudes", "cells", "loaded")
+    CELL: float = 1.0
+    districts: dict[tuple[str, str], tuple[float, float]]
+    markets: list[tuple[str, str, str]]
+    precisions: list[str]
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    cells: dict[tuple[int, int], np.ndarray]
+    loaded: bool
+
+    def __init__(self) -> None:
+        self.districts = {}
+        self.markets = []
+        self.precisions = []
+        self.latitudes = np.empty(0)
+        self.longitudes = np.empty(0)
+        self.cells = {}
+        self.loaded = False
+
+    @staticmethod
+    async def read(path: str) -> list[dict[str, str]]:
+        async with aiofiles.open(path, "r", newline="") as file:
+            return list(csv.DictReader(io.StringIO(await file.read())))
+
+    async def load(self, districts_path: str, markets_path: str) -> None:
+        districts = await self.read(districts_path)
+        markets = await self.read(markets_path)
+        self.districts = {
+            (row["State"], row["District"]): (float(row["Latitude"]), float(row["Longitude"])) for row in districts
+        }
+        self.markets = [(row["State"], row["District"], row["Market"]) for row in markets]
+        self.precisions = [row["Precision"] for row in markets]
+        self.latitudes = np.array([float(row["Latitude"]) for row in markets])
+        self.longitudes = np.array([float(row["Longitude"]) for row in markets])
+        keys = np.floor(np.stack((self.latitudes, self.longitudes), axis=1) / self.CELL).astype(np.int64)
+        cells: dict[tuple[int, int], list[int]] = {}
+        for position, (row, column) in enumerate(keys.tolist()):
+            cells.setdefault((row, column), []).append(position)
+        self.cells = {cell: np.array(positions, dtype=np.int64) for cell, positions in cells.items()}
+        self.loaded = True
+
+    def locate(self, state: str, district: str) -> tuple[float, float] | None:
+        return self.districts.get((state, district))
+
+    def within(self, latitude: float, longitude: float, radius: float) -> tuple[np.ndarray, np.ndarray]:
+        spread = radius / (EARTH_RADIUS * math.pi / 180)
+        rows = range(math.floor((latitude - spread) / self.CELL), math.floor((latitude + spread) / self.CELL) + 1)
+        scale = max(math.cos(math.radians(min(abs(latitude) + spread, 89.0))), 1e-6)
+        columns = range(
+            math.floor((longitude - spread / scale) / self.CELL),
+            math.floor((longitude + spread / scale) / self.CELL) + 1,
+        )
+        found = [self.cells[(row, column)] for row in rows for column in columns if (row, column) in self.cells]
+        candidates = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+        distances = haversine(latitude, longitude, self.latitudes[candidates], self.longitudes[candidates])
+        inside = distances <= radius
+        return candidates[inside], distances[inside]
@@ -0,0 +1,79 @@
+import base64
+import hashlib
+import io
+import zipfile
+
+from fastapi import UploadFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+__all__: tuple[str, ...] = ("PreparedImage", "prepare_image", "read_upload", "unpack_archive")
+
+CHUNK: int = 64 * 1024
+
+
+class PreparedImage:
+
+    __slots__: tuple[str, ...] = ("content",)
+    content: bytes
+
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+
+    @property
+    def encoded(self) -> str:
+        return base64.b64encode(self.content).decode("ascii")
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha256(self.content).hexdigest()
+
+
+async def read_upload(file: UploadFile, limit: int) -> tuple[bytes, str]:
+    digest = hashlib.sha256()
+    buffer = io.BytesIO()
+    while chunk := await file.read(CHUNK):
+        if buffer.tell() + len(chunk) > limit:
+            raise ValueError(f"Image exceeds {limit} bytes")
+        digest.update(chunk)
+        buffer.write(chunk)
+    if not buffer.tell():
+        raise ValueError("Empty image")
+    return buffer.getvalue(), digest.hexdigest()
+
+
+def unpack_archive(data: bytes, limit: int, max_items: int) -> list[tuple[str, bytes]]:
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            members = [
+                info
+                for info in archive.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith("__MACOSX/")
+                and not info.filename.rsplit("/", 1)[-1].startswith(".")
+            ]
+            if len(members) > max_items:
+                raise ValueError(f"Archive holds more than {max_items} files")
+            images = []
+            for info in members:
+                if info.file_size > limit:
+                    raise ValueError(f"{info.filename} exceeds {limit} bytes")
+                with archive.open(info) as member:
+                    content = member.read(limit + 1)
+                if len(content) > limit:
+                    raise ValueError(f"{info.filename} exceeds {limit} bytes")
+                images.append((info.filename, content))
+            return images
+    except zipfile.BadZipFile as error:
+        raise ValueError(f"Unreadable archive ({error})") from None
+
+
+def prepare_image(data: bytes, max_dimension: int, quality: int) -> PreparedImage:
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            image = ImageOps.exif_transpose(source).convert("RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as error:
+        raise ValueError(f"Unreadable image ({error})") from None
+    image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality, optimize=True)
+    return PreparedImage(output.getvalue())
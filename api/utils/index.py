@@ -0,0 +1,113 @@
+import typing
+
+import asyncpg
+import numpy as np
+
+from .models import Price
+
+__all__: tuple[str, ...] = ("PriceIndex",)
+
+
+class PriceIndex:
+
+    __slots__: tuple[str, ...] = (
+        "rows",
+        "ids",
+        "modal_prices",
+        "arrival_dates",
+        "labels",
+        "lookups",
+        "codes",
+        "bitmaps",
+        "loaded",
+    )
+    COLUMNS: tuple[str, ...] = ("STATE", "DISTRICT", "MARKET", "COMMODITY")
+    rows: list[Price]
+    ids: np.ndarray
+    modal_prices: np.ndarray
+    arrival_dates: np.ndarray
+    labels: dict[str, list[str]]
+    lookups: dict[str, dict[str, int]]
+    codes: dict[str, np.ndarray]
+    bitmaps: dict[str, np.ndarray]
+    loaded: bool
+
+    def __init__(self) -> None:
+        self.rows = []
+        self.ids = np.empty(0, dtype=np.int64)
+        self.modal_prices = np.empty(0, dtype=np.int64)
+        self.arrival_dates = np.empty(0, dtype="datetime64[D]")
+        self.labels = {}
+        self.lookups = {}
+        self.codes = {}
+        self.bitmaps = {}
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def load(self, records: list[asyncpg.Record]) -> None:
+        rows = sorted((Price(*record) for record in records), key=lambda row: row.ID)
+        ids = np.fromiter((row.ID for row in rows), dtype=np.int64, count=len(rows))
+        modal_prices = np.fromiter((row.MODAL_PRICE for row in rows), dtype=np.int64, count=len(rows))
+        arrival_dates = np.array([row.ARRIVAL_DATE for row in rows], dtype="datetime64[D]")
+        labels, lookups, codes, bitmaps = {}, {}, {}, {}
+        for column in self.COLUMNS:
+            values, inverse = np.unique([getattr(row, column) for row in rows], return_inverse=True)
+            labels[column] = values.tolist()
+            lookups[column] = {label: code for code, label in enumerate(labels[column])}
+            codes[column] = inverse.astype(np.int32)
+            bitmaps[column] = np.packbits(codes[column] == np.arange(len(values), dtype=np.int32)[:, None], axis=1)
+        self.rows, self.ids, self.modal_prices, self.arrival_dates = rows, ids, modal_prices, arrival_dates
+        self.labels, self.lookups, self.codes, self.bitmaps = labels, lookups, codes, bitmaps
+        self.loaded = True
+
+    def values(self, column: str) -> list[str]:
+        return self.labels.get(column, [])
+
+    def has(self, column: str, value: str) -> bool:
+        return value in self.lookups.get(column, {})
+
+    def get(self, _id: int) -> Price | None:
+        position = int(np.searchsorted(self.ids, _id))
+        if position < len(self.rows) and self.ids[position] == _id:
+            return self.rows[position]
+        return None
+
+    def mask(
+        self,
+        filters: dict[str, str],
+        budget: typing.Optional[tuple[int, int]] = None,
+        _id: int | None = None,
+        after: int | None = None,
+    ) -> np.ndarray:
+        bits: typing.Optional[np.ndarray] = None
+        for column, value in filters.items():
+            bitmap = self.bitmaps[column][self.lookups[column][value]]
+            bits = bitmap if bits is None else bits & bitmap
+        if bits is None:
+            mask = np.ones(len(self.rows), dtype=bool)
+        else:
+            mask = np.unpackbits(bits, count=len(self.rows)).astype(bool)
+        if budget is not None:
+            low, high = sorted(budget)
+            mask &= (self.modal_prices >= low) & (self.modal_prices <= high)
+        if _id is not None:
+            mask &= self.ids == _id
+        if after is not None:
+            mask &= self.ids > after
+        return mask
+
+    def filter(
+        self,
+        filters: dict[str, str],
+        budget: typing.Optional[tuple[int, int]] = None,
+        _id: int | None = None,
+        after: int | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+    ) -> list[Price]:
+        positions = np.flatnonzero(self.mask(filters, budget, _id, after))[offset or 0 :]
+        if limit is not None:
+            positions = positions[:limit]
+        return [self.rows[position] for position in positions]
@@ -0,0 +1,140 @@
+import asyncio
+import csv
+import datetime
+import sys
+import typing
+from dataclasses import dataclass
+
+import aiofiles
+import asyncpg
+
+if typing.TYPE_CHECKING:
+    from api.setup import Logs
+
+__all__: tuple[str, ...] = ("CsvLoader", "LoadReport", "parse_price", "parse_production")
+
+
+@dataclass
+class LoadReport:
+    table: str
+    copied: int = 0
+    skipped: int = 0
+    inserted: int = 0
+    updated: int = 0
+
+
+def parse_price(row: list[str]) -> tuple[typing.Any, ...]:
+    state, district, market, commodity, variety, arrival_date, *prices = (value.strip() for value in row[:9])
+    if not all((state, district, market, commodity, variety, arrival_date)):
+        raise ValueError("missing location, commodity or arrival date")
+    date = datetime.datetime.strptime(arrival_date, "%d/%m/%Y").date()
+    return (state, district, market, commodity, variety, date, *(round(float(i)) for i in prices))
+
+
+def parse_production(row: list[str]) -> tuple[typing.Any, ...]:
+    crop, frequency, unit, *values = (value.strip() for value in row)
+    if not crop:
+        raise ValueError("missing crop name")
+    return crop, frequency, unit, [0.0 if value in ("", "NA") else float(value) for value in values]
+
+
+class CsvLoader:
+
+    __slots__: tuple[str, ...] = ("table", "columns", "keys", "parser")
+    table: str
+    columns: tuple[str, ...]
+    keys: tuple[str, ...]
+    parser: typing.Callable[[list[str]], tuple[typing.Any, ...]]
+
+    def __init__(
+        self,
+        table: str,
+        columns: tuple[str, ...],
+        keys: tuple[str, ...],
+        parser: typing.Callable[[list[str]], tuple[typing.Any, ...]],
+    ) -> None:
+        self.table = table
+        self.columns = columns
+        self.keys = keys
+        self.parser = parser
+
+    async def records(
+        self, path: str, report: LoadReport, logger: "Logs"
+    ) -> typing.AsyncIterator[tuple[typing.Any, ...]]:
+        async with aiofiles.open(path, "r", newline="") as file:
+            await file.readline()
+            number = 1
+            async for line in file:
+                number += 1
+                if not line.strip():
+                    continue
+                try:
+                    record = self.parser(next(csv.reader([line])))
+                except (ValueError, TypeError) as error:
+                    report.skipped += 1
+                    logger.log(f"Skipping {path}:{number} ({error})", "warning")
+                    continue
+                report.copied += 1
+                yield record
+
+    async def copy(self, pool: asyncpg.pool.Pool, path: str, logger: "Logs") -> LoadReport:
+        report = LoadReport(self.table)
+        async with pool.acquire() as connection:
+            await connection.copy_records_to_table(
+                self.table, records=self.records(path, report, logger), columns=list(self.columns)
+            )
+        report.inserted = report.copied
+        return report
+
+    async def upsert(self, pool: asyncpg.pool.Pool, path: str, logger: "Logs") -> LoadReport:
+        report = LoadReport(self.table)
+        staging = f"{self.table}_staging"
+        columns = ", ".join(self.columns)
+        keys = ", ".join(self.keys)
+        matches = " AND ".join(f"{self.table}.{key} = staged.{key}" for key in self.keys)
+        values = ", ".join(f"{column} = staged.{column}" for column in self.columns if column not in self.keys)
+        staged = f"SELECT DISTINCT ON ({keys}) {columns} FROM {staging} ORDER BY {keys}"
+        async with pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(
+                    f"CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS SELECT {columns} FROM {self.table} WITH NO DATA"
+                )
+                await connection.copy_records_to_table(
+                    staging, records=self.records(path, report, logger), columns=list(self.columns)
+                )
+                updated = await connection.execute(
+                    f"UPDATE {self.table} SET {values} FROM ({staged}) AS staged WHERE {matches}"
+                )
+                inserted = await connection.execute(
+                    f"INSERT INTO {self.table} ({columns}) SELECT {columns} FROM ({staged}) AS staged "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM {self.table} WHERE {matches})"
+                )
+        report.updated = int(updated.split()[-1])
+        report.inserted = int(inserted.split()[-1])
+        return report
+
+
+async def main(table: str, *paths: str) -> None:
+    from dotenv import load_dotenv
+
+    from api.setup import Logs
+
+    from .database import Database
+
+    load_dotenv()
+    logger = Logs()
+    logger.stream_handler()
+    database = Database(logger)
+    loader: CsvLoader = {"prices": database.prices.LOADER, "production": database.production.LOADER}[table]
+    pool = await database.create_pool()
+    try:
+        for path in paths:
+            logger.log(str(await loader.upsert(pool, path, logger)), "info")
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("prices", "production"):
+        sys.exit("Usage: python -m api.utils.loader {prices,production} FILE [FILE ...]")
+    asyncio.run(main(*sys.argv[1:]))
@@ -1,7 +1,26 @@
 import datetime
-from dataclasses import dataclass, field
-
-__all__: tuple[str, ...] = ("Price", "Sql", "User", "Production", "Kingdom", "Divisions", "Classes", "Plant")
+from dataclasses import dataclass
+
+__all__: tuple[str, ...] = (
+    "Price",
+    "Sql",
+    "User",
+    "Production",
+    "Kingdom",
+    "Divisions",
+    "Classes",
+    "Plant",
+    "Family",
+    "Genus",
+    "Taxon",
+    "NearbyPrice",
+    "BroadcastStatus",
+    "Message",
+    "InboxPage",
+    "Principal",
+    "Profile",
+    "Token",
+)
 
 
 @dataclass
@@ -44,6 +63,26 @@ class Kingdom:
     Fungi: list[str]
 
 
+@dataclass
+class Family:
+    name: str
+    order: str
+    genera: list[str]
+
+
+@dataclass
+class Genus:
+    name: str
+    families: list[str]
+    orders: list[str]
+
+
+@dataclass
+class Taxon:
+    name: str
+    rank: str
+
+
 @dataclass
 class Value:
     YEAR: int
@@ -74,12 +113,57 @@ class Price:
     MARKET: str
     COMMODITY: str
     VARIETY: str
-    ARRIVAL_DATE: str
+    ARRIVAL_DATE: datetime.date
     MIN_PRICE: int
     MAX_PRICE: int
     MODAL_PRICE: int
 
 
+@dataclass(frozen=True)
+class NearbyPrice:
+    ID: int
+    STATE: str
+    DISTRICT: str
+    MARKET: str
+    COMMODITY: str
+    VARIETY: str
+    ARRIVAL_DATE: datetime.date
+    MODAL_PRICE: int
+    DISTANCE: float
+    PRECISION: str
+
+
+@dataclass(frozen=True)
+class BroadcastStatus:
+    ID: str
+    STATE: str | None
+    DISTRICT: str | None
+    COMMODITY: str | None
+    STATUS: str
+    TOTAL: int
+    DELIVERED: int
+    PROGRESS: float
+    CREATED: float
+    FINISHED: float | None
+    ERROR: str | None
+
+
+@dataclass(frozen=True)
+class Message:
+    ID: int
+    PHONENUMBER: int
+    BODY: str
+    CREATEDAT: datetime.datetime
+    READ: bool
+
+
+@dataclass(frozen=True)
+class InboxPage:
+    MESSAGES: list[Message]
+    CURSOR: str | None
+    UNREAD: int
+
+
 @dataclass(frozen=True)
 class Sql:
     create: str
@@ -94,5 +178,33 @@ class User:
     password: str
     state: str
     district: str
-    message: list[str] = field(default_factory=list)
     created_at: float = datetime.datetime.now().timestamp()
+
+    @property
+    def profile(self) -> "Profile":
+        return Profile(self.phone, self.name, self.state, self.district, self.created_at)
+
+
+@dataclass(frozen=True)
+class Profile:
+    phone: int
+    name: str
+    state: str
+    district: str
+    created_at: float
+
+
+@dataclass(frozen=True)
+class Principal:
+    phone: int
+    name: str
+    state: str
+    district: str
+    key: str
+
+
+@dataclass(frozen=True)
+class Token:
+    token: str
+    expires: float
+    found: bool = True
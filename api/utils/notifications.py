@@ -0,0 +1,73 @@
+import asyncio
+import collections
+import typing
+
+from .models import Message
+
+__all__: tuple[str, ...] = ("MessageHub",)
+
+Fetch = typing.Callable[[int, int, list[int]], typing.Awaitable[list[Message]]]
+
+
+class MessageHub:
+
+    __slots__: tuple[str, ...] = ("fetch", "subscribers", "recent", "tasks", "queue_size", "history")
+    fetch: Fetch
+    subscribers: dict[int, set[asyncio.Queue[Message]]]
+    recent: collections.OrderedDict[int, None]
+    tasks: set[asyncio.Task]
+    queue_size: int
+    history: int
+
+    def __init__(self, fetch: Fetch, queue_size: int = 100, history: int = 10000) -> None:
+        self.fetch = fetch
+        self.subscribers = {}
+        self.recent = collections.OrderedDict()
+        self.tasks = set()
+        self.queue_size = queue_size
+        self.history = history
+
+    def subscribe(self, number: int) -> asyncio.Queue[Message]:
+        queue: asyncio.Queue[Message] = asyncio.Queue(self.queue_size)
+        self.subscribers.setdefault(number, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, number: int, queue: asyncio.Queue[Message]) -> None:
+        queues = self.subscribers.get(number)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[number]
+
+    def notify(self, *args: typing.Any) -> None:
+        if not self.subscribers:
+            return
+        low, _, high = str(args[-1]).partition(":")
+        task = asyncio.create_task(self.deliver(int(low), int(high or low)))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def deliver(self, low: int, high: int) -> None:
+        for message in await self.fetch(low, high, list(self.subscribers)):
+            if message.ID in self.recent:
+                continue
+            self.recent[message.ID] = None
+            if len(self.recent) > self.history:
+                self.recent.popitem(last=False)
+            for queue in self.subscribers.get(message.PHONENUMBER, ()):
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(message)
+
+    async def close(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "users": len(self.subscribers),
+            "connections": sum(len(queues) for queues in self.subscribers.values()),
+            "pending": len(self.tasks),
+        }
@@ -0,0 +1,52 @@
+import asyncio
+import base64
+import hashlib
+import os
+import typing
+
+from fastapi import APIRouter, FastAPI, HTTPException
+
+__all__: tuple[str, ...] = ("app",)
+
+LATENCY: float = float(os.getenv("PLANT_ID_STANDIN_LATENCY", "0.5"))
+
+
+def summary(payload: dict[str, typing.Any]) -> dict[str, typing.Any]:
+    images = [base64.b64decode(image) for image in payload.get("images", [])]
+    if not images:
+        raise HTTPException(status_code=400, detail="No images provided")
+    digest = hashlib.sha256(b"".join(images)).hexdigest()
+    return {
+        "id": int(digest[:8], 16),
+        "custom_id": None,
+        "images": [{"file_name": f"{digest[:16]}-{i}.jpg", "bytes": len(image)} for i, image in enumerate(images)],
+        "modifiers": payload.get("modifiers", []),
+        "plant_details": payload.get("plant_details", []),
+        "is_plant": True,
+        "is_plant_probability": 0.9,
+    }
+
+
+async def identify(payload: dict[str, typing.Any]) -> dict[str, typing.Any]:
+    await asyncio.sleep(LATENCY)
+    return {**summary(payload), "suggestions": [{"plant_name": "Oryza sativa", "probability": 0.9}]}
+
+
+async def health_assessment(payload: dict[str, typing.Any]) -> dict[str, typing.Any]:
+    await asyncio.sleep(LATENCY)
+    return {
+        **summary(payload),
+        "health_assessment": {
+            "is_healthy": False,
+            "is_healthy_probability": 0.1,
+            "diseases": [{"name": "leaf blight", "probability": 0.8}],
+        },
+    }
+
+
+router: APIRouter = APIRouter()
+router.add_api_route("/identify", identify, methods=["POST"])
+router.add_api_route("/health_assessment", health_assessment, methods=["POST"])
+
+app = FastAPI(title="plant.id stand-in")
+app.include_router(router, prefix="/v2")
@@ -1,3 +1,9 @@
+import asyncio
+import collections
+import contextlib
+import contextvars
+import re
+import time
 import typing
 from pathlib import Path
 
@@ -5,40 +11,369 @@ import aiofiles
 import asyncpg
 
 from .models import Sql
+from .replicas import FAILOVER, ReplicaSet
 
-__all__: tuple[str, ...] = ("DatabaseModel",)
+if typing.TYPE_CHECKING:
+    from api.setup import Logs
+
+__all__: tuple[str, ...] = ("DatabaseModel", "Listener", "PreparedConnection", "Query", "StatementRegistry")
+
+PRIMARY: contextvars.ContextVar[bool] = contextvars.ContextVar("primary", default=False)
+READS: re.Pattern[str] = re.compile(r"\s*SELECT\b", re.IGNORECASE)
+
+
+class Query:
+
+    __slots__: tuple[str, ...] = ("table", "conditions", "arguments", "ordering", "limit", "offset")
+    table: str
+    conditions: list[str]
+    arguments: list[typing.Any]
+    ordering: list[str]
+    limit: int | None
+    offset: int | None
+
+    def __init__(self, table: str) -> None:
+        self.table = table
+        self.conditions = []
+        self.arguments = []
+        self.ordering = []
+        self.limit = None
+        self.offset = None
+
+    def placeholder(self, value: typing.Any) -> str:
+        self.arguments.append(value)
+        return f"${len(self.arguments)}"
+
+    def where(self, clause: str, *values: typing.Any) -> "Query":
+        self.conditions.append(clause.format(*[self.placeholder(value) for value in values]))
+        return self
+
+    def after(self, column: str, value: typing.Any) -> "Query":
+        return self.where(f"{column} > {{}}", value)
+
+    def order_by(self, *columns: str) -> "Query":
+        self.ordering.extend(columns)
+        return self
+
+    def paginate(self, limit: int | None = None, offset: int | None = None) -> "Query":
+        self.limit, self.offset = limit, offset
+        return self
+
+    def build(self, columns: str = "*") -> tuple[str, tuple[typing.Any, ...]]:
+        arguments = list(self.arguments)
+        query = f"SELECT {columns} FROM {self.table}"
+        if self.conditions:
+            query += f" WHERE {' AND '.join(self.conditions)}"
+        if self.ordering:
+            query += f" ORDER BY {', '.join(self.ordering)}"
+        if self.limit is not None:
+            arguments.append(self.limit)
+            query += f" LIMIT ${len(arguments)}"
+        if self.offset:
+            arguments.append(self.offset)
+            query += f" OFFSET ${len(arguments)}"
+        return query, tuple(arguments)
+
+
+class PreparedConnection(asyncpg.Connection):
+    async def warm(self, queries: list[str]) -> int:
+        prepared = 0
+        for query in queries:
+            try:
+                await self.prepare(query)
+            except asyncpg.PostgresError:
+                continue
+            prepared += 1
+        return prepared
+
+
+class QueryStats:
+
+    __slots__: tuple[str, ...] = ("count", "errors", "total", "peak", "samples")
+    count: int
+    errors: int
+    total: float
+    peak: float
+    samples: collections.deque[float]
+
+    def __init__(self, window: int) -> None:
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.peak = 0.0
+        self.samples = collections.deque(maxlen=window)
+
+    def record(self, elapsed: float, failed: bool) -> None:
+        self.count += 1
+        self.errors += failed
+        self.total += elapsed
+        self.peak = max(self.peak, elapsed)
+        self.samples.append(elapsed)
+
+    @staticmethod
+    def percentile(ordered: list[float], quantile: float) -> float:
+        return ordered[min(int(quantile * len(ordered)), len(ordered) - 1)] * 1000 if ordered else 0.0
+
+    @property
+    def summary(self) -> dict[str, float]:
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(ordered, 0.5),
+            "p95_ms": self.percentile(ordered, 0.95),
+            "p99_ms": self.percentile(ordered, 0.99),
+            "max_ms": self.peak * 1000,
+        }
+
+
+class StatementRegistry:
+
+    __slots__: tuple[str, ...] = ("limit", "window", "queries", "preparable", "prepares")
+    limit: int
+    window: int
+    queries: dict[str, QueryStats]
+    preparable: set[str]
+    prepares: int
+
+    def __init__(self, limit: int, window: int = 512) -> None:
+        self.limit = limit
+        self.window = window
+        self.queries = {}
+        self.preparable = set()
+        self.prepares = 0
+
+    @property
+    def hot(self) -> list[str]:
+        counts = {query: self.queries[query].count if query in self.queries else 0 for query in self.preparable}
+        ranked = sorted(counts, key=counts.__getitem__, reverse=True)
+        return ranked[: self.limit]
+
+    def seed(self, queries: typing.Iterable[str]) -> None:
+        self.preparable.update(queries)
+
+    async def init(self, connection: PreparedConnection) -> None:
+        self.prepares += await connection.warm(self.hot)
+
+    def record(self, query: str, elapsed: float, failed: bool = False, parameterized: bool = False) -> None:
+        if parameterized:
+            self.preparable.add(query)
+        stats = self.queries.get(query)
+        if stats is None:
+            stats = self.queries[query] = QueryStats(self.window)
+        stats.record(elapsed, failed)
+
+    @property
+    def stats(self) -> dict[str, dict[str, float]]:
+        ranked = sorted(self.queries.items(), key=lambda item: item[1].total, reverse=True)
+        return {" ".join(query.split()): stats.summary for query, stats in ranked}
 
 
 class DatabaseModel:
 
-    __slots__: tuple[str, ...] = ("database_pool", "LINES")
+    __slots__: tuple[str, ...] = ("database_pool", "replicas", "statements", "logger", "LINES")
     database_pool: asyncpg.pool.Pool
+    replicas: ReplicaSet
+    statements: StatementRegistry
+    logger: "Logs"
     TABLES: Path = Path(__file__).parent.parent / "bin" / "tables"
+    MIGRATIONS: Path = Path(__file__).parent.parent / "bin" / "migrations"
     TABLE: str
     LINES: Sql
+    PREPARED: tuple[str, ...] = ()
 
-    async def execute_statements(self) -> None:
-        async with aiofiles.open(self.TABLES / f"{self.TABLE}.sql", "r") as file:
+    async def known_statements(self) -> list[str]:
+        lines = await self.read_statements(self.TABLE)
+        return [query for query in (lines.insert, lines.update, *self.PREPARED) if "$1" in query]
+
+    async def read_statements(self, table: str) -> Sql:
+        async with aiofiles.open(self.TABLES / f"{table}.sql", "r") as file:
             scripts = await file.read()
-        self.LINES = Sql(*[i for i in scripts.split(";") if i.strip()])
+        return Sql(*[i for i in scripts.split(";") if i.strip()])
 
-    async def exec_write_query(self, query: str, data: typing.Optional[tuple] = None) -> None:
-        if data:
-            await self.database_pool.execute(query, *data)
+    async def execute_statements(self) -> None:
+        self.LINES = await self.read_statements(self.TABLE)
+        await self.exec_write_query(self.LINES.create)
+        await self.migrate()
+
+    async def migrate(self) -> None:
+        migrations = sorted((self.MIGRATIONS / self.TABLE).glob("*.sql"))
+        if not migrations:
             return
+        ledger = await self.read_statements("schema_migrations")
+        async with self.database_pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))")
+                await connection.execute(ledger.create)
+                applied = {
+                    row[0]
+                    for row in await connection.fetch(
+                        "SELECT VERSION FROM schema_migrations WHERE TABLE_NAME = $1", self.TABLE
+                    )
+                }
+                for migration in migrations:
+                    version, _, name = migration.stem.partition("_")
+                    if int(version) in applied:
+                        continue
+                    async with aiofiles.open(migration, "r") as file:
+                        await connection.execute(await file.read())
+                    await connection.execute(ledger.insert, self.TABLE, int(version), name)
+                    self.logger.log(f"Applied migration {self.TABLE}/{migration.name}", "info")
+
+    @staticmethod
+    @contextlib.contextmanager
+    def primary(enabled: bool = True) -> typing.Iterator[None]:
+        token = PRIMARY.set(PRIMARY.get() or enabled)
+        try:
+            yield
+        finally:
+            PRIMARY.reset(token)
 
-        await self.database_pool.execute(query)
+    def reader(self, query: str) -> asyncpg.pool.Pool:
+        if PRIMARY.get() or not READS.match(query):
+            return self.database_pool
+        return self.replicas.pick() or self.database_pool
+
+    async def run(self, method: str, query: str, data: typing.Sequence[typing.Any], read: bool = False) -> typing.Any:
+        started, failed = time.perf_counter(), True
+        try:
+            pool = self.reader(query) if read else self.database_pool
+            if pool is not self.database_pool:
+                try:
+                    result = await getattr(pool, method)(query, *data)
+                    failed = False
+                    return result
+                except FAILOVER:
+                    self.replicas.fail(pool)
+                except asyncpg.SerializationError:
+                    pass
+            result = await getattr(self.database_pool, method)(query, *data)
+            failed = False
+            return result
+        finally:
+            self.statements.record(query, time.perf_counter() - started, failed, bool(data))
+
+    async def exec_write_query(self, query: str, data: typing.Optional[tuple] = None) -> None:
+        await self.run("execute", query, data or ())
 
     async def exec_write_many(self, query: str, data: tuple[typing.Any, ...]) -> None:
-        await self.database_pool.executemany(query, *data)
+        await self.run("executemany", query, data)
 
     async def exec_fetchone(self, query: str, data: typing.Optional[tuple] = None) -> typing.Optional[asyncpg.Record]:
-        result: typing.Optional[asyncpg.Record] = await self.database_pool.fetchrow(query, *(data or []))
+        result: typing.Optional[asyncpg.Record] = await self.run("fetchrow", query, data or (), True)
         return result
 
     async def exec_fetchall(
         self, query: str, data: typing.Optional[tuple[typing.Any, ...]] = None
     ) -> list[asyncpg.Record]:
-        args: typing.Union[tuple, list] = data or []
-        results: list[asyncpg.Record] = await self.database_pool.fetch(query, *args)
+        results: list[asyncpg.Record] = await self.run("fetch", query, data or (), True)
         return results
+
+    async def exec_query(self, query: Query) -> list[asyncpg.Record]:
+        return await self.exec_fetchall(*query.build())
+
+    async def exec_stream(
+        self, query: str, data: typing.Optional[tuple[typing.Any, ...]] = None, prefetch: int = 100
+    ) -> typing.AsyncGenerator[asyncpg.Record, None]:
+        pool = self.reader(query)
+        if pool is not self.database_pool:
+            started = False
+            try:
+                async with pool.acquire() as connection:
+                    async with connection.transaction():
+                        async for record in connection.cursor(query, *(data or []), prefetch=prefetch):
+                            started = True
+                            yield record
+                return
+            except FAILOVER:
+                self.replicas.fail(pool)
+                if started:
+                    raise
+            except asyncpg.SerializationError:
+                if started:
+                    raise
+        async with self.database_pool.acquire() as connection:
+            async with connection.transaction():
+                async for record in connection.cursor(query, *(data or []), prefetch=prefetch):
+                    yield record
+
+
+class Listener:
+
+    __slots__: tuple[str, ...] = (
+        "pool",
+        "connection",
+        "channels",
+        "resyncs",
+        "reconnecting",
+        "reconnects",
+        "logger",
+    )
+    pool: asyncpg.pool.Pool
+    connection: asyncpg.pool.PoolConnectionProxy
+    channels: list[tuple[str, typing.Callable[..., typing.Any]]]
+    resyncs: list[typing.Callable[[], typing.Any]]
+    reconnecting: typing.Optional[asyncio.Task]
+    reconnects: int
+    logger: "Logs"
+    RETRY_DELAY: float = 0.5
+    RETRY_MAX_DELAY: float = 30.0
+
+    def __init__(self, logger: "Logs") -> None:
+        self.logger = logger
+        self.channels = []
+        self.resyncs = []
+        self.reconnecting = None
+        self.reconnects = 0
+
+    async def start(self, pool: asyncpg.pool.Pool) -> None:
+        self.pool = pool
+        await self.connect()
+
+    async def connect(self) -> None:
+        self.connection = await self.pool.acquire()
+        self.connection.add_termination_listener(self.on_termination)
+        for channel, callback in self.channels:
+            await self.connection.add_listener(channel, callback)
+
+    def on_termination(self, *_args: typing.Any) -> None:
+        if self.reconnecting is None or self.reconnecting.done():
+            self.reconnecting = asyncio.create_task(self.reconnect())
+
+    async def reconnect(self) -> None:
+        with contextlib.suppress(Exception):
+            await self.pool.release(self.connection)
+        delay = self.RETRY_DELAY
+        while True:
+            try:
+                await self.connect()
+                break
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as error:
+                self.logger.log(f"Listener reconnect failed ({error!r}), retrying in {delay:g}s", "warning")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.RETRY_MAX_DELAY)
+        self.reconnects += 1
+        self.logger.log(f"Listener reconnected, resubscribed to {len(self.channels)} channels", "info")
+        for resync in self.resyncs:
+            resync()
+
+    async def subscribe(
+        self,
+        channel: str,
+        callback: typing.Callable[..., typing.Any],
+        resync: typing.Optional[typing.Callable[[], typing.Any]] = None,
+    ) -> None:
+        await self.connection.add_listener(channel, callback)
+        self.channels.append((channel, callback))
+        if resync is not None:
+            self.resyncs.append(resync)
+
+    async def close(self, pool: asyncpg.pool.Pool) -> None:
+        if self.reconnecting is not None:
+            self.reconnecting.cancel()
+        self.connection.remove_termination_listener(self.on_termination)
+        for channel, callback in self.channels:
+            await self.connection.remove_listener(channel, callback)
+        await pool.release(self.connection)
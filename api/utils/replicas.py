@@ -0,0 +1,94 @@
+import asyncio
+import typing
+
+import asyncpg
+
+__all__: tuple[str, ...] = ("FAILOVER", "ReplicaSet")
+
+FAILOVER: tuple[type[BaseException], ...] = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.InterfaceError,
+    asyncpg.ConnectionDoesNotExistError,
+    asyncpg.CannotConnectNowError,
+)
+
+
+class ReplicaSet:
+
+    __slots__: tuple[str, ...] = (
+        "pools",
+        "healthy",
+        "position",
+        "interval",
+        "timeout",
+        "task",
+        "reads",
+        "failovers",
+    )
+    pools: list[asyncpg.pool.Pool]
+    healthy: list[bool]
+    position: int
+    interval: float
+    timeout: float
+    task: typing.Optional[asyncio.Task]
+    reads: int
+    failovers: int
+
+    def __init__(self, pools: list[asyncpg.pool.Pool], interval: float, timeout: float) -> None:
+        self.pools = pools
+        self.healthy = [False] * len(pools)
+        self.position = 0
+        self.interval = interval
+        self.timeout = timeout
+        self.task = None
+        self.reads = 0
+        self.failovers = 0
+
+    def pick(self) -> asyncpg.pool.Pool | None:
+        for _ in range(len(self.pools)):
+            index = self.position
+            self.position = (self.position + 1) % len(self.pools)
+            if self.healthy[index]:
+                self.reads += 1
+                return self.pools[index]
+        return None
+
+    def fail(self, pool: asyncpg.pool.Pool) -> None:
+        self.healthy[self.pools.index(pool)] = False
+        self.failovers += 1
+
+    async def ping(self, pool: asyncpg.pool.Pool) -> bool:
+        try:
+            await asyncio.wait_for(pool.fetchval("SELECT 1"), self.timeout)
+        except (*FAILOVER, asyncpg.PostgresError):
+            return False
+        return True
+
+    async def check(self) -> None:
+        self.healthy = list(await asyncio.gather(*(self.ping(pool) for pool in self.pools)))
+
+    async def monitor(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    async def start(self) -> None:
+        if not self.pools:
+            return
+        await self.check()
+        self.task = asyncio.create_task(self.monitor())
+
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+        await asyncio.gather(*(pool.close() for pool in self.pools))
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "replicas": len(self.pools),
+            "healthy": sum(self.healthy),
+            "reads": self.reads,
+            "failovers": self.failovers,
+        }
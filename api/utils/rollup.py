@@ -0,0 +1,70 @@
+import typing
+
+import numpy as np
+import orjson
+
+from .index import PriceIndex
+
+__all__: tuple[str, ...] = ("PriceRollup",)
+
+
+class PriceRollup:
+
+    __slots__: tuple[str, ...] = ("groups", "cells", "loaded")
+    DIMENSIONS: tuple[str, ...] = ("STATE", "DISTRICT", "MARKET", "ARRIVAL_DATE")
+    QUANTILES: dict[str, float] = {"P25": 0.25, "MEDIAN": 0.5, "P75": 0.75, "P90": 0.9}
+    groups: dict[tuple[str, str], bytes]
+    cells: dict[tuple[str, str, str], bytes]
+    loaded: bool
+
+    def __init__(self) -> None:
+        self.groups = {}
+        self.cells = {}
+        self.loaded = False
+
+    def load(self, index: PriceIndex) -> None:
+        groups: dict[tuple[str, str], list[bytes]] = {}
+        cells: dict[tuple[str, str, str], bytes] = {}
+        if len(index):
+            for dimension in self.DIMENSIONS:
+                for commodity, value, row in self.aggregate(index, dimension):
+                    cells[(dimension, commodity, value)] = row
+                    groups.setdefault((dimension, commodity), []).append(row)
+        self.groups = {key: b"[" + b",".join(rows) + b"]" for key, rows in groups.items()}
+        self.cells = cells
+        self.loaded = True
+
+    def aggregate(self, index: PriceIndex, dimension: str) -> typing.Iterator[tuple[str, str, bytes]]:
+        labels: list[str]
+        if dimension == "ARRIVAL_DATE":
+            dates, codes = np.unique(index.arrival_dates, return_inverse=True)
+            labels = list(np.datetime_as_string(dates, unit="D"))
+        else:
+            codes, labels = index.codes[dimension], index.labels[dimension]
+        keys = index.codes["COMMODITY"].astype(np.int64) * len(labels) + codes
+        order = np.lexsort((index.modal_prices, keys))
+        keys, prices = keys[order], index.modal_prices[order].astype(np.float64)
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        counts = np.diff(np.append(starts, len(keys)))
+        columns = {
+            "COUNT": counts,
+            "MIN": prices[starts],
+            "AVG": np.add.reduceat(prices, starts) / counts,
+            "MAX": prices[starts + counts - 1],
+        }
+        for name, quantile in self.QUANTILES.items():
+            position = starts + quantile * (counts - 1)
+            low, high = np.floor(position).astype(np.int64), np.ceil(position).astype(np.int64)
+            columns[name] = prices[low] + (prices[high] - prices[low]) * (position - low)
+        commodities = index.labels["COMMODITY"]
+        group_keys = keys[starts]
+        values = {name: column.tolist() for name, column in columns.items()}
+        for group, code in enumerate(group_keys.tolist()):
+            commodity, value = commodities[code // len(labels)], labels[code % len(labels)]
+            row = {"COMMODITY": commodity, dimension: value, **{name: values[name][group] for name in values}}
+            yield commodity, value, orjson.dumps(row)
+
+    def get(self, dimension: str, commodity: str, value: str | None = None) -> bytes | None:
+        if value is None:
+            return self.groups.get((dimension, commodity))
+        return self.cells.get((dimension, commodity, value))
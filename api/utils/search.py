@@ -0,0 +1,70 @@
+import bisect
+import collections
+import heapq
+import re
+import typing
+
+__all__: tuple[str, ...] = ("TrigramIndex", "normalize")
+
+COMPACT: re.Pattern[str] = re.compile(r"[\W_]+")
+
+
+def normalize(value: str) -> str:
+    return " ".join(value.casefold().split())
+
+
+def trigrams(value: str) -> set[str]:
+    padded = f"  {normalize(value)} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+
+    __slots__: tuple[str, ...] = ("values", "keys", "exact", "postings", "sizes")
+    values: list[str]
+    keys: list[str]
+    exact: dict[str, str]
+    postings: dict[str, list[int]]
+    sizes: list[int]
+
+    def __init__(self, values: typing.Iterable[str]) -> None:
+        pairs = sorted({(normalize(value), value) for value in values})
+        self.keys = [key for key, _ in pairs]
+        self.values = [value for _, value in pairs]
+        self.exact = {}
+        for key, value in pairs:
+            self.exact.setdefault(key, value)
+            self.exact.setdefault(COMPACT.sub("", key), value)
+        self.postings = {}
+        self.sizes = []
+        for position, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(position)
+
+    def correct(self, value: str) -> str | None:
+        key = normalize(value)
+        return self.exact.get(key) or self.exact.get(COMPACT.sub("", key))
+
+    def suggest(self, value: str, limit: int = 5, threshold: float = 0.2) -> list[str]:
+        grams = trigrams(value)
+        shared: collections.Counter[int] = collections.Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        scores = (
+            (count / (len(grams) + self.sizes[position] - count), -position) for position, count in shared.items()
+        )
+        best = heapq.nlargest(limit, (item for item in scores if item[0] >= threshold))
+        return [self.values[-position] for _, position in best]
+
+    def complete(self, prefix: str, limit: int = 10) -> list[str]:
+        key = normalize(prefix)
+        position = bisect.bisect_left(self.keys, key)
+        matches: list[str] = []
+        while position < len(self.keys) and len(matches) < limit and self.keys[position].startswith(key):
+            matches.append(self.values[position])
+            position += 1
+        if len(matches) < limit:
+            matches.extend(value for value in self.suggest(prefix, limit) if value not in matches)
+        return matches[:limit]
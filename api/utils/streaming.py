@@ -0,0 +1,58 @@
+import base64
+import binascii
+import contextlib
+import os
+import typing
+
+import orjson
+
+from .models import Price
+
+__all__: tuple[str, ...] = ("decode_cursor", "encode_cursor", "encode_rows")
+
+CHUNK: int = int(os.getenv("STREAM_CHUNK_ROWS", "200"))
+
+
+def encode_cursor(last_id: int, direction: str = "after") -> str:
+    return base64.urlsafe_b64encode(orjson.dumps({direction: last_id})).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, direction: str = "after") -> int:
+    try:
+        data = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(data[direction])
+    except (binascii.Error, orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+        raise ValueError("Invalid cursor") from None
+
+
+async def encode_rows(
+    rows: typing.AsyncGenerator[Price, None], limit: int | None, media: str
+) -> typing.AsyncIterator[bytes]:
+    buffer: list[bytes] = []
+    last: typing.Optional[Price] = None
+    cursor: typing.Optional[str] = None
+    first, count = True, 0
+    if media == "json":
+        yield b'{"data":['
+    async with contextlib.aclosing(rows):
+        async for row in rows:
+            if limit is not None and count == limit:
+                cursor = encode_cursor(last.ID)
+                break
+            buffer.append(orjson.dumps(row))
+            count, last = count + 1, row
+            if len(buffer) == CHUNK:
+                yield _join(buffer, media, first)
+                buffer, first = [], False
+    if buffer:
+        yield _join(buffer, media, first)
+    if media == "json":
+        yield b'],"cursor":' + orjson.dumps(cursor) + b"}"
+    elif cursor is not None:
+        yield orjson.dumps({"cursor": cursor}) + b"\n"
+
+
+def _join(buffer: list[bytes], media: str, first: bool) -> bytes:
+    if media == "json":
+        return (b"" if first else b",") + b",".join(buffer)
+    return b"\n".join(buffer) + b"\n"
@@ -0,0 +1,91 @@
+import bisect
+import hashlib
+
+import aiofiles
+import orjson
+
+from .models import Family, Genus, Taxon
+
+__all__: tuple[str, ...] = ("Bundle", "Taxonomy")
+
+
+class Bundle:
+
+    __slots__: tuple[str, ...] = ("content", "etag")
+    content: bytes
+    etag: str
+
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+        self.etag = f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
+    def matches(self, if_none_match: str | None) -> bool:
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags
+
+
+class Taxonomy:
+
+    __slots__: tuple[str, ...] = ("families", "genus", "family_order", "family_genera", "genus_families", "names")
+    families: Bundle
+    genus: Bundle
+    family_order: dict[str, str]
+    family_genera: dict[str, list[str]]
+    genus_families: dict[str, list[str]]
+    names: list[tuple[str, str, str]]
+
+    def __init__(self, families: dict[str, list[str]], genus: dict[str, list[str]]) -> None:
+        self.families = Bundle(orjson.dumps(families))
+        self.genus = Bundle(orjson.dumps(genus))
+        self.family_genera = {family: sorted(genera) for family, genera in genus.items()}
+        self.family_order = {family: order for order, members in families.items() for family in members}
+        self.genus_families = {}
+        for family, genera in genus.items():
+            for name in genera:
+                families_of = self.genus_families.setdefault(name, [])
+                if family not in families_of:
+                    families_of.append(family)
+        ranks = (("order", families), ("family", self.family_order), ("family", genus), ("genus", self.genus_families))
+        self.names = sorted({(name.casefold(), name, rank) for rank, names in ranks for name in names})
+
+    @classmethod
+    async def load(cls, families_path: str, genus_path: str) -> "Taxonomy":
+        async with aiofiles.open(families_path, "rb") as file:
+            families = orjson.loads(await file.read())
+        async with aiofiles.open(genus_path, "rb") as file:
+            genus = orjson.loads(await file.read())
+        return cls(families, genus)
+
+    def canonical(self, name: str, rank: str) -> str | None:
+        key = name.strip().casefold()
+        position = bisect.bisect_left(self.names, (key,))
+        while position < len(self.names) and self.names[position][0] == key:
+            if self.names[position][2] == rank:
+                return self.names[position][1]
+            position += 1
+        return None
+
+    def lookup_family(self, name: str) -> Family | None:
+        family = self.canonical(name, "family")
+        if family is None:
+            return None
+        return Family(name=family, order=self.family_order.get(family, ""), genera=self.family_genera.get(family, []))
+
+    def lookup_genus(self, name: str) -> Genus | None:
+        genus = self.canonical(name, "genus")
+        if genus is None:
+            return None
+        families = self.genus_families[genus]
+        orders = sorted({self.family_order[family] for family in families if family in self.family_order})
+        return Genus(name=genus, families=families, orders=orders)
+
+    def search(self, prefix: str, limit: int) -> list[Taxon]:
+        key = prefix.strip().casefold()
+        position = bisect.bisect_left(self.names, (key,))
+        results: list[Taxon] = []
+        while position < len(self.names) and len(results) < limit and self.names[position][0].startswith(key):
+            results.append(Taxon(name=self.names[position][1], rank=self.names[position][2]))
+            position += 1
+        return results
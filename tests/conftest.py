@@ -0,0 +1,42 @@
+import csv
+import pathlib
+import typing
+
+import pytest
+from api.utils.loader import parse_price, parse_production
+from api.utils.models import Price
+
+ASSETS: pathlib.Path = pathlib.Path(__file__).resolve().parent.parent / "api" / "assets"
+
+
+def read(name: str, parser: typing.Callable[[list[str]], tuple[typing.Any, ...]]) -> list[tuple[typing.Any, ...]]:
+    records: list[tuple[typing.Any, ...]] = []
+    with open(ASSETS / name, newline="") as file:
+        rows = csv.reader(file)
+        next(rows)
+        for row in rows:
+            try:
+                records.append(parser(row))
+            except (ValueError, TypeError):
+                continue
+    return [(number, *record) for number, record in enumerate(records, 1)]
+
+
+@pytest.fixture(scope="session")
+def assets() -> pathlib.Path:
+    return ASSETS
+
+
+@pytest.fixture(scope="session")
+def prices() -> list[tuple[typing.Any, ...]]:
+    return read("area_and_prices.csv", parse_price)
+
+
+@pytest.fixture(scope="session")
+def rows(prices: list[tuple[typing.Any, ...]]) -> list[Price]:
+    return [Price(*record) for record in prices]
+
+
+@pytest.fixture(scope="session")
+def production() -> list[tuple[typing.Any, ...]]:
+    return read("yearly_production.csv", parse_production)
@@ -0,0 +1,120 @@
+import math
+import typing
+
+import numpy as np
+import pytest
+from api.utils.analytics import ProductionMatrix
+
+
+@pytest.fixture(scope="module")
+def matrix(production: list[tuple[typing.Any, ...]]) -> ProductionMatrix:
+    matrix = ProductionMatrix()
+    matrix.load(list(reversed(production)))
+    return matrix
+
+
+@pytest.fixture(scope="module")
+def series(production: list[tuple[typing.Any, ...]]) -> list[list[float | None]]:
+    return [[value or None for value in record[4]] for record in production]
+
+
+def row_metric(name: str, values: list[float | None]) -> float | None:
+    present = [value for value in values if value is not None]
+    if not present:
+        return None
+    if name == "mean":
+        return sum(present) / len(present)
+    if name == "total":
+        return sum(present)
+    if name == "latest":
+        return present[-1]
+    first = next(year for year, value in enumerate(values) if value is not None)
+    last = max(year for year, value in enumerate(values) if value is not None)
+    if last == first or present[0] <= 0 or present[-1] <= 0:
+        return None
+    return typing.cast(float, (present[-1] / present[0]) ** (1 / (last - first)) - 1)
+
+
+def scores(result: np.ndarray) -> list[float | None]:
+    return [None if math.isnan(value) else value for value in result.tolist()]
+
+
+def test_load(matrix: ProductionMatrix, production: list[tuple[typing.Any, ...]]) -> None:
+    assert matrix.ids.tolist() == [record[0] for record in production]
+    assert matrix.crops.tolist() == [record[1] for record in production]
+    assert matrix.years[0] == ProductionMatrix.FIRST_YEAR
+    assert len(matrix.years) == max(len(record[4]) for record in production)
+
+
+def test_columns(matrix: ProductionMatrix) -> None:
+    first, last = int(matrix.years[0]), int(matrix.years[-1])
+    assert matrix.years[matrix.columns()].tolist() == list(range(first, last + 1))
+    assert matrix.years[matrix.columns(2000, 2005)].tolist() == list(range(2000, 2006))
+    for start, end in ((first - 1, last), (first, last + 1), (2005, 2000)):
+        with pytest.raises(ValueError):
+            matrix.columns(start, end)
+
+
+def test_empty_matrix() -> None:
+    matrix = ProductionMatrix()
+    matrix.load([])
+    assert matrix.loaded and len(matrix) == 0
+    assert matrix.metric("mean", matrix.columns()).tolist() == []
+    assert matrix.select("Rice").tolist() == []
+    with pytest.raises(ValueError):
+        matrix.columns(2000, 2005)
+
+
+@pytest.mark.parametrize("crop, frequency", [(None, None), ("Rice", None), (None, "Kharif"), ("Foodgrains", "Rabi")])
+def test_select(matrix: ProductionMatrix, production: list[tuple[typing.Any, ...]], crop: str, frequency: str) -> None:
+    expected = [
+        position
+        for position, record in enumerate(production)
+        if (not crop or crop in record[1]) and (not frequency or record[1].endswith(frequency))
+    ]
+    assert matrix.select(crop, frequency).tolist() == expected
+
+
+@pytest.mark.parametrize("name", ProductionMatrix.METRICS)
+@pytest.mark.parametrize("start, end", [(None, None), (2000, 2010), (2012, 2012)])
+def test_metric_per_row(
+    matrix: ProductionMatrix, series: list[list[float | None]], name: str, start: int | None, end: int | None
+) -> None:
+    columns = matrix.columns(start, end)
+    expected = [row_metric(name, values[columns]) for values in series]
+    assert scores(matrix.metric(name, columns)) == pytest.approx(expected)
+
+
+def test_unknown_metric(matrix: ProductionMatrix) -> None:
+    with pytest.raises(ValueError):
+        matrix.metric("median", matrix.columns())
+
+
+@pytest.mark.parametrize("window", [1, 3, 5])
+def test_rolling_window_means(matrix: ProductionMatrix, series: list[list[float | None]], window: int) -> None:
+    columns = matrix.columns(1995, 2014)
+    expected = []
+    for values in series:
+        block = values[columns]
+        expected.append([row_metric("mean", block[end - window : end]) for end in range(window, len(block) + 1)])
+    assert [scores(row) for row in matrix.rolling(window, columns)] == [pytest.approx(row) for row in expected]
+    with pytest.raises(ValueError):
+        matrix.rolling(len(matrix.years[columns]) + 1, columns)
+
+
+@pytest.mark.parametrize("name", ProductionMatrix.METRICS)
+@pytest.mark.parametrize("ascending", [True, False])
+def test_rank_and_between(
+    matrix: ProductionMatrix, series: list[list[float | None]], name: str, ascending: bool
+) -> None:
+    columns = matrix.columns()
+    positions = matrix.select(None, None)
+    metrics = [row_metric(name, values[columns]) for values in series]
+    ranked = sorted(
+        (position for position in positions.tolist() if metrics[position] is not None),
+        key=lambda position: metrics[position] if ascending else -metrics[position],
+    )
+    assert matrix.rank(name, columns, positions, 10, ascending).tolist() == ranked[:10]
+    assert matrix.between(name, columns, positions, 0.0, 50.0).tolist() == [
+        position for position in positions.tolist() if metrics[position] is not None and 0 <= metrics[position] <= 50
+    ]
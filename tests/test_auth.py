@@ -0,0 +1,126 @@
+import asyncio
+import typing
+
+import pytest
+from api.utils.auth import Authenticator, hash_password, verify_password
+from api.utils.models import Principal
+
+PHONE: int = 9000000001
+
+
+class Users:
+    authenticator: Authenticator
+
+    def __init__(self) -> None:
+        self.passwords: dict[int, str] = {}
+        self.loads = 0
+
+    async def load(self, phone: int) -> Principal | None:
+        self.loads += 1
+        stored = self.passwords.get(phone)
+        if stored is None:
+            return None
+        return Principal(phone, "Test", "Kerala", "Idukki", self.authenticator.fingerprint(stored))
+
+
+@pytest.fixture
+def users() -> typing.Iterator[Users]:
+    users = Users()
+    users.authenticator = Authenticator("secret", users.load, 3600, 2**10, 1, 2, 60)
+    users.passwords[PHONE] = hash_password("hunter22", n=2**10)
+    yield users
+    users.authenticator.close()
+
+
+def test_password_roundtrip() -> None:
+    stored = hash_password("hunter22", n=2**10)
+    assert stored.startswith("scrypt$1024$8$1$")
+    assert verify_password("hunter22", stored) == (True, False)
+    assert verify_password("hunter23", stored) == (False, False)
+    assert hash_password("hunter22", n=2**10) != stored
+
+
+def test_password_legacy_and_malformed() -> None:
+    assert verify_password("plain", "plain") == (True, True)
+    assert verify_password("plain", "other") == (False, True)
+    assert verify_password("hunter22", "scrypt$1024$8") == (False, False)
+    assert verify_password("hunter22", "scrypt$x$8$1$c2FsdA$ZGlnZXN0") == (False, False)
+
+
+def test_issue_and_decode(users: Users) -> None:
+    authenticator = users.authenticator
+    stored = users.passwords[PHONE]
+    token = authenticator.issue(PHONE, stored)
+    assert authenticator.decode(token.token) == (PHONE, authenticator.fingerprint(stored))
+    body, _, signature = token.token.partition(".")
+    assert authenticator.decode(f"{body}.{signature[::-1]}") is None
+    assert authenticator.decode(f"{body}x.{signature}") is None
+    assert authenticator.decode("not-a-token") is None
+    assert Authenticator("other", users.load, 3600, 2**10, 1, 2, 60).decode(token.token) is None
+    expired = Authenticator("secret", users.load, -1, 2**10, 1, 2, 60)
+    assert expired.decode(expired.issue(PHONE, stored).token) is None
+
+
+def test_authenticate_and_revoke(users: Users) -> None:
+    authenticator = users.authenticator
+
+    async def run() -> None:
+        token = authenticator.issue(PHONE, users.passwords[PHONE]).token
+        principal = await authenticator.authenticate(f"Bearer {token}")
+        assert principal is not None and principal.phone == PHONE
+        assert await authenticator.authenticate(f"bearer {token}") == principal
+        assert await authenticator.authenticate(token) is None
+        assert await authenticator.authenticate(None) is None
+        assert users.loads == 1
+        users.passwords[PHONE] = hash_password("changed", n=2**10)
+        assert await authenticator.authenticate(f"Bearer {token}") == principal
+        authenticator.invalidate(PHONE)
+        assert await authenticator.authenticate(f"Bearer {token}") is None
+        fresh = authenticator.issue(PHONE, users.passwords[PHONE]).token
+        assert await authenticator.authenticate(f"Bearer {fresh}") is not None
+        del users.passwords[PHONE]
+        authenticator.invalidate(PHONE)
+        assert await authenticator.authenticate(f"Bearer {fresh}") is None
+
+    asyncio.run(run())
+
+
+def test_principal_cache(users: Users) -> None:
+    authenticator = users.authenticator
+    for phone in (PHONE + 1, PHONE + 2):
+        users.passwords[phone] = users.passwords[PHONE]
+
+    async def run() -> None:
+        for phone in (PHONE, PHONE, PHONE + 1, PHONE + 2, PHONE):
+            assert (await authenticator.principal(phone)).phone == phone
+        assert (authenticator.hits, authenticator.misses) == (1, 4)
+        assert list(authenticator.principals) == [PHONE + 2, PHONE]
+        assert await authenticator.principal(0) is None
+
+    asyncio.run(run())
+    assert authenticator.stats == {"hits": 1, "misses": 5, "hit_ratio": pytest.approx(1 / 6), "size": 2}
+
+
+def test_principal_skips_cache_across_invalidation(users: Users) -> None:
+    authenticator = users.authenticator
+    release = asyncio.Event()
+    load = users.load
+
+    async def slow(phone: int) -> Principal | None:
+        principal = await load(phone)
+        await release.wait()
+        return principal
+
+    authenticator.load = slow
+
+    async def run() -> None:
+        pending = asyncio.create_task(authenticator.principal(PHONE))
+        await asyncio.sleep(0)
+        authenticator.invalidate(PHONE)
+        release.set()
+        assert (await pending).phone == PHONE
+        assert PHONE not in authenticator.principals
+        assert (await authenticator.principal(PHONE)).phone == PHONE
+        assert PHONE in authenticator.principals
+
+    asyncio.run(run())
@@ -0,0 +1,231 @@
+import asyncio
+import collections
+import time
+import typing
+
+import pytest
+from api.utils.cache import MemoryBackend, ProfileCache, ResponseCache, SqliteBackend
+from api.utils.models import User
+
+
+class Upstream:
+    def __init__(self, *values: tuple[bytes, bool]) -> None:
+        self.values = list(values)
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def load(self) -> tuple[bytes, bool]:
+        self.calls += 1
+        await self.release.wait()
+        return self.values[min(self.calls, len(self.values)) - 1]
+
+
+def response_cache() -> ResponseCache:
+    return ResponseCache(MemoryBackend(8), {"forecast": 60.0}, 30.0)
+
+
+def test_memory_backend_evicts_least_recently_used() -> None:
+    backend = MemoryBackend(3)
+
+    async def run() -> None:
+        for key in "abcd":
+            await backend.set(key, 0.0, key.encode())
+        assert await backend.get("a") is None
+        assert await backend.get("b") == (0.0, b"b")
+        await backend.set("e", 1.0, b"e")
+
+    asyncio.run(run())
+    assert list(backend.entries) == ["d", "b", "e"]
+
+
+def test_concurrent_misses_share_one_load() -> None:
+    cache = response_cache()
+
+    async def run() -> list[bytes]:
+        upstream = Upstream((b"fresh", True))
+        pending = [asyncio.create_task(cache.fetch("forecast", "key", upstream.load)) for _ in range(10)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        values = await asyncio.gather(*pending)
+        assert upstream.calls == 1
+        assert await cache.fetch("forecast", "key", upstream.load) == b"fresh"
+        assert upstream.calls == 1
+        return values
+
+    assert asyncio.run(run()) == [b"fresh"] * 10
+    assert (cache.misses, cache.coalesced, cache.hits) == (10, 9, 1)
+    assert cache.inflight == {}
+
+
+def test_stale_entry_is_served_while_one_refresh_runs() -> None:
+    cache = response_cache()
+
+    async def run() -> None:
+        await cache.backend.set("key", time.time() - 75, b"old")
+        upstream = Upstream((b"new", True))
+        assert [await cache.fetch("forecast", "key", upstream.load) for _ in range(3)] == [b"old"] * 3
+        await asyncio.sleep(0)
+        assert upstream.calls == 1
+        upstream.release.set()
+        await asyncio.gather(*cache.inflight.values())
+        assert await cache.fetch("forecast", "key", upstream.load) == b"new"
+        assert upstream.calls == 1
+
+    asyncio.run(run())
+    assert (cache.stale_hits, cache.coalesced, cache.hits) == (3, 2, 1)
+
+
+def test_expired_entry_waits_for_reload() -> None:
+    cache = response_cache()
+
+    async def run() -> bytes:
+        await cache.backend.set("key", time.time() - 95, b"old")
+        upstream = Upstream((b"new", True))
+        upstream.release.set()
+        return await cache.fetch("forecast", "key", upstream.load)
+
+    assert asyncio.run(run()) == b"new"
+    assert cache.misses == 1
+
+
+def test_failed_load_is_not_cached() -> None:
+    cache = response_cache()
+
+    async def run() -> list[bytes]:
+        upstream = Upstream((b"error", False), (b"ok", True))
+        upstream.release.set()
+        values = [await cache.fetch("forecast", "key", upstream.load) for _ in range(3)]
+        assert upstream.calls == 2
+        return values
+
+    assert asyncio.run(run()) == [b"error", b"ok", b"ok"]
+
+
+def test_loader_errors_reach_every_waiter() -> None:
+    cache = response_cache()
+
+    async def broken() -> tuple[bytes, bool]:
+        await asyncio.sleep(0)
+        raise ConnectionError("upstream down")
+
+    async def run() -> list[typing.Any]:
+        pending = [cache.fetch("forecast", "key", broken) for _ in range(3)]
+        return list(await asyncio.gather(*pending, return_exceptions=True))
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert cache.inflight == {}
+    assert asyncio.run(cache.backend.get("key")) is None
+
+
+@pytest.mark.parametrize(
+    "location, params, key",
+    [
+        ("New  Delhi, India", {"unitGroup": "metric", "key": "x"}, "forecast|new delhi,india|today|unitGroup=metric"),
+        ("new delhi,INDIA", {"key": "y", "unitGroup": "metric"}, "forecast|new delhi,india|today|unitGroup=metric"),
+    ],
+)
+def test_key_ignores_credentials_and_spacing(location: str, params: dict[str, str], key: str) -> None:
+    assert ResponseCache.key("forecast", location, "today", params) == key
+
+
+def user(phone: int, name: str = "Test") -> User:
+    return User(phone, name, "hash", "Kerala", "Idukki")
+
+
+def loader(value: User | None, calls: list[int]) -> typing.Callable[[], typing.Awaitable[User | None]]:
+    async def load() -> User | None:
+        calls.append(1)
+        return value
+
+    return load
+
+
+def test_profile_cache_replays_lru_order() -> None:
+    cache = ProfileCache(3, 60)
+    expected: collections.OrderedDict[int, User] = collections.OrderedDict()
+    calls: list[int] = []
+    loads = 0
+
+    async def run() -> None:
+        nonlocal loads
+        for phone in (1, 2, 3, 1, 4, 2, 5, 1, 1, 3, 6, 4):
+            if phone in expected:
+                expected.move_to_end(phone)
+            else:
+                loads += 1
+                expected[phone] = user(phone)
+                if len(expected) > 3:
+                    expected.popitem(last=False)
+            assert await cache.get(phone, loader(user(phone), calls)) == user(phone)
+            assert list(cache.entries) == list(expected)
+
+    asyncio.run(run())
+    assert len(calls) == loads == cache.misses
+    assert cache.hits == 12 - loads
+    assert cache.evictions == loads - 3
+
+
+def test_profile_cache_expiry_and_missing() -> None:
+    cache = ProfileCache(3, -1)
+    calls: list[int] = []
+
+    async def run() -> None:
+        assert await cache.get(1, loader(None, calls)) is None
+        assert 1 not in cache.entries
+        await cache.get(1, loader(user(1), calls))
+        await cache.get(1, loader(user(1), calls))
+
+    asyncio.run(run())
+    assert len(calls) == 3
+    assert cache.expirations == 1
+
+
+def test_profile_cache_invalidate() -> None:
+    cache = ProfileCache(3, 60)
+    cache.put(user(1))
+    cache.invalidate(1)
+    cache.invalidate(2)
+    assert cache.entries == {}
+    assert cache.invalidations == 1
+    assert cache.generation == 2
+
+
+def test_profile_cache_skips_loads_racing_an_invalidation() -> None:
+    cache = ProfileCache(3, 60)
+    release = asyncio.Event()
+
+    async def stale() -> User | None:
+        await release.wait()
+        return user(1, "Old")
+
+    async def run() -> None:
+        pending = asyncio.create_task(cache.get(1, stale))
+        await asyncio.sleep(0)
+        cache.invalidate(1)
+        release.set()
+        assert (await pending).name == "Old"
+        assert 1 not in cache.entries
+        assert (await cache.get(1, loader(user(1, "New"), []))).name == "New"
+        assert cache.entries[1][1].name == "New"
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("capacity, max_age", [(3, None), (3, 100.0), (10, 25.0)])
+def test_sqlite_backend_keeps_newest_rows(capacity: int, max_age: float | None) -> None:
+    backend = SqliteBackend(":memory:", capacity, max_age)
+    writes = [(f"key{number % 6}", number * 10.0) for number in range(15)]
+    stored: dict[str, float] = {}
+
+    async def run() -> None:
+        for key, stored_at in writes:
+            await backend.set(key, stored_at, key.encode())
+            stored[key] = stored_at
+            fresh = {name: at for name, at in stored.items() if max_age is None or at >= stored_at - max_age}
+            expected = dict(sorted(fresh.items(), key=lambda item: -item[1])[:capacity])
+            rows = backend.connection.execute("SELECT KEY, STORED_AT FROM responses").fetchall()
+            assert dict(rows) == expected
+            assert await backend.get(key) == (stored_at, key.encode())
+
+    asyncio.run(run())
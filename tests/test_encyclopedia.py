@@ -0,0 +1,100 @@
+import asyncio
+import pathlib
+import types
+import typing
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from api.routes.encyclopedia import Encyclopedia, describe
+from api.setup import Logs
+
+PAGE: str = "<html><body><h1>Rice</h1>{}</body></html>"
+
+
+def test_describe_joins_first_paragraphs() -> None:
+    paragraphs = [f"Paragraph {number}." for number in range(10)]
+    html = PAGE.format("<p></p>" + "".join(f"<p>{text}</p><div>skip</div>" for text in paragraphs))
+    assert describe(html) == "".join(paragraphs[:7])
+    assert describe(PAGE.format("<p>Only <b>bold</b> text</p>")) == "Only bold text"
+    assert describe(PAGE.format("")) == ""
+
+
+@pytest.fixture
+def encyclopedia(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> typing.Iterator[Encyclopedia]:
+    monkeypatch.setattr(Encyclopedia, "WIKIPEDIA_CACHE_PATH", str(tmp_path / "wikipedia.sqlite3"))
+    monkeypatch.setattr(Encyclopedia, "PARSER_WORKERS", 1)
+    encyclopedia = Encyclopedia(typing.cast(typing.Any, types.SimpleNamespace()), Logs())
+    yield encyclopedia
+    encyclopedia.workers.shutdown()
+
+
+def test_parser_caches_found_and_missing_pages(encyclopedia: Encyclopedia, monkeypatch: pytest.MonkeyPatch) -> None:
+    requests: list[str] = []
+    statuses = {"Oryza_sativa": 200, "Nothing": 404, "Flaky": 503}
+
+    async def handle(request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        requests.append(name)
+        return web.Response(text=PAGE.format(f"<p>About {name}.</p>"), status=statuses.get(name, 404))
+
+    async def run() -> list[str]:
+        app = web.Application()
+        app.router.add_get("/wiki/{name}", handle)
+        async with TestServer(app) as server, aiohttp.ClientSession() as client:
+            encyclopedia.database.client = client
+            monkeypatch.setattr(Encyclopedia, "WIKIPEDIA", str(server.make_url("/wiki/")))
+            plants = []
+            for name in ("oryza sativa", "Oryza sativa", "nothing", "nothing", "flaky", "flaky"):
+                plants.append(await encyclopedia.parser({"scientific_name": name, "common_name": None}))
+            return [plant.description for plant in plants]
+
+    descriptions = asyncio.run(run())
+    assert requests == ["Oryza_sativa", "Nothing", "Flaky", "Flaky"]
+    assert descriptions[0] == descriptions[1]
+    assert descriptions[0].startswith("About Oryza_sativa.... [http://")
+    assert descriptions[2] == descriptions[3]
+    assert descriptions[2].startswith("No description found....")
+    assert asyncio.run(encyclopedia.store.get("oryza sativa")) is not None
+    assert asyncio.run(encyclopedia.store.get("flaky")) is None
+
+
+def test_failed_lookups_do_not_fail_the_batch(encyclopedia: Encyclopedia, monkeypatch: pytest.MonkeyPatch) -> None:
+    requests: list[str] = []
+
+    async def handle(request: web.Request) -> web.StreamResponse:
+        name = request.match_info["name"]
+        requests.append(name)
+        if name == "Slow":
+            await asyncio.sleep(0.5)
+        if name == "Broken":
+            assert request.transport is not None
+            request.transport.close()
+        return web.Response(text=PAGE.format(f"<p>About {name}.</p>"))
+
+    async def run() -> list[str]:
+        app = web.Application()
+        app.router.add_get("/wiki/{name}", handle)
+        async with TestServer(app) as server, aiohttp.ClientSession() as client:
+            encyclopedia.database.client = client
+            monkeypatch.setattr(Encyclopedia, "WIKIPEDIA", str(server.make_url("/wiki/")))
+            monkeypatch.setattr(Encyclopedia, "WIKIPEDIA_TIMEOUT", 0.05)
+            items: list[dict[str, typing.Any]] = [
+                {"scientific_name": "slow"},
+                {"scientific_name": "broken"},
+                {"scientific_name": None, "common_name": None},
+                {"scientific_name": None, "common_name": "rice"},
+            ]
+            return [plant.description for plant in await encyclopedia.processor(items)]
+
+    descriptions = asyncio.run(run())
+    assert set(requests) == {"Broken", "Rice", "Slow"}
+    assert [description.startswith("No description found.") for description in descriptions] == [
+        True,
+        True,
+        True,
+        False,
+    ]
+    assert descriptions[3].startswith("About Rice.")
+    assert list(encyclopedia.descriptions.entries) == ["rice"]
@@ -0,0 +1,73 @@
+import asyncio
+import typing
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from api.utils.fetch import fetch_json, fetch_pages
+
+
+class Upstream:
+    def __init__(self, failures: int = 0, delay: float = 0.0) -> None:
+        self.failures = failures
+        self.delay = delay
+        self.requests: list[dict[str, str]] = []
+        self.active = 0
+        self.peak = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests.append(dict(request.query))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if len(self.requests) <= self.failures:
+                return web.json_response({"error": "busy"}, status=503)
+            return web.json_response({"page": int(request.query.get("page", "1")), "query": dict(request.query)})
+        finally:
+            self.active -= 1
+
+
+def serve(
+    upstream: Upstream, call: typing.Callable[[aiohttp.ClientSession, str], typing.Awaitable[typing.Any]]
+) -> typing.Any:
+    async def run() -> typing.Any:
+        app = web.Application()
+        app.router.add_get("/items", upstream.handle)
+        async with TestServer(app) as server, aiohttp.ClientSession() as client:
+            return await call(client, str(server.make_url("/items")))
+
+    return asyncio.run(run())
+
+
+def test_fetch_json_retries_transient_statuses() -> None:
+    upstream = Upstream(failures=2)
+    result = serve(upstream, lambda client, url: fetch_json(client, url, {"q": "rice"}, retries=3, backoff=0))
+    assert result == {"page": 1, "query": {"q": "rice"}}
+    assert len(upstream.requests) == 3
+
+
+def test_fetch_json_returns_last_response_when_retries_run_out() -> None:
+    upstream = Upstream(failures=5)
+    assert serve(upstream, lambda client, url: fetch_json(client, url, retries=2, backoff=0)) == {"error": "busy"}
+    assert len(upstream.requests) == 3
+
+
+def test_fetch_json_raises_connection_errors() -> None:
+    async def run() -> None:
+        async with aiohttp.ClientSession() as client:
+            await fetch_json(client, "http://127.0.0.1:9/items", retries=1, backoff=0)
+
+    with pytest.raises(aiohttp.ClientError):
+        asyncio.run(run())
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_fetch_pages_keeps_page_order(concurrency: int) -> None:
+    upstream = Upstream(delay=0.01)
+    params = {"key": "x", "q": "rice"}
+    pages = serve(upstream, lambda client, url: fetch_pages(client, url, params, range(2, 9), concurrency, 0, 0))
+    assert pages == [{"page": page, "query": {"key": "x", "q": "rice", "page": str(page)}} for page in range(2, 9)]
+    assert sorted(int(query["page"]) for query in upstream.requests) == list(range(2, 9))
+    assert upstream.peak == concurrency
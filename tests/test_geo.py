@@ -0,0 +1,45 @@
+import asyncio
+import csv
+import pathlib
+
+import numpy as np
+import pytest
+from api.utils.geo import MarketLocator, haversine
+
+
+@pytest.fixture(scope="module")
+def locator(assets: pathlib.Path) -> MarketLocator:
+    locator = MarketLocator()
+    asyncio.run(locator.load(str(assets / "district_locations.csv"), str(assets / "market_locations.csv")))
+    return locator
+
+
+def test_load(locator: MarketLocator, assets: pathlib.Path) -> None:
+    with open(assets / "market_locations.csv", newline="") as file:
+        markets = list(csv.DictReader(file))
+    assert locator.markets == [(row["State"], row["District"], row["Market"]) for row in markets]
+    assert sum(len(positions) for positions in locator.cells.values()) == len(markets)
+
+
+def test_locate(locator: MarketLocator, assets: pathlib.Path) -> None:
+    with open(assets / "district_locations.csv", newline="") as file:
+        row = next(csv.DictReader(file))
+    assert locator.locate(row["State"], row["District"]) == (float(row["Latitude"]), float(row["Longitude"]))
+    assert locator.locate(row["State"], "Nowhere") is None
+
+
+def test_haversine() -> None:
+    distances = haversine(0.0, 0.0, np.array([0.0, 0.0, 90.0]), np.array([0.0, 1.0, 0.0]))
+    assert distances == pytest.approx([0.0, 111.195, 10007.557], abs=1e-3)
+
+
+@pytest.mark.parametrize("radius", [5.0, 25.0, 100.0, 400.0])
+def test_within_finds_every_market_in_radius(locator: MarketLocator, radius: float) -> None:
+    centres = list(locator.districts.values())[::15] + [(8.1, 77.5), (34.1, 74.8), (23.0, 70.0), (0.0, 0.0)]
+    for latitude, longitude in centres:
+        distances = haversine(latitude, longitude, locator.latitudes, locator.longitudes)
+        expected = np.flatnonzero(distances <= radius)
+        positions, found = locator.within(latitude, longitude, radius)
+        order = np.argsort(positions)
+        assert positions[order].tolist() == expected.tolist()
+        assert found[order] == pytest.approx(distances[expected])
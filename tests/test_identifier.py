@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import io
+import types
+import typing
+import zipfile
+
+import aiohttp
+import orjson
+import pytest
+import uvicorn
+from api.routes.identifier import Identifier
+from api.setup import Logs
+from api.utils import plantid
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+
+class Lens(Identifier):
+    active: int = 0
+    peak: int = 0
+
+    async def analyse(self, endpoint: str, data: bytes, digest: str) -> bytes:
+        Lens.active += 1
+        Lens.peak = max(Lens.peak, Lens.active)
+        try:
+            name = data.decode()
+            await asyncio.sleep({"slow": 1.0, "late": 0.02}.get(name, 0.0))
+            if name == "broken":
+                raise HTTPException(status_code=400, detail="Invalid or oversized image")
+            if name == "offline":
+                raise ConnectionError("upstream down")
+            return orjson.dumps({"name": name, "endpoint": endpoint})
+        finally:
+            Lens.active -= 1
+
+
+@pytest.fixture
+def lens(monkeypatch: pytest.MonkeyPatch) -> typing.Iterator[Lens]:
+    monkeypatch.setattr(Identifier, "BATCH_MAX_ITEMS", 4)
+    monkeypatch.setattr(Identifier, "BATCH_CONCURRENCY", 2)
+    monkeypatch.setattr(Identifier, "BATCH_ITEM_TIMEOUT", 0.1)
+    monkeypatch.setattr(Identifier, "IMAGE_WORKERS", 1)
+    Lens.active = Lens.peak = 0
+    lens = Lens(typing.cast(typing.Any, types.SimpleNamespace()), Logs())
+    yield lens
+    asyncio.run(lens.close())
+
+
+def upload(name: str, content: bytes | None = None) -> UploadFile:
+    return UploadFile(name, io.BytesIO(name.encode() if content is None else content))
+
+
+def archive(*names: str) -> UploadFile:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as file:
+        for name in names:
+            file.writestr(name, name)
+    return upload("photos.zip", buffer.getvalue())
+
+
+def lines(lens: Lens, files: list[UploadFile], mode: typing.Literal["identify", "diagnose", "both"]) -> list[dict]:
+    async def run() -> list[dict]:
+        response = await lens.batch(files, None, mode)
+        return [orjson.loads(line) async for line in typing.cast(typing.AsyncIterator[bytes], response.body_iterator)]
+
+    return asyncio.run(run())
+
+
+def test_collect_keeps_files_before_archive_members(lens: Lens) -> None:
+    items = asyncio.run(lens.collect([upload("a"), upload("b")], archive("c", "d")))
+    assert items == [("a", b"a"), ("b", b"b"), ("c", b"c"), ("d", b"d")]
+
+
+def test_collect_checks_counts_before_reading_uploads(lens: Lens) -> None:
+    files = [upload(name) for name in "abcde"]
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(lens.collect(files, archive("f")))
+    assert error.value.status_code == 422
+    assert all(file.file.tell() == 0 for file in files)
+    files = [upload(name) for name in "abc"]
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(lens.collect(files, archive("d", "e")))
+    assert error.value.status_code == 400
+    assert error.value.detail == "Invalid archive: Archive holds more than 1 files"
+    assert all(file.file.tell() == 0 for file in files)
+
+
+def test_collect_rejects_empty_and_unreadable_batches(lens: Lens) -> None:
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(lens.collect([], None))
+    assert error.value.status_code == 422
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(lens.collect([], upload("photos.zip", b"not a zip")))
+    assert error.value.status_code == 400
+
+
+def test_batch_fans_out_every_image_to_each_endpoint(lens: Lens) -> None:
+    results = lines(lens, [upload("a"), upload("b"), upload("c")], "both")
+    assert sorted((line["file"], line["endpoint"]) for line in results) == [
+        (name, endpoint) for name in "abc" for endpoint in ("diagnose", "identify")
+    ]
+    assert all(line["result"] == {"name": line["file"], "endpoint": line["endpoint"]} for line in results)
+    assert Lens.peak == 2
+    assert [line["endpoint"] for line in lines(lens, [upload("a")], "diagnose")] == ["diagnose"]
+
+
+def test_batch_reports_failures_per_item(lens: Lens) -> None:
+    results = lines(lens, [upload("broken"), upload("offline"), upload("slow"), upload("late")], "identify")
+    assert [line["file"] for line in results] == ["broken", "offline", "late", "slow"]
+    assert [line.get("error") for line in results] == [
+        "Invalid or oversized image",
+        "Upstream request failed",
+        None,
+        "Timed out",
+    ]
+    assert results[2]["result"] == {"name": "late", "endpoint": "identify"}
+
+
+class Standin(uvicorn.Server):
+    def install_signal_handlers(self) -> None:
+        pass
+
+
+def test_analyse_caches_results_by_prepared_image(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(plantid, "LATENCY", 0.0)
+    monkeypatch.setattr(Identifier, "IMAGE_WORKERS", 1)
+    monkeypatch.setattr(Identifier, "IMAGE_MAX_DIMENSION", 64)
+    monkeypatch.setattr(Identifier, "HEADERS", {"Content-Type": "application/json", "Api-Key": "standin"})
+    identifier = Identifier(typing.cast(typing.Any, types.SimpleNamespace()), Logs())
+    output = io.BytesIO()
+    Image.new("RGB", (300, 200), "green").save(output, format="JPEG")
+    photo = output.getvalue()
+    padded = photo + bytes(16)
+
+    async def analyse(endpoint: str, data: bytes) -> typing.Any:
+        return orjson.loads(await identifier.analyse(endpoint, data, hashlib.sha256(data).hexdigest()))
+
+    async def run() -> list[typing.Any]:
+        server = Standin(uvicorn.Config(plantid.app, host="127.0.0.1", port=0, log_level="warning"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        url = f"http://127.0.0.1:{server.servers[0].sockets[0].getsockname()[1]}/v2/"
+        monkeypatch.setattr(
+            Identifier,
+            "TARGETS",
+            {
+                "identify": (f"{url}identify", Identifier.INFO_DETAILS),
+                "diagnose": (f"{url}health_assessment", Identifier.DIAGNOSE_DETAILS),
+            },
+        )
+        try:
+            async with aiohttp.ClientSession() as client:
+                identifier.database = typing.cast(typing.Any, types.SimpleNamespace(client=client))
+                return [
+                    await analyse("identify", photo),
+                    await analyse("identify", photo),
+                    await analyse("identify", padded),
+                    await analyse("diagnose", photo),
+                ]
+        finally:
+            server.should_exit = True
+            await serving
+            await identifier.close()
+
+    first, again, reencoded, diagnosis = asyncio.run(run())
+    assert first == again == reencoded
+    assert first["suggestions"][0]["plant_name"] == "Oryza sativa"
+    assert first["plant_details"] == Identifier.INFO_DETAILS
+    assert first["images"][0]["bytes"] < len(photo)
+    assert diagnosis["id"] == first["id"] and "health_assessment" in diagnosis
+    assert (identifier.cache.misses, identifier.cache.hits) == (2, 2)
+    assert len(identifier.digests.entries) == 2
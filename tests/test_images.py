@@ -0,0 +1,78 @@
+import asyncio
+import hashlib
+import io
+import zipfile
+
+import pytest
+from api.utils.images import CHUNK, prepare_image, read_upload, unpack_archive
+from fastapi import UploadFile
+from PIL import Image
+
+
+def photo(width: int, height: int, orientation: int | None = None) -> bytes:
+    image = Image.new("RGB", (width, height), "green")
+    image.paste("yellow", (0, 0, width // 2, height))
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    output = io.BytesIO()
+    image.save(output, format="JPEG", exif=exif)
+    return output.getvalue()
+
+
+def archive(entries: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as file:
+        for name, content in entries.items():
+            file.writestr(name, content)
+    return buffer.getvalue()
+
+
+def test_prepare_image_downsizes_and_reencodes() -> None:
+    prepared = prepare_image(photo(2000, 1000), 500, 80)
+    with Image.open(io.BytesIO(prepared.content)) as image:
+        assert (image.format, image.size) == ("JPEG", (500, 250))
+    assert prepared.digest == hashlib.sha256(prepared.content).hexdigest()
+    assert prepared.encoded.startswith("/9j/")
+    small = prepare_image(photo(40, 20), 500, 80)
+    with Image.open(io.BytesIO(small.content)) as image:
+        assert image.size == (40, 20)
+
+
+def test_prepare_image_applies_exif_orientation() -> None:
+    with Image.open(io.BytesIO(prepare_image(photo(40, 20, orientation=6), 500, 80).content)) as image:
+        assert image.size == (20, 40)
+        assert image.getpixel((10, 5)) == pytest.approx((255, 255, 0), abs=24)
+        assert image.getpixel((10, 35)) == pytest.approx((0, 128, 0), abs=24)
+
+
+def test_prepare_image_rejects_unreadable_data() -> None:
+    with pytest.raises(ValueError, match="Unreadable image"):
+        prepare_image(b"not an image", 500, 80)
+
+
+def test_read_upload_hashes_every_chunk() -> None:
+    data = bytes(range(256)) * (CHUNK // 128)
+    content, digest = asyncio.run(read_upload(UploadFile("leaf.jpg", io.BytesIO(data)), len(data)))
+    assert content == data
+    assert digest == hashlib.sha256(data).hexdigest()
+    with pytest.raises(ValueError, match="exceeds"):
+        asyncio.run(read_upload(UploadFile("leaf.jpg", io.BytesIO(data)), len(data) - 1))
+    with pytest.raises(ValueError, match="Empty"):
+        asyncio.run(read_upload(UploadFile("leaf.jpg", io.BytesIO()), len(data)))
+
+
+def test_unpack_archive_skips_folders_and_hidden_files() -> None:
+    data = archive(
+        {"a.jpg": b"a", "field/b.jpg": b"b", "field/": b"", "__MACOSX/field/._b.jpg": b"x", "field/.DS_Store": b"x"}
+    )
+    assert unpack_archive(data, 10, 2) == [("a.jpg", b"a"), ("field/b.jpg", b"b")]
+    with pytest.raises(ValueError, match="more than 1 files"):
+        unpack_archive(data, 10, 1)
+
+
+def test_unpack_archive_rejects_oversized_and_broken_archives() -> None:
+    with pytest.raises(ValueError, match="big.jpg exceeds 4 bytes"):
+        unpack_archive(archive({"small.jpg": b"a", "big.jpg": b"abcde"}), 4, 5)
+    with pytest.raises(ValueError, match="Unreadable archive"):
+        unpack_archive(b"PK not really", 4, 5)
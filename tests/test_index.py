@@ -0,0 +1,96 @@
+import typing
+
+import pytest
+from api.utils.index import PriceIndex
+from api.utils.models import Price
+
+
+@pytest.fixture(scope="module")
+def index(prices: list[tuple[typing.Any, ...]]) -> PriceIndex:
+    index = PriceIndex()
+    index.load(list(reversed(prices)))
+    return index
+
+
+def scan(
+    rows: list[Price],
+    filters: dict[str, str],
+    budget: tuple[int, int] | None = None,
+    _id: int | None = None,
+    after: int | None = None,
+) -> list[Price]:
+    low, high = sorted(budget) if budget is not None else (None, None)
+    return [
+        row
+        for row in rows
+        if all(getattr(row, column) == value for column, value in filters.items())
+        and (low is None or low <= row.MODAL_PRICE <= high)
+        and (_id is None or row.ID == _id)
+        and (after is None or row.ID > after)
+    ]
+
+
+def test_load_orders_rows_by_id(index: PriceIndex, rows: list[Price]) -> None:
+    assert len(index) == len(rows)
+    assert index.rows == rows
+
+
+def test_values_and_has(index: PriceIndex, rows: list[Price]) -> None:
+    for column in PriceIndex.COLUMNS:
+        expected = sorted({getattr(row, column) for row in rows})
+        assert index.values(column) == expected
+        assert all(index.has(column, value) for value in expected)
+        assert not index.has(column, "Nowhere")
+    assert index.values("VARIETY") == []
+
+
+def test_get(index: PriceIndex, rows: list[Price]) -> None:
+    for row in rows[::250]:
+        assert index.get(row.ID) == row
+    assert index.get(0) is None
+    assert index.get(len(rows) + 1) is None
+
+
+@pytest.mark.parametrize(
+    "columns",
+    [
+        (),
+        ("STATE",),
+        ("COMMODITY",),
+        ("STATE", "COMMODITY"),
+        ("STATE", "DISTRICT", "MARKET"),
+        ("DISTRICT", "MARKET", "COMMODITY"),
+    ],
+)
+def test_bitmap_filters(index: PriceIndex, rows: list[Price], columns: tuple[str, ...]) -> None:
+    for sample in rows[::400]:
+        filters = {column: getattr(sample, column) for column in columns}
+        assert index.filter(filters) == scan(rows, filters)
+
+
+@pytest.mark.parametrize("budget", [(1000, 3000), (3000, 1000), (0, 0), (2500, 2500)])
+def test_budget_range(index: PriceIndex, rows: list[Price], budget: tuple[int, int]) -> None:
+    state = rows[0].STATE
+    assert index.filter({}, budget) == scan(rows, {}, budget)
+    assert index.filter({"STATE": state}, budget) == scan(rows, {"STATE": state}, budget)
+
+
+def test_single_id(index: PriceIndex, rows: list[Price]) -> None:
+    sample = rows[100]
+    assert index.filter({}, _id=sample.ID) == [sample]
+    assert index.filter({"STATE": sample.STATE}, _id=sample.ID) == [sample]
+    other = next(row.STATE for row in rows if row.STATE != sample.STATE)
+    assert index.filter({"STATE": other}, _id=sample.ID) == []
+
+
+def test_keyset_pages(index: PriceIndex, rows: list[Price]) -> None:
+    filters = {"COMMODITY": rows[0].COMMODITY}
+    expected = scan(rows, filters)
+    pages, after = [], None
+    while page := index.filter(filters, after=after, limit=7):
+        pages.extend(page)
+        after = page[-1].ID
+    assert pages == expected
+    assert index.filter(filters, after=expected[10].ID) == scan(rows, filters, after=expected[10].ID)
+    assert index.filter(filters, limit=5, offset=3) == expected[3:8]
+    assert index.filter(filters, offset=len(expected)) == []
@@ -0,0 +1,28 @@
+import asyncio
+import pathlib
+import typing
+
+import pytest
+from api.setup import Logs
+from api.utils.loader import CsvLoader, LoadReport, parse_production
+
+
+def test_records_skip_and_log_bad_rows(tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture) -> None:
+    path = tmp_path / "production.csv"
+    path.write_text(
+        "Particulars,Frequency,Unit,1993\nRice,Kharif,Tonnes,12.5\n\n,Rabi,Tonnes,1\nWheat,Rabi,Tonnes,x\n"
+    )
+    loader = CsvLoader("production", ("crop", "frequency", "unit", "values"), ("crop",), parse_production)
+    report = LoadReport("production")
+
+    async def run() -> list[tuple[typing.Any, ...]]:
+        return [record async for record in loader.records(str(path), report, Logs())]
+
+    with caplog.at_level("WARNING"):
+        records = asyncio.run(run())
+    assert records == [("Rice", "Kharif", "Tonnes", [12.5])]
+    assert (report.copied, report.skipped) == (1, 2)
+    assert [record.getMessage() for record in caplog.records] == [
+        f"Skipping {path}:4 (missing crop name)",
+        f"Skipping {path}:5 (could not convert string to float: 'x')",
+    ]
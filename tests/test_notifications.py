@@ -0,0 +1,106 @@
+import asyncio
+import datetime
+
+from api.utils.models import Message
+from api.utils.notifications import MessageHub
+
+CREATED: datetime.datetime = datetime.datetime(2026, 1, 1)
+
+
+class Inbox:
+    def __init__(self, *messages: Message) -> None:
+        self.messages = list(messages)
+        self.requests: list[tuple[int, int, list[int]]] = []
+
+    async def fetch(self, low: int, high: int, numbers: list[int]) -> list[Message]:
+        self.requests.append((low, high, sorted(numbers)))
+        return [message for message in self.messages if low <= message.ID <= high and message.PHONENUMBER in numbers]
+
+
+def message(_id: int, phone: int) -> Message:
+    return Message(_id, phone, f"message {_id}", CREATED, False)
+
+
+def drain(queue: asyncio.Queue[Message]) -> list[int]:
+    ids = []
+    while not queue.empty():
+        ids.append(queue.get_nowait().ID)
+    return ids
+
+
+def test_subscriptions_are_tracked_per_user() -> None:
+    hub = MessageHub(Inbox().fetch)
+
+    async def run() -> None:
+        first, second, other = hub.subscribe(1), hub.subscribe(1), hub.subscribe(2)
+        assert hub.stats == {"users": 2, "connections": 3, "pending": 0}
+        hub.unsubscribe(1, first)
+        hub.unsubscribe(2, other)
+        hub.unsubscribe(3, other)
+        assert hub.subscribers == {1: {second}}
+
+    asyncio.run(run())
+
+
+def test_notify_without_listeners_does_not_fetch() -> None:
+    inbox = Inbox(message(1, 1))
+    hub = MessageHub(inbox.fetch)
+
+    async def run() -> None:
+        hub.notify("messages_changed", "1")
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert inbox.requests == [] and hub.tasks == set()
+
+
+def test_deliver_routes_messages_to_each_connection_once() -> None:
+    inbox = Inbox(*(message(_id, 1 + _id % 3) for _id in range(1, 13)))
+    hub = MessageHub(inbox.fetch)
+
+    async def run() -> list[list[int]]:
+        queues = [hub.subscribe(1), hub.subscribe(1), hub.subscribe(2)]
+        hub.notify(None, 1234, "messages_changed", "1:6")
+        hub.notify(None, 1234, "messages_changed", "4:9")
+        hub.notify(None, 1234, "messages_changed", "12")
+        await asyncio.gather(*hub.tasks)
+        return [drain(queue) for queue in queues]
+
+    first, second, other = asyncio.run(run())
+    assert first == second == [3, 6, 9, 12]
+    assert other == [1, 4, 7]
+    assert inbox.requests == [(1, 6, [1, 2]), (4, 9, [1, 2]), (12, 12, [1, 2])]
+
+
+def test_slow_consumers_keep_the_newest_messages() -> None:
+    inbox = Inbox(*(message(_id, 1) for _id in range(1, 8)))
+    hub = MessageHub(inbox.fetch, queue_size=3, history=4)
+
+    async def run() -> list[int]:
+        queue = hub.subscribe(1)
+        await hub.deliver(1, 7)
+        return drain(queue)
+
+    assert asyncio.run(run()) == [5, 6, 7]
+    assert list(hub.recent) == [4, 5, 6, 7]
+
+
+def test_close_cancels_pending_deliveries() -> None:
+    release = asyncio.Event()
+
+    async def fetch(low: int, high: int, numbers: list[int]) -> list[Message]:
+        await release.wait()
+        return []
+
+    hub = MessageHub(fetch)
+
+    async def run() -> bool:
+        hub.subscribe(1)
+        hub.notify("messages_changed", "5")
+        task = next(iter(hub.tasks))
+        await asyncio.sleep(0)
+        await hub.close()
+        await asyncio.gather(task, return_exceptions=True)
+        return task.cancelled()
+
+    assert asyncio.run(run())
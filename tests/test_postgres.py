@@ -0,0 +1,198 @@
+import asyncio
+import re
+import sqlite3
+import typing
+
+import asyncpg
+import pytest
+from api.setup import Logs
+from api.utils.models import Price
+from api.utils.postgres import Listener, PreparedConnection, Query, QueryStats, StatementRegistry
+
+COLUMNS: tuple[str, ...] = ("ID", "STATE", "COMMODITY", "MODAL_PRICE")
+
+
+@pytest.fixture(scope="module")
+def sqlite(rows: list[Price]) -> typing.Iterator[sqlite3.Connection]:
+    connection = sqlite3.connect(":memory:")
+    connection.execute(f"CREATE TABLE prices ({', '.join(COLUMNS)})")
+    connection.executemany(
+        "INSERT INTO prices VALUES (?, ?, ?, ?)", [(row.ID, row.STATE, row.COMMODITY, row.MODAL_PRICE) for row in rows]
+    )
+    yield connection
+    connection.close()
+
+
+def execute(connection: sqlite3.Connection, query: Query) -> list[int]:
+    sql, arguments = query.build("ID")
+    return [row[0] for row in connection.execute(re.sub(r"\$(\d+)", r"?\1", sql), arguments)]
+
+
+def test_placeholders_are_numbered_in_order() -> None:
+    query = Query("prices").where("STATE = {}", "Kerala").where("MODAL_PRICE BETWEEN {} AND {}", 10, 20)
+    assert query.build() == (
+        "SELECT * FROM prices WHERE STATE = $1 AND MODAL_PRICE BETWEEN $2 AND $3",
+        ("Kerala", 10, 20),
+    )
+
+
+def test_limit_and_offset_follow_conditions() -> None:
+    query = Query("prices").where("COMMODITY = {}", "Onion").after("ID", 40).order_by("ID").paginate(10, 20)
+    expected = (
+        "SELECT ID, STATE FROM prices WHERE COMMODITY = $1 AND ID > $2 ORDER BY ID LIMIT $3 OFFSET $4",
+        ("Onion", 40, 10, 20),
+    )
+    assert query.build("ID, STATE") == expected
+    assert query.build("ID, STATE") == expected
+    assert Query("prices").paginate(None, 5).build() == ("SELECT * FROM prices OFFSET $1", (5,))
+    assert Query("prices").order_by("ID").paginate(3, 0).build() == ("SELECT * FROM prices ORDER BY ID LIMIT $1", (3,))
+
+
+@pytest.mark.parametrize("limit, offset", [(None, None), (25, None), (25, 50)])
+def test_composed_filters_match_python(sqlite: sqlite3.Connection, rows: list[Price], limit: int, offset: int) -> None:
+    sample = rows[1234]
+    query = (
+        Query("prices")
+        .where("STATE = {}", sample.STATE)
+        .where("MODAL_PRICE BETWEEN {} AND {}", 500, 5000)
+        .after("ID", 100)
+        .order_by("ID")
+        .paginate(limit, offset)
+    )
+    expected = [
+        row.ID for row in rows if row.STATE == sample.STATE and 500 <= row.MODAL_PRICE <= 5000 and row.ID > 100
+    ]
+    start = offset or 0
+    assert execute(sqlite, query) == expected[start : start + limit if limit is not None else None]
+
+
+def test_keyset_pages_cover_every_row(sqlite: sqlite3.Connection, rows: list[Price]) -> None:
+    commodity = rows[0].COMMODITY
+    pages: list[int] = []
+    after = 0
+    while page := execute(
+        sqlite, Query("prices").where("COMMODITY = {}", commodity).after("ID", after).order_by("ID").paginate(9)
+    ):
+        pages.extend(page)
+        after = page[-1]
+    assert pages == [row.ID for row in rows if row.COMMODITY == commodity]
+
+
+class Connection:
+    def __init__(self) -> None:
+        self.warmed: list[list[str]] = []
+
+    async def warm(self, queries: list[str]) -> int:
+        self.warmed.append(queries)
+        return len(queries)
+
+
+def test_registry_prepares_the_busiest_parameterised_statements() -> None:
+    registry = StatementRegistry(2)
+    for query, count in (("SELECT $1", 3), ("SELECT 2 WHERE $1", 5), ("SELECT 3 WHERE $1", 1)):
+        for _ in range(count):
+            registry.record(query, 0.001, parameterized=True)
+    for _ in range(10):
+        registry.record("SELECT 1", 0.001)
+    assert registry.hot == ["SELECT 2 WHERE $1", "SELECT $1"]
+    connection = Connection()
+    asyncio.run(registry.init(typing.cast(typing.Any, connection)))
+    assert connection.warmed == [["SELECT 2 WHERE $1", "SELECT $1"]]
+    assert registry.prepares == 2
+
+
+def test_registry_records_latency_and_errors() -> None:
+    registry = StatementRegistry(4, window=3)
+    for elapsed in (0.004, 0.001, 0.002, 0.003):
+        registry.record("SELECT *\n  FROM prices", elapsed, failed=elapsed > 0.003)
+    stats = registry.stats["SELECT * FROM prices"]
+    assert stats["count"] == 4 and stats["errors"] == 1
+    assert stats["total_ms"] == pytest.approx(10.0)
+    assert stats["mean_ms"] == pytest.approx(2.5)
+    assert stats["max_ms"] == pytest.approx(4.0)
+    assert stats["p50_ms"] == pytest.approx(2.0)
+    assert stats["p99_ms"] == pytest.approx(3.0)
+    assert registry.hot == []
+
+
+def test_query_stats_percentile_uses_recent_window() -> None:
+    stats = QueryStats(100)
+    for elapsed in range(1, 201):
+        stats.record(elapsed / 1000, False)
+    assert stats.summary["p50_ms"] == pytest.approx(151.0)
+    assert stats.summary["p95_ms"] == pytest.approx(196.0)
+    assert QueryStats(10).summary["p99_ms"] == 0.0
+
+
+def test_seeded_statements_are_hot_before_first_use() -> None:
+    registry = StatementRegistry(2)
+    registry.seed(["SELECT * FROM users WHERE PHONENUMBER = $1", "SELECT * FROM prices WHERE ID = $1"])
+    registry.record("SELECT * FROM prices WHERE ID = $1", 0.001, parameterized=True)
+    assert registry.hot == ["SELECT * FROM prices WHERE ID = $1", "SELECT * FROM users WHERE PHONENUMBER = $1"]
+
+
+def test_warm_skips_statements_the_server_rejects() -> None:
+    class Server:
+        def __init__(self) -> None:
+            self.prepared: list[str] = []
+
+        async def prepare(self, query: str) -> None:
+            if "missing" in query:
+                raise asyncpg.UndefinedTableError('relation "missing" does not exist')
+            self.prepared.append(query)
+
+    server = Server()
+    queries = ["SELECT * FROM prices WHERE ID = $1", "SELECT * FROM missing WHERE ID = $1", "SELECT $1"]
+    assert asyncio.run(PreparedConnection.warm(typing.cast(typing.Any, server), queries)) == 2
+    assert server.prepared == [queries[0], queries[2]]
+
+
+class Notifications:
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.acquired = 0
+        self.released = 0
+        self.channels: list[str] = []
+
+    async def acquire(self) -> "Notifications":
+        self.acquired += 1
+        if self.acquired > 1 and self.failures:
+            self.failures -= 1
+            raise OSError("connection refused")
+        return self
+
+    async def release(self, connection: "Notifications") -> None:
+        self.released += 1
+
+    def add_termination_listener(self, callback: typing.Callable[..., None]) -> None:
+        pass
+
+    async def add_listener(self, channel: str, callback: typing.Callable[..., None]) -> None:
+        self.channels.append(channel)
+
+
+def test_listener_reconnects_and_resyncs(monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+    monkeypatch.setattr(Listener, "RETRY_DELAY", 0.0)
+    pool = Notifications(failures=2)
+    listener = Listener(Logs())
+    resyncs: list[str] = []
+
+    async def run() -> None:
+        await listener.start(typing.cast(typing.Any, pool))
+        await listener.subscribe("prices_changed", print, lambda: resyncs.append("prices"))
+        await listener.subscribe("users_changed", print)
+        listener.on_termination()
+        listener.on_termination()
+        assert listener.reconnecting is not None
+        await listener.reconnecting
+
+    with caplog.at_level("INFO"):
+        asyncio.run(run())
+    assert (pool.acquired, pool.released, listener.reconnects) == (4, 1, 1)
+    assert pool.channels == ["prices_changed", "users_changed", "prices_changed", "users_changed"]
+    assert resyncs == ["prices"]
+    assert [record.getMessage() for record in caplog.records] == [
+        "Listener reconnect failed (OSError('connection refused')), retrying in 0s",
+        "Listener reconnect failed (OSError('connection refused')), retrying in 0s",
+        "Listener reconnected, resubscribed to 2 channels",
+    ]
@@ -0,0 +1,239 @@
+import asyncio
+import contextlib
+import typing
+
+import asyncpg
+import pytest
+from api.utils.database import Register
+from api.utils.postgres import DatabaseModel, StatementRegistry
+from api.utils.replicas import ReplicaSet
+
+
+class Pool:
+    def __init__(self, name: str, delay: float = 0.0) -> None:
+        self.name = name
+        self.delay = delay
+        self.error: BaseException | None = None
+        self.queries: list[str] = []
+        self.fails_at = 0
+
+    async def call(self, query: str) -> None:
+        self.queries.append(query)
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+
+    async def fetch(self, query: str, *args: typing.Any) -> list[str]:
+        await self.call(query)
+        return [self.name]
+
+    async def fetchrow(self, query: str, *args: typing.Any) -> tuple[typing.Any, ...]:
+        await self.call(query)
+        return (args[0], self.name, "Kerala", "Idukki", "hash")
+
+    async def fetchval(self, query: str) -> int:
+        await self.call(query)
+        return 1
+
+    async def execute(self, query: str, *args: typing.Any) -> str:
+        await self.call(query)
+        return "OK"
+
+    async def close(self) -> None:
+        pass
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> typing.AsyncIterator["Pool"]:
+        yield self
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> typing.AsyncIterator[None]:
+        yield
+
+    async def cursor(self, query: str, *args: typing.Any, prefetch: int) -> typing.AsyncIterator[str]:
+        self.queries.append(query)
+        for number in range(3):
+            if self.error is not None and number == self.fails_at:
+                raise self.error
+            yield f"{self.name} {number}"
+
+
+def replica_set(*pools: Pool, interval: float = 60.0, timeout: float = 0.05) -> ReplicaSet:
+    return ReplicaSet(typing.cast(typing.Any, list(pools)), interval, timeout)
+
+
+def model(primary: Pool, *replicas: Pool, cls: type[DatabaseModel] = DatabaseModel) -> typing.Any:
+    instance = cls()
+    instance.database_pool = typing.cast(typing.Any, primary)
+    instance.replicas = replica_set(*replicas)
+    instance.replicas.healthy = [True] * len(replicas)
+    instance.statements = StatementRegistry(8)
+    return instance
+
+
+def test_pick_rotates_over_healthy_replicas() -> None:
+    first, second, third = Pool("first"), Pool("second"), Pool("third")
+    replicas = replica_set(first, second, third)
+    assert replicas.pick() is None
+    replicas.healthy = [True, False, True]
+    assert [replicas.pick() for _ in range(4)] == [first, third, first, third]
+    replicas.fail(typing.cast(typing.Any, first))
+    assert [replicas.pick() for _ in range(2)] == [third, third]
+    assert replicas.stats == {"replicas": 3, "healthy": 1, "reads": 6, "failovers": 1}
+    assert replica_set().pick() is None
+
+
+def test_check_marks_unreachable_and_slow_replicas() -> None:
+    healthy, broken, slow, full = Pool("healthy"), Pool("broken"), Pool("slow", delay=1.0), Pool("full")
+    broken.error = OSError("connection refused")
+    full.error = asyncpg.TooManyConnectionsError("too many clients")
+    replicas = replica_set(healthy, broken, slow, full)
+    asyncio.run(replicas.check())
+    assert replicas.healthy == [True, False, False, False]
+    broken.error, slow.delay, full.error = None, 0.0, None
+    asyncio.run(replicas.check())
+    assert replicas.healthy == [True, True, True, True]
+
+
+def test_monitor_brings_replicas_back() -> None:
+    replica = Pool("replica")
+    replica.error = OSError("starting up")
+    replicas = replica_set(replica, interval=0.01)
+
+    async def run() -> None:
+        await replicas.start()
+        assert replicas.healthy == [False]
+        replica.error = None
+        for _ in range(100):
+            if replicas.healthy == [True]:
+                break
+            await asyncio.sleep(0.01)
+        await replicas.close()
+
+    asyncio.run(run())
+    assert replicas.healthy == [True]
+    assert replicas.task is not None and replicas.task.cancelled()
+
+
+def test_reader_routes_plain_selects_to_replicas() -> None:
+    primary, replica = Pool("primary"), Pool("replica")
+    database = model(primary, replica)
+    assert database.reader("SELECT * FROM prices") is replica
+    assert database.reader("  select 1") is replica
+    assert database.reader("INSERT INTO prices VALUES ($1)") is primary
+    assert database.reader("UPDATE users SET NAME = $1 RETURNING *") is primary
+    assert database.reader("WITH rows AS (DELETE FROM messages RETURNING *) SELECT * FROM rows") is primary
+    assert model(primary).reader("SELECT 1") is primary
+
+
+def test_primary_context_pins_reads() -> None:
+    primary, replica = Pool("primary"), Pool("replica")
+    database = model(primary, replica)
+    with database.primary():
+        assert database.reader("SELECT 1") is primary
+        with database.primary(False):
+            assert database.reader("SELECT 1") is primary
+    with database.primary(False):
+        assert database.reader("SELECT 1") is replica
+    assert database.reader("SELECT 1") is replica
+
+    async def run() -> list[str]:
+        async def read() -> str:
+            await asyncio.sleep(0)
+            return typing.cast(str, (await database.exec_fetchall("SELECT 1"))[0])
+
+        with database.primary():
+            pinned = asyncio.create_task(read())
+        free = asyncio.create_task(read())
+        return list(await asyncio.gather(pinned, free))
+
+    assert asyncio.run(run()) == ["primary", "replica"]
+
+
+def test_unreachable_replica_fails_over_to_primary() -> None:
+    primary, replica = Pool("primary"), Pool("replica")
+    replica.error = ConnectionResetError("gone")
+    database = model(primary, replica)
+    assert asyncio.run(database.exec_fetchall("SELECT * FROM prices")) == ["primary"]
+    assert database.replicas.healthy == [False]
+    assert database.replicas.failovers == 1
+    assert database.statements.queries["SELECT * FROM prices"].errors == 0
+    assert asyncio.run(database.exec_fetchall("SELECT * FROM prices")) == ["primary"]
+    assert replica.queries == ["SELECT * FROM prices"]
+
+
+@pytest.mark.parametrize(
+    "error",
+    [asyncpg.UndefinedColumnError("column does not exist"), asyncpg.DivisionByZeroError("division by zero")],
+)
+def test_query_errors_propagate_without_failover(error: asyncpg.PostgresError) -> None:
+    primary, replica = Pool("primary"), Pool("replica")
+    replica.error = error
+    database = model(primary, replica)
+    with pytest.raises(type(error)):
+        asyncio.run(database.exec_fetchall("SELECT 1 / 0 FROM prices"))
+    assert database.replicas.healthy == [True]
+    assert database.replicas.failovers == 0
+    assert database.statements.queries["SELECT 1 / 0 FROM prices"].errors == 1
+    assert not primary.queries
+
+
+def test_recovery_conflicts_retry_on_primary() -> None:
+    primary, replica = Pool("primary"), Pool("replica")
+    replica.error = asyncpg.SerializationError("canceling statement due to conflict with recovery")
+    database = model(primary, replica)
+    assert asyncio.run(database.exec_fetchall("SELECT * FROM prices")) == ["primary"]
+    assert database.replicas.healthy == [True]
+    assert database.replicas.failovers == 0
+
+
+async def stream(database: DatabaseModel, query: str) -> list[str]:
+    return [record async for record in database.exec_stream(query)]
+
+
+def test_stream_fails_over_before_the_first_row() -> None:
+    primary, replica = Pool("primary"), Pool("replica")
+    replica.error = asyncpg.CannotConnectNowError("the database system is starting up")
+    database = model(primary, replica)
+    assert asyncio.run(stream(database, "SELECT * FROM prices")) == ["primary 0", "primary 1", "primary 2"]
+    assert database.replicas.healthy == [False]
+
+
+def test_stream_errors_after_the_first_row_propagate() -> None:
+    primary, replica = Pool("primary"), Pool("replica")
+    replica.error, replica.fails_at = ConnectionResetError("gone"), 2
+    database = model(primary, replica)
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(stream(database, "SELECT * FROM prices"))
+    assert database.replicas.healthy == [False]
+    assert not primary.queries
+
+
+def test_stream_query_errors_keep_the_replica() -> None:
+    primary, replica = Pool("primary"), Pool("replica")
+    replica.error = asyncpg.UndefinedTableError("relation does not exist")
+    database = model(primary, replica)
+    with pytest.raises(asyncpg.UndefinedTableError):
+        asyncio.run(stream(database, "SELECT * FROM missing"))
+    assert database.replicas.healthy == [True]
+    assert not primary.queries
+
+
+def test_writes_never_touch_replicas() -> None:
+    primary, replica = Pool("primary"), Pool("replica")
+    database = model(primary, replica)
+    asyncio.run(database.exec_write_query("SELECT pg_notify('prices_changed', '')"))
+    assert primary.queries and not replica.queries
+
+
+@pytest.mark.parametrize("recent", [True, False])
+def test_recent_writers_read_their_own_writes(recent: bool) -> None:
+    primary, replica = Pool("primary"), Pool("replica")
+    register = model(primary, replica, cls=Register)
+    if recent:
+        register.forget(9000000001)
+    principal = asyncio.run(register.load_principal(9000000001))
+    register.auth.close()
+    assert principal.name == ("primary" if recent else "replica")
+    assert register.fresh(9000000001) is recent
+    assert not register.fresh(9000000002)
@@ -0,0 +1,68 @@
+import typing
+
+import numpy as np
+import orjson
+import pytest
+from api.utils.index import PriceIndex
+from api.utils.models import Price
+from api.utils.rollup import PriceRollup
+
+
+@pytest.fixture(scope="module")
+def rollup(prices: list[tuple[typing.Any, ...]]) -> PriceRollup:
+    index = PriceIndex()
+    index.load(prices)
+    rollup = PriceRollup()
+    rollup.load(index)
+    return rollup
+
+
+def label(row: Price, dimension: str) -> str:
+    return str(getattr(row, dimension))
+
+
+def group_stats(rows: list[Price], dimension: str) -> dict[tuple[str, str], dict[str, typing.Any]]:
+    groups: dict[tuple[str, str], list[int]] = {}
+    for row in rows:
+        groups.setdefault((row.COMMODITY, label(row, dimension)), []).append(row.MODAL_PRICE)
+    stats = {}
+    for (commodity, value), prices in groups.items():
+        stats[(commodity, value)] = {
+            "COMMODITY": commodity,
+            dimension: value,
+            "COUNT": len(prices),
+            "MIN": min(prices),
+            "AVG": sum(prices) / len(prices),
+            "MAX": max(prices),
+            **{name: np.percentile(prices, quantile * 100) for name, quantile in PriceRollup.QUANTILES.items()},
+        }
+    return stats
+
+
+@pytest.mark.parametrize("dimension", PriceRollup.DIMENSIONS)
+def test_cells_match_group_statistics(rollup: PriceRollup, rows: list[Price], dimension: str) -> None:
+    expected = group_stats(rows, dimension)
+    assert {(commodity, value) for name, commodity, value in rollup.cells if name == dimension} == set(expected)
+    for (commodity, value), stats in expected.items():
+        assert orjson.loads(rollup.get(dimension, commodity, value)) == pytest.approx(stats)
+
+
+@pytest.mark.parametrize("dimension", PriceRollup.DIMENSIONS)
+def test_groups_are_sorted_cells(rollup: PriceRollup, rows: list[Price], dimension: str) -> None:
+    for commodity in sorted({row.COMMODITY for row in rows})[::10]:
+        group = orjson.loads(rollup.get(dimension, commodity))
+        values = sorted({label(row, dimension) for row in rows if row.COMMODITY == commodity})
+        assert [row[dimension] for row in group] == values
+        assert group == [orjson.loads(rollup.get(dimension, commodity, value)) for value in values]
+
+
+def test_missing(rollup: PriceRollup) -> None:
+    assert rollup.get("STATE", "Nothing") is None
+    assert rollup.get("STATE", "Nothing", "Nowhere") is None
+
+
+def test_empty_index() -> None:
+    rollup = PriceRollup()
+    rollup.load(PriceIndex())
+    assert rollup.loaded
+    assert rollup.get("STATE", "Tomato") is None
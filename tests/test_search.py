@@ -0,0 +1,51 @@
+import typing
+
+import pytest
+from api.utils.search import TrigramIndex, normalize, trigrams
+
+
+@pytest.fixture(scope="module")
+def values(prices: list[tuple[typing.Any, ...]]) -> list[str]:
+    return sorted({record[1] for record in prices} | {record[4] for record in prices})
+
+
+@pytest.fixture(scope="module")
+def search(values: list[str]) -> TrigramIndex:
+    return TrigramIndex(values)
+
+
+def similarity(left: str, right: str) -> float:
+    a, b = trigrams(left), trigrams(right)
+    return len(a & b) / len(a | b)
+
+
+def rank_all(values: list[str], value: str, limit: int = 5, threshold: float = 0.2) -> list[str]:
+    pairs = sorted({(normalize(item), item) for item in values})
+    scores = [(similarity(value, key), -position, item) for position, (key, item) in enumerate(pairs)]
+    return [item for score, _, item in sorted(scores, reverse=True) if score >= threshold][:limit]
+
+
+def test_correct(search: TrigramIndex, values: list[str]) -> None:
+    for value in values:
+        assert search.correct(value) == value
+        assert search.correct(f"  {value.upper()} ") == value
+    assert search.correct("gur jaggery") == "Gur(Jaggery)"
+    assert search.correct("Nothing") is None
+
+
+@pytest.mark.parametrize("value", ["tomatto", "onoin", "potatoe", "Green Chilly", "bhindi", "Maharastra", "xyz"])
+def test_suggest_ranks_by_jaccard(search: TrigramIndex, values: list[str], value: str) -> None:
+    assert search.suggest(value) == rank_all(values, value)
+    assert search.suggest(value, limit=2, threshold=0.4) == rank_all(values, value, 2, 0.4)
+
+
+@pytest.mark.parametrize("prefix", ["", "t", "ba", "Gre", "Andhra", "tomatto", "zzz"])
+def test_complete_prefers_prefixes(search: TrigramIndex, values: list[str], prefix: str) -> None:
+    key = normalize(prefix)
+    matches = [
+        value
+        for value in sorted(values, key=lambda value: (normalize(value), value))
+        if normalize(value).startswith(key)
+    ][:4]
+    matches += [value for value in rank_all(values, prefix, 4) if value not in matches]
+    assert search.complete(prefix, limit=4) == matches[:4]
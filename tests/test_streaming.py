@@ -0,0 +1,74 @@
+import asyncio
+import typing
+
+import orjson
+import pytest
+from api.utils.models import Price
+from api.utils.streaming import CHUNK, decode_cursor, encode_cursor, encode_rows
+
+
+@pytest.fixture(scope="module")
+def vegetables(rows: list[Price]) -> list[Price]:
+    return [row for row in rows if row.COMMODITY in ("Tomato", "Onion", "Potato")]
+
+
+async def select(
+    rows: list[Price], after: int | None, limit: int | None, closed: list[bool]
+) -> typing.AsyncGenerator[Price, None]:
+    try:
+        for row in [row for row in rows if after is None or row.ID > after][:limit]:
+            yield row
+    finally:
+        closed.append(True)
+
+
+async def collect(chunks: typing.AsyncIterator[bytes]) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+def page(rows: list[Price], media: str, limit: int | None, cursor: str | None) -> tuple[list[typing.Any], str | None]:
+    closed: list[bool] = []
+    after = decode_cursor(cursor) if cursor else None
+    source = select(rows, after, limit + 1 if limit is not None else None, closed)
+    body = asyncio.run(collect(encode_rows(source, limit, media)))
+    assert closed == [True]
+    if media == "json":
+        document = orjson.loads(body)
+        return document["data"], document["cursor"]
+    lines = [orjson.loads(line) for line in body.splitlines()]
+    if lines and "cursor" in lines[-1]:
+        return lines[:-1], lines[-1]["cursor"]
+    return lines, None
+
+
+def test_cursor_roundtrip() -> None:
+    for last_id in (0, 1, 42, 2**40):
+        assert decode_cursor(encode_cursor(last_id)) == last_id
+        assert decode_cursor(encode_cursor(last_id, "before"), "before") == last_id
+        assert "=" not in encode_cursor(last_id)
+    for cursor in ("", "!!", "bm90IGpzb24", "eyJiZWZvcmUiOjF9", "eyJhZnRlciI6ImEifQ"):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("media", ["ndjson", "json"])
+@pytest.mark.parametrize("limit", [1, 7, CHUNK, CHUNK + 50, None])
+def test_pages_concatenate_to_full_result(vegetables: list[Price], media: str, limit: int | None) -> None:
+    expected = orjson.loads(orjson.dumps(vegetables))
+    streamed, cursor = [], None
+    while True:
+        data, cursor = page(vegetables, media, limit, cursor)
+        assert len(data) <= (limit or len(vegetables))
+        streamed.extend(data)
+        if cursor is None:
+            break
+        assert decode_cursor(cursor) == data[-1]["ID"]
+    assert streamed == expected
+
+
+@pytest.mark.parametrize("media", ["ndjson", "json"])
+def test_exact_page_has_no_cursor(vegetables: list[Price], media: str) -> None:
+    data, cursor = page(vegetables[:CHUNK], media, CHUNK, None)
+    assert len(data) == CHUNK and cursor is None
+    data, cursor = page([], media, 10, None)
+    assert data == [] and cursor is None